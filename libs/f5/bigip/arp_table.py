@@ -0,0 +1,165 @@
+# Copyright 2014 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5.common import constants as const
+
+import binascii
+import bisect
+import socket
+import threading
+import time
+
+
+class ArpTable(object):
+    """
+    Mirror of the static ARP entries of a partition.
+
+    Entries are keyed by (route domain, IP version, address as int)
+    and the addresses of each route domain and version are kept
+    sorted, so the entries of a subnet are one contiguous range found
+    by binary search, like a walk down a prefix trie, and existence
+    and MAC lookups are dict lookups. Tables are shared by all BigIP
+    objects for a device, kept current by the ARP interface writes
+    and merged with the device entries after ARP_MIRROR_TTL seconds.
+    """
+    tables = {}
+    tables_lock = threading.Lock()
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.entries = {}
+        self.addresses = {}
+        self.by_mac = {}
+        self.synced_at = None
+
+    @staticmethod
+    def get_table(hostname, folder):
+        """ Get the shared table of a device partition """
+        with ArpTable.tables_lock:
+            if (hostname, folder) not in ArpTable.tables:
+                ArpTable.tables[(hostname, folder)] = ArpTable()
+            return ArpTable.tables[(hostname, folder)]
+
+    def is_stale(self):
+        """ Has the table never been synced or expired? """
+        return self.synced_at is None or \
+            time.time() - self.synced_at > const.ARP_MIRROR_TTL
+
+    def invalidate(self):
+        """ Merge with the device entries on next use """
+        self.synced_at = None
+
+    def update(self, entries):
+        """ Merge {ip address: mac} read from the device """
+        with self.lock:
+            current = {}
+            for (ip_address, mac_address) in entries.items():
+                current[_get_key(ip_address)] = (ip_address, mac_address)
+            for key in self.entries.keys():
+                if key not in current:
+                    self._remove_key(key)
+            for key in current:
+                if self.entries.get(key) != current[key]:
+                    self._add_key(key, *current[key])
+            self.synced_at = time.time()
+
+    def add(self, ip_address, mac_address):
+        """ Add or update an entry """
+        with self.lock:
+            self._add_key(_get_key(ip_address), ip_address, mac_address)
+
+    def remove(self, ip_address):
+        """ Remove an entry """
+        with self.lock:
+            self._remove_key(_get_key(ip_address))
+
+    def clear(self):
+        """ Remove all entries """
+        with self.lock:
+            self.entries = {}
+            self.addresses = {}
+            self.by_mac = {}
+            self.synced_at = time.time()
+
+    def get(self, ip_address):
+        """ Get (ip address, mac) of an address or None """
+        with self.lock:
+            return self.entries.get(_get_key(ip_address))
+
+    def get_all(self):
+        """ Get [(ip address, mac)] of all entries """
+        with self.lock:
+            return self.entries.values()
+
+    def get_by_mac(self, mac_address):
+        """ Get ip addresses with mac """
+        with self.lock:
+            return [self.entries[key][0]
+                    for key in self.by_mac.get(mac_address, [])]
+
+    def get_in_network(self, version, first, last, route_domain=None):
+        """
+        Get [(ip address, mac)] of entries from the first to the last
+        address of a network, in one or all route domains.
+        """
+        matches = []
+        with self.lock:
+            for (domain, domain_version) in self.addresses:
+                if domain_version != version or \
+                        (route_domain is not None and
+                         domain != route_domain):
+                    continue
+                values = self.addresses[(domain, domain_version)]
+                start = bisect.bisect_left(values, first)
+                end = bisect.bisect_right(values, last)
+                for value in values[start:end]:
+                    matches.append(
+                        self.entries[(domain, domain_version, value)])
+        return matches
+
+    def _add_key(self, key, ip_address, mac_address):
+        """ Index an entry """
+        if key in self.entries:
+            self._remove_key(key)
+        self.entries[key] = (ip_address, mac_address)
+        bisect.insort(self.addresses.setdefault(key[:2], []), key[2])
+        self.by_mac.setdefault(mac_address, set()).add(key)
+
+    def _remove_key(self, key):
+        """ Drop an entry from the indexes """
+        if key not in self.entries:
+            return
+        (_, mac_address) = self.entries.pop(key)
+        values = self.addresses[key[:2]]
+        del values[bisect.bisect_left(values, key[2])]
+        self.by_mac[mac_address].discard(key)
+        if not self.by_mac[mac_address]:
+            del self.by_mac[mac_address]
+
+
+def _get_key(ip_address):
+    """ Get (route domain, IP version, address int) of an address """
+    route_domain = 0
+    decorator_index = ip_address.find('%')
+    if decorator_index > -1:
+        route_domain = int(ip_address[decorator_index + 1:])
+        ip_address = ip_address[:decorator_index]
+    if ':' in ip_address:
+        packed = socket.inet_pton(socket.AF_INET6, ip_address)
+        version = 6
+    else:
+        packed = socket.inet_pton(socket.AF_INET, ip_address)
+        version = 4
+    return (route_domain, version, int(binascii.hexlify(packed), 16))
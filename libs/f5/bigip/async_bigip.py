@@ -0,0 +1,132 @@
+# Copyright 2014 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5.common import constants as const
+from f5.bigip.bigip import BigIP
+
+from eventlet import greenpool
+
+# interfaces which still use the stateful SOAP active folder
+# and so must not run concurrently against the same device
+SERIALIZED_INTERFACES = ['arp', 'system']
+
+
+class AsyncInterface(object):
+    """ Green thread proxy for a BigIP interface
+
+    Every public method call is spawned on the shared green pool and
+    returns a GreenThread. Call wait() on it to get the result or
+    raise the exception of the underlying blocking call.
+    """
+    def __init__(self, interface, green_pool, lock=None):
+        self.interface = interface
+        self.green_pool = green_pool
+        self.lock = lock
+
+    def __getattr__(self, name):
+        attr = getattr(self.interface, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        def spawn(*args, **kwargs):
+            """ Spawn call on green pool """
+            return self.green_pool.spawn(self._call, attr, *args, **kwargs)
+        spawn.__name__ = name
+        spawn.__doc__ = attr.__doc__
+        return spawn
+
+    def _call(self, method, *args, **kwargs):
+        """ Run method, serialized if required """
+        if self.lock:
+            with self.lock:
+                return method(*args, **kwargs)
+        return method(*args, **kwargs)
+
+
+class AsyncBigIP(object):
+    """ Non-blocking counterpart to BigIP
+
+    Interface methods return eventlet GreenThreads so one hub can keep
+    many requests in flight across many devices. Several AsyncBigIP
+    objects can share a green_pool to bound total concurrency. The
+    application must eventlet.monkey_patch() sockets for requests and
+    suds calls to yield, and threading for the SOAP lock to block
+    green threads.
+    """
+    def __init__(self, hostname, username=None, password=None,
+                 green_pool=None, **kwargs):
+        if isinstance(hostname, BigIP):
+            self.bigip = hostname
+        else:
+            self.bigip = BigIP(hostname, username, password, **kwargs)
+        if not green_pool:
+            green_pool = greenpool.GreenPool(const.ASYNC_BIGIP_POOL_SIZE)
+        self.green_pool = green_pool
+        # the bigip lock is also held by @icontrol_folder calls made
+        # from other interfaces, e.g. ARP entries of FDB updates
+        self.soap_lock = self.bigip.soap_lock
+        self.interfaces = {}
+
+    def _get_interface(self, name):
+        """ Get cached async interface proxy """
+        if name in self.interfaces:
+            return self.interfaces[name]
+        lock = None
+        if name in SERIALIZED_INTERFACES:
+            lock = self.soap_lock
+        interface = AsyncInterface(getattr(self.bigip, name),
+                                   self.green_pool, lock)
+        self.interfaces[name] = interface
+        return interface
+
+    def waitall(self):
+        """ Wait for all green threads in the pool """
+        self.green_pool.waitall()
+
+    @property
+    def pool(self):
+        return self._get_interface('pool')
+
+    @property
+    def virtual_server(self):
+        return self._get_interface('virtual_server')
+
+    @property
+    def vxlan(self):
+        return self._get_interface('vxlan')
+
+    @property
+    def l2gre(self):
+        return self._get_interface('l2gre')
+
+    @property
+    def arp(self):
+        return self._get_interface('arp')
+
+    @property
+    def selfip(self):
+        return self._get_interface('selfip')
+
+    @property
+    def vlan(self):
+        return self._get_interface('vlan')
+
+    @property
+    def route(self):
+        return self._get_interface('route')
+
+    @property
+    def system(self):
+        return self._get_interface('system')
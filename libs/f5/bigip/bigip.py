@@ -14,11 +14,17 @@
 #
 
 import os
+import json
 import logging
-import requests
 import socket
+import threading
 
 from f5.bigip.pycontrol import pycontrol as pc
+from f5.bigip.fdb import FdbWriteQueue
+from f5.bigip.icr import ICRSession
+from f5.bigip.icr import TokenAuth
+from f5.bigip.icr import Transaction
+from f5.bigip.references import ReferenceIndex
 from f5.common import constants as const
 from f5.bigip import interfaces as bigip_interfaces
 
@@ -31,9 +37,11 @@ from f5.bigip.interfaces.pool import Pool
 from f5.bigip.interfaces.route import Route
 from f5.bigip.interfaces.rule import Rule
 from f5.bigip.interfaces.selfip import SelfIP
+from f5.bigip.interfaces.snapshot import Snapshot
 from f5.bigip.interfaces.snat import SNAT
 from f5.bigip.interfaces.nat import NAT
 from f5.bigip.interfaces.stat import Stat
+from f5.bigip.interfaces.statistics import Statistics
 from f5.bigip.interfaces.system import System
 from f5.bigip.interfaces.virtual_server import VirtualServer
 from f5.bigip.interfaces.vlan import Vlan
@@ -47,11 +55,16 @@ LOG = logging.getLogger(__name__)
 class BigIP(object):
     def __init__(self, hostname, username, password,
                  timeout=None, address_isolation=True,
-                 strict_route_isolation=False):
-        # get icontrol connection stub
-        self.icontrol = self._get_icontrol(hostname, username, password)
-        self.icr_session = self._get_icr_session(hostname, username, password)
+                 strict_route_isolation=False, token_auth=False,
+                 max_connections=None, rest_only=False):
+        self.hostname = hostname
+        self.icr_session = self._get_icr_session(
+            hostname, username, password, token_auth=token_auth,
+            max_connections=max_connections)
         self.icr_url = 'https://%s/mgmt/tm' % hostname
+        # get icontrol connection stub
+        self.icontrol = self._get_icontrol(hostname, username, password,
+                                           version=self.get_tmos_version)
 
         if address_isolation:
             self.route_domain_required = True
@@ -61,8 +74,18 @@ class BigIP(object):
             self.strict_route_isolation = True
         else:
             self.strict_route_isolation = False
+        # REST only mode never sets the SOAP session folder and
+        # uses REST equivalents for SOAP only features
+        if rest_only:
+            self.rest_only = True
+        else:
+            self.rest_only = False
         # interface instance cache
         self.interfaces = {}
+        # serializes calls which depend on the SOAP active folder
+        self.soap_lock = threading.RLock()
+        # reverse reference maps shared per device
+        self.references = ReferenceIndex(self)
         self.device_name = None
         self.local_ip = None
 
@@ -167,6 +190,15 @@ class BigIP(object):
             l2gre.OBJ_PREFIX = bigip_interfaces.OBJ_PREFIX
             return l2gre
 
+    @property
+    def fdb_queue(self):
+        if 'fdb_queue' in self.interfaces:
+            return self.interfaces['fdb_queue']
+        else:
+            fdb_queue = FdbWriteQueue(self)
+            self.interfaces['fdb_queue'] = fdb_queue
+            return fdb_queue
+
     @property
     def arp(self):
         if 'arp' in self.interfaces:
@@ -257,13 +289,42 @@ class BigIP(object):
             pool.OBJ_PREFIX = bigip_interfaces.OBJ_PREFIX
             return pool
 
+    @property
+    def snapshot(self):
+        if 'snapshot' in self.interfaces:
+            return self.interfaces['snapshot']
+        else:
+            snapshot = Snapshot(self)
+            self.interfaces['snapshot'] = snapshot
+            snapshot.OBJ_PREFIX = bigip_interfaces.OBJ_PREFIX
+            return snapshot
+
+    @property
+    def statistics(self):
+        if 'statistics' in self.interfaces:
+            return self.interfaces['statistics']
+        else:
+            statistics = Statistics(self)
+            self.interfaces['statistics'] = statistics
+            statistics.OBJ_PREFIX = bigip_interfaces.OBJ_PREFIX
+            return statistics
+
+    def transaction(self):
+        """ Batch REST writes into one transaction """
+        return Transaction(self)
+
+    def get_request_metrics(self):
+        """ Get in flight and queued REST requests for this device """
+        return self.icr_session.limiter.get_metrics()
+
     def set_timeout(self, timeout):
         self.icontrol.set_timeout(timeout)
 
     def set_folder(self, name, folder='/Common'):
         if not folder.startswith("/"):
             folder = "/" + folder
-        self.system.set_folder(folder)
+        if not self.rest_only:
+            self.system.set_folder(folder)
         if name:
             if not name.startswith(folder + "/"):
                 return folder + "/" + name
@@ -281,6 +342,19 @@ class BigIP(object):
         folder = str(folder).replace('/', '')
         return bigip_interfaces.prefixed(folder)
 
+    def get_tmos_version(self):
+        """ Get TMOS version and build over REST """
+        request_url = self.icr_url + '/sys/version'
+        response = self.icr_session.get(
+            request_url, timeout=const.CONNECTION_TIMEOUT)
+        if response.status_code < 400:
+            response_obj = json.loads(response.text)
+            for entry in response_obj.get('entries', {}).values():
+                stats = entry['nestedStats']['entries']
+                return '%s_%s' % (stats['Version']['description'],
+                                  stats['Build']['description'])
+        return None
+
     def get_domain_index(self, folder='/Common'):
         if folder == '/Common' or folder == 'Common':
             return 0
@@ -288,7 +362,8 @@ class BigIP(object):
             return self.route.get_domain(folder=folder)
 
     @staticmethod
-    def _get_icontrol(hostname, username, password, timeout=None):
+    def _get_icontrol(hostname, username, password, timeout=None,
+                      version=None):
         #Logger.log(Logger.DEBUG,
         #           "Opening iControl connections to %s for interfaces %s"
         #            % (self.hostname, self.interfaces))
@@ -298,12 +373,18 @@ class BigIP(object):
                                 username=username,
                                 password=password,
                                 directory=const.WSDL_CACHE_DIR,
+                                definitions_cache_dir=
+                                const.WSDL_DEFINITIONS_CACHE_DIR,
+                                version=version,
                                 wsdls=[])
         else:
             icontrol = pc.BIGIP(hostname=hostname,
                                 username=username,
                                 password=password,
                                 fromurl=True,
+                                definitions_cache_dir=
+                                const.WSDL_DEFINITIONS_CACHE_DIR,
+                                version=version,
                                 wsdls=[])
 
         if timeout:
@@ -314,12 +395,15 @@ class BigIP(object):
         return icontrol
 
     @staticmethod
-    def _get_icr_session(hostname, username, password, timeout=None):
-        icr_session = requests.session()
-        icr_session.auth = (username, password)
-        icr_session.verify = False
-        icr_session.headers.update(
-                                 {'Content-Type': 'application/json'})
+    def _get_icr_session(hostname, username, password, timeout=None,
+                         token_auth=False, max_connections=None):
+        icr_session = ICRSession(hostname=hostname,
+                                 pool_maxsize=max_connections)
+        if token_auth:
+            icr_session.auth = TokenAuth(hostname, username, password,
+                                         session=icr_session)
+        else:
+            icr_session.auth = (username, password)
         if timeout:
             socket.setdefaulttimeout(timeout)
         else:
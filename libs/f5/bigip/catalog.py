@@ -0,0 +1,178 @@
+# Copyright 2014 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5.common.logger import Log
+from f5.common import constants as const
+from f5.common.cache import TTLCache
+from f5.common.workers import run_all
+
+import json
+import threading
+import urlparse
+
+
+class CatalogState(object):
+    """ Catalog data shared by all BigIP objects for a device """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.types = None
+        self.instances = TTLCache(const.CATALOG_TTL)
+
+
+class TypeCatalog(object):
+    """
+    Cached instances of the types under an organizing collection
+    such as /ltm/profile, /ltm/persistence or /ltm/monitor.
+
+    The type list changes only with the TMOS version, so it is
+    discovered once per device and again only when a type request
+    returns 404, e.g. after an upgrade. The instances of a partition
+    are fetched across all types concurrently, cached for CATALOG_TTL
+    seconds and updated by the interface methods which create or
+    delete them. Inside a transaction the write is only queued, so
+    the folder is invalidated instead.
+    """
+    states = {}
+    states_lock = threading.Lock()
+
+    def __init__(self, bigip, path, exception, fields=None):
+        self.bigip = bigip
+        self.path = path
+        self.exception = exception
+        self.fields = ['name', 'partition', 'fullPath', 'selfLink']
+        if fields:
+            self.fields.extend(fields)
+        self.state = TypeCatalog.get_state(bigip.hostname, path)
+
+    @staticmethod
+    def get_state(hostname, path):
+        """ Get the shared catalog state for a device and collection """
+        with TypeCatalog.states_lock:
+            if (hostname, path) not in TypeCatalog.states:
+                TypeCatalog.states[(hostname, path)] = CatalogState()
+            return TypeCatalog.states[(hostname, path)]
+
+    def get_types(self):
+        """ Get {type: REST path} of the collection """
+        types = self.state.types
+        if types is None:
+            types = self._discover_types()
+            self.state.types = types
+        return types
+
+    def get_instances(self, folder='Common'):
+        """ Get instances of all types in folder """
+        instances = self.state.instances.get(folder)
+        if instances is None:
+            instances = self._fetch_instances(folder)
+            self.state.instances.put(folder, instances)
+        return instances
+
+    def is_cached(self, folder='Common'):
+        """ Are the instances of folder cached? """
+        return self.state.instances.get(folder) is not None
+
+    def find(self, name, folder='Common'):
+        """ Get instance by name in folder or else in Common """
+        for search_folder in [folder, 'Common']:
+            for instance in self.get_instances(search_folder):
+                if instance['name'] == name:
+                    return instance
+        return None
+
+    def add(self, folder, instance_type, instance):
+        """ Add a created instance to the cached folder """
+        if self.bigip.icr_session.transaction_id:
+            self.invalidate(folder)
+            return
+        instance = dict(instance)
+        instance['type'] = instance_type
+        with self.state.lock:
+            instances = self.state.instances.get(folder)
+            if instances is not None:
+                self.state.instances.put(
+                    folder, [cached for cached in instances
+                             if cached['name'] != instance['name']] +
+                    [instance])
+
+    def remove(self, folder, name):
+        """ Remove a deleted instance from the cached folder """
+        if self.bigip.icr_session.transaction_id:
+            self.invalidate(folder)
+            return
+        with self.state.lock:
+            instances = self.state.instances.get(folder)
+            if instances is not None:
+                self.state.instances.put(
+                    folder, [cached for cached in instances
+                             if cached['name'] != name])
+
+    def invalidate(self, folder=None):
+        """ Drop cached instances of a folder or all folders """
+        self.state.instances.invalidate(folder)
+
+    def _discover_types(self):
+        """ List the types of the organizing collection """
+        request_url = self.bigip.icr_url + self.path
+        response = self.bigip.icr_session.get(
+            request_url, timeout=const.CONNECTION_TIMEOUT)
+        types = {}
+        if response.status_code < 400:
+            response_obj = json.loads(response.text)
+            for item in response_obj.get('items', []):
+                type_path = urlparse.urlparse(
+                    item['reference']['link']).path
+                type_path = type_path[len('/mgmt/tm'):]
+                types[type_path.split('/')[-1]] = type_path
+        elif response.status_code != 404:
+            Log.error('catalog', response.text)
+            raise self.exception(response.text)
+        return types
+
+    def _fetch_instances(self, folder):
+        """ Get instances of every type in folder concurrently """
+        types = self.get_types()
+        if not types:
+            return []
+        results = run_all(
+            lambda instance_type: self._fetch_type(instance_type,
+                                                   types[instance_type],
+                                                   folder),
+            sorted(types), const.CATALOG_FETCH_CONCURRENCY)
+        instances = []
+        for result in results:
+            if result is None:
+                # type went away, the device was upgraded
+                self.state.types = None
+                continue
+            instances.extend(result)
+        return instances
+
+    def _fetch_type(self, instance_type, type_path, folder):
+        """ Get instances of a type in folder, None if type is gone """
+        request_url = self.bigip.icr_url + type_path
+        request_url += '?$select=' + ','.join(self.fields)
+        request_url += '&$filter=partition eq ' + folder
+        response = self.bigip.icr_session.get(
+            request_url, timeout=const.CONNECTION_TIMEOUT)
+        if response.status_code < 400:
+            instances = json.loads(response.text).get('items', [])
+            for instance in instances:
+                instance['type'] = instance_type
+            return instances
+        elif response.status_code == 404:
+            return None
+        Log.error('catalog', response.text)
+        raise self.exception(response.text)
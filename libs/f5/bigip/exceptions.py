@@ -38,6 +38,14 @@ class BigIPClusterSyncFailure(Exception):
     pass
 
 
+class BigIPAuthenticationFailure(Exception):
+    pass
+
+
+class BigIPDeviceUnavailable(Exception):
+    pass
+
+
 class BigIPClusterPeerAddFailure(Exception):
     pass
 
@@ -254,6 +262,10 @@ class SNATDeleteException(Exception):
     pass
 
 
+class SnapshotQueryException(Exception):
+    pass
+
+
 class SystemCreationException(Exception):
     pass
 
@@ -316,3 +328,11 @@ class VXLANUpdateException(Exception):
 
 class VXLANDeleteException(Exception):
     pass
+
+
+class TransactionCreationException(Exception):
+    pass
+
+
+class TransactionUpdateException(Exception):
+    pass
@@ -0,0 +1,409 @@
+# Copyright 2014 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5.common.logger import Log
+from f5.common import constants as const
+
+import json
+import threading
+import time
+import urllib
+
+
+class TunnelMirror(object):
+    """ Local copy of a tunnel's FDB records """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.records = None
+        self.generation = 0
+        self.synced_at = 0
+
+    def is_stale(self):
+        """ Has the mirror never been synced or expired? """
+        return self.records is None or \
+            time.time() - self.synced_at > const.FDB_MIRROR_TTL
+
+
+class FdbSync(object):
+    """
+    Incremental FDB record sync for multipoint tunnels.
+
+    Each tunnel's records are mirrored locally as {mac: endpoint}.
+    Changes are compared with the mirror as sets and only the added,
+    changed and removed records are sent through the tunnel's records
+    subcollection. Deltas larger than FDB_SYNC_MAX_DELTA, devices
+    without the subcollection and mirrors which drifted from the
+    device, detected by a failed record request, fall back to reading
+    the records and writing the full list. Mirrors are shared by all
+    BigIP objects for a device, resynced after FDB_MIRROR_TTL seconds
+    and count applied changes in a generation number. Inside a
+    transaction the changes are only queued, so the mirror is dropped
+    instead of updated and the next use reads the device.
+    """
+    mirrors = {}
+    delta_unsupported = set()
+    mirrors_lock = threading.Lock()
+
+    def __init__(self, bigip, label, query_exception, update_exception):
+        self.bigip = bigip
+        self.label = label
+        self.query_exception = query_exception
+        self.update_exception = update_exception
+
+    @staticmethod
+    def get_mirror(hostname, folder, tunnel_name):
+        """ Get the shared mirror of a device tunnel """
+        key = (hostname, folder, tunnel_name)
+        with FdbSync.mirrors_lock:
+            if key not in FdbSync.mirrors:
+                FdbSync.mirrors[key] = TunnelMirror()
+            return FdbSync.mirrors[key]
+
+    def get_records(self, tunnel_name, folder='Common'):
+        """ Get {mac: endpoint} of a tunnel, None if no tunnel """
+        mirror = FdbSync.get_mirror(self.bigip.hostname, folder, tunnel_name)
+        with mirror.lock:
+            if mirror.is_stale() and not self._resync(mirror, tunnel_name,
+                                                      folder):
+                return None
+            return dict(mirror.records)
+
+    def get_generation(self, tunnel_name, folder='Common'):
+        """ Number of changes applied to the tunnel mirror """
+        return FdbSync.get_mirror(
+            self.bigip.hostname, folder, tunnel_name).generation
+
+    def apply(self, tunnel_name, folder='Common', add=None, remove=None):
+        """
+        Add or update {mac: endpoint} records and remove macs.
+        Returns ({new mac: endpoint}, {changed mac: endpoint},
+        [removed mac]) or None if the tunnel does not exist.
+        """
+        mirror = FdbSync.get_mirror(self.bigip.hostname, folder, tunnel_name)
+        with mirror.lock:
+            if mirror.is_stale() and not self._resync(mirror, tunnel_name,
+                                                      folder):
+                return None
+            (added, changed, removed) = \
+                _get_delta(mirror.records, add or {}, remove or [])
+            if not (added or changed or removed):
+                return (added, changed, removed)
+            tunnel_url = self._tunnel_url(tunnel_name, folder)
+            if not self._push_delta(tunnel_url, added, changed, removed,
+                                    len(mirror.records)):
+                # mirror drifted from the device, merge the
+                # changes with the device records instead
+                if not self._resync(mirror, tunnel_name, folder):
+                    return None
+                (added, changed, removed) = \
+                    _get_delta(mirror.records, add or {}, remove or [])
+                if added or changed or removed:
+                    records = dict(mirror.records)
+                    _apply_delta(records, added, changed, removed)
+                    self._put_records(tunnel_url, records)
+            if self.bigip.icr_session.transaction_id:
+                mirror.records = None
+            else:
+                _apply_delta(mirror.records, added, changed, removed)
+            mirror.generation += 1
+            return (added, changed, removed)
+
+    def replace(self, tunnel_name, folder='Common', records=None):
+        """ Replace all records of a tunnel with {mac: endpoint} """
+        mirror = FdbSync.get_mirror(self.bigip.hostname, folder, tunnel_name)
+        with mirror.lock:
+            self._put_records(self._tunnel_url(tunnel_name, folder),
+                              records or {})
+            if self.bigip.icr_session.transaction_id:
+                mirror.records = None
+            else:
+                mirror.records = dict(records or {})
+                mirror.synced_at = time.time()
+            mirror.generation += 1
+
+    def seed(self, tunnel_name, folder='Common', records=None):
+        """ Set the mirror from {mac: endpoint} read in bulk """
+        mirror = FdbSync.get_mirror(self.bigip.hostname, folder, tunnel_name)
+        with mirror.lock:
+            mirror.records = dict(records or {})
+            mirror.synced_at = time.time()
+
+    def invalidate(self, tunnel_name, folder='Common'):
+        """ Drop the mirror so the next use reads the device """
+        mirror = FdbSync.get_mirror(self.bigip.hostname, folder, tunnel_name)
+        with mirror.lock:
+            mirror.records = None
+
+    def _tunnel_url(self, tunnel_name, folder):
+        """ REST URL of a tunnel's FDB """
+        request_url = self.bigip.icr_url + '/net/fdb/tunnel/'
+        request_url += '~' + folder + '~' + tunnel_name
+        return request_url
+
+    def _resync(self, mirror, tunnel_name, folder):
+        """ Read the device records into the mirror """
+        response = self.bigip.icr_session.get(
+            self._tunnel_url(tunnel_name, folder) + '?$select=records',
+            timeout=const.CONNECTION_TIMEOUT)
+        if response.status_code < 400:
+            mirror.records = {}
+            for record in json.loads(response.text).get('records', []):
+                mirror.records[record['name']] = record.get('endpoint')
+            mirror.synced_at = time.time()
+            return True
+        elif response.status_code == 404:
+            mirror.records = None
+            return False
+        Log.error(self.label, response.text)
+        raise self.query_exception(response.text)
+
+    def _push_delta(self, tunnel_url, added, changed, removed, size):
+        """ Send record changes, False if they could not be applied """
+        if self.bigip.hostname in FdbSync.delta_unsupported or \
+                len(added) + len(changed) + len(removed) > \
+                min(const.FDB_SYNC_MAX_DELTA, size):
+            return False
+        records_url = tunnel_url + '/records'
+        for mac in added:
+            payload = dict()
+            payload['name'] = mac
+            payload['endpoint'] = added[mac]
+            response = self.bigip.icr_session.post(
+                records_url, data=json.dumps(payload),
+                timeout=const.CONNECTION_TIMEOUT)
+            if not self._check_delta(response):
+                return False
+        for mac in changed:
+            payload = dict()
+            payload['endpoint'] = changed[mac]
+            response = self.bigip.icr_session.put(
+                records_url + '/' + urllib.quote(mac),
+                data=json.dumps(payload),
+                timeout=const.CONNECTION_TIMEOUT)
+            if not self._check_delta(response):
+                return False
+        for mac in removed:
+            response = self.bigip.icr_session.delete(
+                records_url + '/' + urllib.quote(mac),
+                timeout=const.CONNECTION_TIMEOUT)
+            if not self._check_delta(response):
+                return False
+        return True
+
+    def _check_delta(self, response):
+        """ Was a record request applied? """
+        if response.status_code < 400:
+            return True
+        if response.status_code in [405, 501]:
+            # no records subcollection on this TMOS version
+            FdbSync.delta_unsupported.add(self.bigip.hostname)
+        Log.debug(self.label, 'FDB record delta failed, resyncing: %s'
+                  % response.text)
+        return False
+
+    def _put_records(self, tunnel_url, records):
+        """ Write the full record list of a tunnel """
+        payload = dict()
+        payload['records'] = [{'name': mac, 'endpoint': records[mac]}
+                              for mac in sorted(records)] or None
+        response = self.bigip.icr_session.put(
+            tunnel_url, data=json.dumps(payload),
+            timeout=const.CONNECTION_TIMEOUT)
+        if response.status_code >= 400:
+            Log.error(self.label, response.text)
+            raise self.update_exception(response.text)
+
+
+class FdbWriteQueue(object):
+    """
+    Write-behind queue of tunnel FDB updates.
+
+    add_fdb_entries and delete_fdb_entries take the same fdb_entries
+    as the vxlan and l2gre interfaces and are coalesced per tunnel
+    and mac, the last update of a mac winning, so an add followed by
+    a delete of the same mac is sent as one delete, which the FDB
+    mirror drops if the device never had the entry. Updates are
+    flushed by a background thread FDB_QUEUE_WINDOW seconds after the
+    first queued update, as one add and one delete call per tunnel
+    type which also create and delete the static ARP entries. flush()
+    applies pending updates now. Once FDB_QUEUE_MAX_PENDING macs are
+    pending, the queuing caller flushes, throttling event storms to
+    the rate the device accepts them. A batch which fails is merged
+    back under any newer updates of the same macs and retried with
+    exponential backoff. Once stopped, updates are applied by the
+    queuing caller.
+    """
+    def __init__(self, bigip, window=None, max_pending=None):
+        self.bigip = bigip
+        self.window = window or const.FDB_QUEUE_WINDOW
+        self.max_pending = max_pending or const.FDB_QUEUE_MAX_PENDING
+        self.pending = {}
+        self.pending_count = 0
+        self.first_queued_at = None
+        self.queued = threading.Condition()
+        self.flush_lock = threading.Lock()
+        self.stopped = False
+        self.thread = None
+        self.failures = 0
+        self.retry_at = None
+
+    def add_fdb_entries(self, fdb_entries=None, tunnel_type='vxlan'):
+        """ Queue fdb entries to add """
+        self._enqueue(tunnel_type, fdb_entries, 'add')
+
+    def delete_fdb_entries(self, fdb_entries=None, tunnel_type='vxlan'):
+        """ Queue fdb entries to delete """
+        self._enqueue(tunnel_type, fdb_entries, 'delete')
+
+    def get_pending_count(self):
+        """ Number of macs waiting to be flushed """
+        with self.queued:
+            return self.pending_count
+
+    def flush(self):
+        """ Apply pending updates now """
+        with self.flush_lock:
+            with self.queued:
+                batch = self.pending
+                self.pending = {}
+                self.pending_count = 0
+                self.first_queued_at = None
+            try:
+                self._apply(batch)
+            except Exception:
+                self._requeue(batch)
+                raise
+            with self.queued:
+                self.failures = 0
+                self.retry_at = None
+
+    def stop(self):
+        """ Flush pending updates and stop the flush thread """
+        with self.queued:
+            self.stopped = True
+            self.queued.notify_all()
+        self.flush()
+
+    def _enqueue(self, tunnel_type, fdb_entries, operation):
+        """ Merge updates into the pending tunnel records """
+        if not fdb_entries:
+            return
+        with self.queued:
+            for tunnel_name in fdb_entries:
+                tunnel = self.pending.setdefault(
+                    (tunnel_type, tunnel_name),
+                    {'folder': fdb_entries[tunnel_name]['folder'],
+                     'records': {}})
+                tunnel_records = fdb_entries[tunnel_name]['records']
+                for mac in tunnel_records:
+                    if mac not in tunnel['records']:
+                        self.pending_count += 1
+                    tunnel['records'][mac] = (operation, tunnel_records[mac])
+            if self.first_queued_at is None:
+                self.first_queued_at = time.time()
+            if not self.stopped and \
+                    (self.thread is None or not self.thread.is_alive()):
+                self.thread = threading.Thread(
+                    target=self._run,
+                    name='fdb-queue-' + str(self.bigip.hostname))
+                self.thread.daemon = True
+                self.thread.start()
+            self.queued.notify_all()
+            overrun = self.stopped or self.pending_count >= self.max_pending
+        if overrun:
+            self.flush()
+
+    def _requeue(self, batch):
+        """ Merge a failed batch back under newer updates """
+        with self.queued:
+            for key in batch:
+                tunnel = self.pending.setdefault(
+                    key, {'folder': batch[key]['folder'], 'records': {}})
+                for mac in batch[key]['records']:
+                    if mac not in tunnel['records']:
+                        tunnel['records'][mac] = batch[key]['records'][mac]
+                        self.pending_count += 1
+            if self.first_queued_at is None:
+                self.first_queued_at = time.time()
+            self.retry_at = time.time() + min(
+                const.FDB_QUEUE_RETRY_MAX,
+                const.FDB_QUEUE_RETRY_BASE * (2 ** self.failures))
+            self.failures += 1
+            self.queued.notify_all()
+
+    def _run(self):
+        """ Flush updates once they waited the window """
+        while True:
+            with self.queued:
+                while not self.stopped and self.first_queued_at is None:
+                    self.queued.wait()
+                if self.stopped:
+                    return
+                flush_at = self.first_queued_at + self.window
+                if self.retry_at is not None:
+                    flush_at = max(flush_at, self.retry_at)
+                remaining = flush_at - time.time()
+                if remaining > 0:
+                    self.queued.wait(remaining)
+                    continue
+            try:
+                self.flush()
+            except Exception as exc:
+                Log.error('fdb', 'FDB queue flush failed, retrying: %s'
+                          % str(exc))
+
+    def _apply(self, batch):
+        """ Send merged updates with one call per tunnel type """
+        updates = {}
+        for (tunnel_type, tunnel_name) in batch:
+            tunnel = batch[(tunnel_type, tunnel_name)]
+            (adds, deletes) = updates.setdefault(tunnel_type, ({}, {}))
+            for mac in tunnel['records']:
+                (operation, record) = tunnel['records'][mac]
+                if operation == 'add':
+                    entries = adds
+                else:
+                    entries = deletes
+                entries.setdefault(
+                    tunnel_name, {'folder': tunnel['folder'],
+                                  'records': {}})['records'][mac] = record
+        for tunnel_type in updates:
+            interface = getattr(self.bigip, tunnel_type)
+            (adds, deletes) = updates[tunnel_type]
+            if deletes:
+                interface.delete_fdb_entries(fdb_entries=deletes)
+            if adds:
+                interface.add_fdb_entries(fdb_entries=adds)
+
+
+def _get_delta(records, add, remove):
+    """ Get (new, changed, removed) against the mirrored records """
+    added = {}
+    changed = {}
+    for mac in add:
+        if mac not in records:
+            added[mac] = add[mac]
+        elif records[mac] != add[mac]:
+            changed[mac] = add[mac]
+    removed = [mac for mac in set(remove) - set(add) if mac in records]
+    return (added, changed, removed)
+
+
+def _apply_delta(records, added, changed, removed):
+    """ Apply a delta to {mac: endpoint} records """
+    records.update(added)
+    records.update(changed)
+    for mac in removed:
+        del records[mac]
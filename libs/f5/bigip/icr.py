@@ -0,0 +1,597 @@
+# Copyright 2014 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5.common.logger import Log
+from f5.common import constants as const
+from f5.common.metrics import REGISTRY
+from f5.bigip import exceptions
+
+import json
+import random
+import threading
+import time
+
+from requests.adapters import HTTPAdapter
+from requests.auth import AuthBase
+from requests.auth import HTTPBasicAuth
+import requests
+
+WRITE_METHODS = ['POST', 'PUT', 'PATCH', 'DELETE']
+IDEMPOTENT_METHODS = ['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE']
+
+
+class RetryPolicy(object):
+    """ Retry with exponential backoff and full jitter
+
+    Idempotent requests are retried on connection errors, timeouts and
+    the retryable status codes. POST and PATCH are only retried when
+    the connection could not be made, since the device may already
+    have applied them otherwise.
+    """
+    def __init__(self, max_retries=None, backoff_base=None,
+                 backoff_max=None, status_codes=None):
+        if max_retries is None:
+            max_retries = const.ICR_RETRY_MAX
+        if backoff_base is None:
+            backoff_base = const.ICR_RETRY_BACKOFF_BASE
+        if backoff_max is None:
+            backoff_max = const.ICR_RETRY_BACKOFF_MAX
+        if status_codes is None:
+            status_codes = const.ICR_RETRY_STATUS_CODES
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.status_codes = status_codes
+
+    def retry_exception(self, method, exc, attempt):
+        """ Should request be retried after exception? """
+        if attempt >= self.max_retries:
+            return False
+        if isinstance(exc, requests.exceptions.ConnectTimeout):
+            return True
+        if method in IDEMPOTENT_METHODS:
+            return isinstance(exc, (requests.exceptions.ConnectionError,
+                                    requests.exceptions.Timeout))
+        return False
+
+    def retry_status(self, method, status_code, attempt):
+        """ Should request be retried after response status? """
+        if attempt >= self.max_retries:
+            return False
+        return method in IDEMPOTENT_METHODS and \
+            status_code in self.status_codes
+
+    def backoff(self, attempt, response=None):
+        """ Seconds to sleep before the next attempt """
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        if response is not None:
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                return min(self.backoff_max, int(retry_after))
+        return random.uniform(0, delay)
+
+
+class CircuitBreaker(object):
+    """ Fail fast while a device is unhealthy
+
+    After failure_threshold consecutive failures (connection errors or
+    5xx) the breaker opens and requests raise immediately. Once
+    reset_timeout has passed one probe request is let through; its
+    success closes the breaker, its failure opens it again.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    # breakers are shared by every session to the same device
+    breakers = {}
+    breakers_lock = threading.Lock()
+
+    def __init__(self, hostname, failure_threshold=None, reset_timeout=None):
+        if failure_threshold is None:
+            failure_threshold = const.ICR_BREAKER_FAILURE_THRESHOLD
+        if reset_timeout is None:
+            reset_timeout = const.ICR_BREAKER_RESET_TIMEOUT
+        self.hostname = hostname
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CircuitBreaker.CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self.probing = False
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def for_device(hostname):
+        """ Get the shared breaker for a device """
+        with CircuitBreaker.breakers_lock:
+            if hostname not in CircuitBreaker.breakers:
+                CircuitBreaker.breakers[hostname] = CircuitBreaker(hostname)
+            return CircuitBreaker.breakers[hostname]
+
+    def before_request(self):
+        """ Raise if requests to the device should fail fast """
+        with self.lock:
+            if self.state == CircuitBreaker.CLOSED:
+                return
+            if self.state == CircuitBreaker.OPEN and \
+               time.time() - self.opened_at >= self.reset_timeout:
+                self.state = CircuitBreaker.HALF_OPEN
+                self.probing = False
+            if self.state == CircuitBreaker.HALF_OPEN and not self.probing:
+                self.probing = True
+                return
+        raise exceptions.BigIPDeviceUnavailable(
+            'circuit open for %s after %d failures'
+            % (self.hostname, self.failures))
+
+    def record_success(self):
+        """ Device answered """
+        with self.lock:
+            if self.state != CircuitBreaker.CLOSED:
+                Log.info('icr', 'circuit closed for %s' % self.hostname)
+            self.state = CircuitBreaker.CLOSED
+            self.failures = 0
+            self.probing = False
+
+    def release_probe(self):
+        """ Request ended without a device answer or failure """
+        with self.lock:
+            self.probing = False
+
+    def record_failure(self):
+        """ Device failed to answer """
+        with self.lock:
+            self.failures += 1
+            if self.state == CircuitBreaker.HALF_OPEN or \
+               self.failures >= self.failure_threshold:
+                if self.state != CircuitBreaker.OPEN:
+                    Log.error('icr', 'circuit opened for %s'
+                              % self.hostname)
+                self.state = CircuitBreaker.OPEN
+                self.opened_at = time.time()
+                self.probing = False
+
+
+class RequestBudget(object):
+    """ Concurrency and rate budget for one kind of request """
+    def __init__(self, max_concurrent, max_per_second):
+        self.max_concurrent = max_concurrent
+        self.max_per_second = max_per_second
+        self.condition = threading.Condition(threading.Lock())
+        self.in_flight = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.total = 0
+        self.tokens = float(max_per_second)
+        self.refilled_at = time.time()
+
+    def acquire(self):
+        """ Block until a request may be sent """
+        with self.condition:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+            while self.max_concurrent and \
+                    self.in_flight >= self.max_concurrent:
+                self.condition.wait()
+            self.in_flight += 1
+            self.waiting -= 1
+            self.total += 1
+        delay = self._take_token()
+        while delay > 0:
+            time.sleep(delay)
+            delay = self._take_token()
+
+    def release(self):
+        """ Request finished """
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify()
+
+    def _take_token(self):
+        """ Take a rate token, returns seconds to wait if none """
+        if not self.max_per_second:
+            return 0
+        with self.condition:
+            now = time.time()
+            self.tokens = min(float(self.max_per_second),
+                              self.tokens + (now - self.refilled_at) *
+                              self.max_per_second)
+            self.refilled_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.max_per_second
+
+    def get_metrics(self):
+        """ Get budget usage """
+        with self.condition:
+            return {'in_flight': self.in_flight,
+                    'queue_depth': self.waiting,
+                    'max_queue_depth': self.max_waiting,
+                    'total': self.total,
+                    'max_concurrent': self.max_concurrent,
+                    'max_per_second': self.max_per_second}
+
+
+class RequestLimiter(object):
+    """ Per device client side throttle
+
+    Shared by every session in the process which targets the same
+    host, with separate budgets for reads and writes. A limit of 0
+    means unlimited.
+    """
+    limiters = {}
+    limiters_lock = threading.Lock()
+
+    def __init__(self, max_reads=None, max_writes=None,
+                 max_reads_per_second=None, max_writes_per_second=None):
+        if max_reads is None:
+            max_reads = const.ICR_MAX_CONCURRENT_READS
+        if max_writes is None:
+            max_writes = const.ICR_MAX_CONCURRENT_WRITES
+        if max_reads_per_second is None:
+            max_reads_per_second = const.ICR_MAX_READS_PER_SECOND
+        if max_writes_per_second is None:
+            max_writes_per_second = const.ICR_MAX_WRITES_PER_SECOND
+        self.read = RequestBudget(max_reads, max_reads_per_second)
+        self.write = RequestBudget(max_writes, max_writes_per_second)
+
+    @staticmethod
+    def for_device(hostname):
+        """ Get the shared limiter for a device """
+        with RequestLimiter.limiters_lock:
+            if hostname not in RequestLimiter.limiters:
+                RequestLimiter.limiters[hostname] = RequestLimiter()
+            return RequestLimiter.limiters[hostname]
+
+    def get_budget(self, method):
+        """ Get budget for method """
+        if method in WRITE_METHODS:
+            return self.write
+        return self.read
+
+    def get_metrics(self):
+        """ Get read and write budget usage """
+        return {'read': self.read.get_metrics(),
+                'write': self.write.get_metrics()}
+
+
+class ICRSession(requests.Session):
+    """ Keep-alive iControl REST transport for a single device
+
+    All interface modules share one session per BigIP, so the adapter
+    pool holds warm TLS connections to the management plane which
+    concurrent workers reuse instead of handshaking per request.
+    """
+    def __init__(self, hostname=None, pool_maxsize=None, pool_block=None,
+                 retry_policy=None):
+        super(ICRSession, self).__init__()
+        if not pool_maxsize:
+            pool_maxsize = const.ICR_POOL_MAXSIZE
+        if pool_block is None:
+            pool_block = const.ICR_POOL_BLOCK
+        self.pool_maxsize = pool_maxsize
+        self.adapter = HTTPAdapter(pool_connections=1,
+                                   pool_maxsize=pool_maxsize,
+                                   pool_block=pool_block,
+                                   max_retries=0)
+        self.mount('https://', self.adapter)
+        self.verify = False
+        self.headers.update({'Content-Type': 'application/json',
+                             'Connection': 'keep-alive'})
+        # per thread transaction state
+        self.local = threading.local()
+        if not retry_policy:
+            retry_policy = RetryPolicy()
+        self.retry_policy = retry_policy
+        self.breaker = None
+        self.limiter = None
+        if hostname:
+            self.breaker = CircuitBreaker.for_device(hostname)
+            self.limiter = RequestLimiter.for_device(hostname)
+
+    @property
+    def transaction_id(self):
+        return getattr(self.local, 'transaction_id', None)
+
+    @transaction_id.setter
+    def transaction_id(self, transaction_id):
+        self.local.transaction_id = transaction_id
+
+    def after_commit(self, callback):
+        """ Call callback once the active transaction commits, or now """
+        if self.transaction_id:
+            self.local.commit_callbacks.append(callback)
+        else:
+            callback()
+
+    def request(self, method, url, **kwargs):
+        """ Send request and record its metrics """
+        method = method.upper()
+        if not REGISTRY.enabled:
+            return self._request(method, url, **kwargs)
+        start = time.time()
+        response = None
+        try:
+            response = self._request(method, url, **kwargs)
+            return response
+        finally:
+            bytes_sent = 0
+            if isinstance(kwargs.get('data'), basestring):
+                bytes_sent = len(kwargs['data'])
+            bytes_received = 0
+            if response is not None:
+                bytes_received = int(
+                    response.headers.get('Content-Length') or
+                    len(response.content))
+            REGISTRY.observe_request(
+                method, url, time.time() - start,
+                response is None or response.status_code >= 400,
+                bytes_sent, bytes_received)
+
+    def _request(self, method, url, **kwargs):
+        """ Send request applying transaction, retry and breaker """
+        transaction_id = self.transaction_id
+        if transaction_id and method in WRITE_METHODS and \
+           url.find('/mgmt/tm/transaction') < 0:
+            headers = dict(kwargs.get('headers') or {})
+            headers['X-F5-REST-Coordination-Id'] = str(transaction_id)
+            kwargs['headers'] = headers
+        attempt = 0
+        while True:
+            if self.breaker:
+                self.breaker.before_request()
+            response = None
+            budget = None
+            if self.limiter:
+                budget = self.limiter.get_budget(method)
+                budget.acquire()
+            try:
+                response = super(ICRSession, self).request(
+                    method, url, **kwargs)
+            except requests.exceptions.RequestException as exc:
+                if self.breaker:
+                    self.breaker.record_failure()
+                if not self.retry_policy.retry_exception(
+                        method, exc, attempt):
+                    raise
+                Log.debug('icr', '%s %s failed (%s), retrying',
+                          method, url, exc)
+            except BaseException:
+                # e.g. an auth hook failure, let the next request probe
+                if self.breaker:
+                    self.breaker.release_probe()
+                raise
+            else:
+                if self.breaker:
+                    if response.status_code >= 500:
+                        self.breaker.record_failure()
+                    else:
+                        self.breaker.record_success()
+                if not self.retry_policy.retry_status(
+                        method, response.status_code, attempt):
+                    return response
+                Log.debug('icr', '%s %s returned %d, retrying',
+                          method, url, response.status_code)
+                response.close()
+            finally:
+                if budget:
+                    budget.release()
+            time.sleep(self.retry_policy.backoff(attempt, response))
+            attempt += 1
+
+
+class Transaction(object):
+    """ iControl REST transaction context
+
+    Writes issued through the session while the context is active are
+    queued on the device under one transaction and committed in a
+    single request on exit. If the block raises, or the device fails
+    to validate the batch, the transaction is deleted and nothing is
+    applied. Reads are not part of the transaction and will not see
+    queued writes. Nested contexts join the outer transaction.
+    Callbacks registered with the session's after_commit run once
+    the outermost transaction commits and are dropped on rollback.
+    """
+    def __init__(self, bigip):
+        self.bigip = bigip
+        self.session = bigip.icr_session
+        self.transaction_url = bigip.icr_url + '/transaction'
+        self.transaction_id = None
+        self.nested = False
+
+    def __enter__(self):
+        if self.session.transaction_id:
+            self.nested = True
+            self.transaction_id = self.session.transaction_id
+            return self
+        response = self.session.post(
+            self.transaction_url, data=json.dumps({}),
+            timeout=const.CONNECTION_TIMEOUT)
+        if response.status_code < 400:
+            response_obj = json.loads(response.text)
+            self.transaction_id = response_obj['transId']
+            self.session.transaction_id = self.transaction_id
+            self.session.local.commit_callbacks = []
+        else:
+            Log.error('transaction', response.text)
+            raise exceptions.TransactionCreationException(response.text)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.nested:
+            return False
+        self.session.transaction_id = None
+        callbacks = self.session.local.commit_callbacks
+        self.session.local.commit_callbacks = []
+        if exc_type:
+            self.rollback()
+            return False
+        self.commit()
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as exc:
+                # the transaction is applied, later work is best effort
+                Log.error('transaction', 'after commit failed: %s'
+                          % str(exc))
+        return False
+
+    def commit(self):
+        """ Commit queued commands in one request """
+        request_url = self.transaction_url + '/' + str(self.transaction_id)
+        payload = dict()
+        payload['state'] = 'VALIDATING'
+        response = self.session.patch(
+            request_url, data=json.dumps(payload),
+            timeout=const.CONNECTION_TIMEOUT)
+        if response.status_code < 400:
+            state = json.loads(response.text).get('state', 'COMPLETED')
+            attempts = 0
+            while state in ['STARTED', 'VALIDATING'] and \
+                  attempts < const.TRANSACTION_POLL_ATTEMPTS:
+                time.sleep(const.TRANSACTION_POLL_DELAY)
+                attempts += 1
+                response = self.session.get(
+                    request_url, timeout=const.CONNECTION_TIMEOUT)
+                if response.status_code >= 400:
+                    break
+                state = json.loads(response.text).get('state', 'COMPLETED')
+            if state == 'COMPLETED':
+                return True
+        Log.error('transaction', response.text)
+        self.rollback()
+        raise exceptions.TransactionUpdateException(response.text)
+
+    def rollback(self):
+        """ Discard queued commands """
+        request_url = self.transaction_url + '/' + str(self.transaction_id)
+        response = self.session.delete(
+            request_url, timeout=const.CONNECTION_TIMEOUT)
+        if response.status_code < 400 or response.status_code == 404:
+            return True
+        Log.error('transaction', response.text)
+        return False
+
+
+def _no_auth(request):
+    """ Override session auth for login requests """
+    return request
+
+
+class TokenAuth(AuthBase):
+    """ iControl REST token authentication
+
+    Logs in once against /mgmt/shared/authn/login and sends the
+    returned X-F5-Auth-Token on every request instead of basic auth.
+    The token is refreshed shortly before it expires and a 401 from
+    the device triggers one transparent re-login and resend. Devices
+    which do not provide the authn service fall back to basic auth.
+    """
+    def __init__(self, hostname, username, password,
+                 login_provider=const.ICR_TOKEN_LOGIN_PROVIDER,
+                 session=None):
+        self.session = session
+        self.hostname = hostname
+        self.username = username
+        self.password = password
+        self.login_provider = login_provider
+        self.login_url = 'https://%s/mgmt/shared/authn/login' % hostname
+        self.token = None
+        self.expiration = 0
+        self.basic_auth = None
+        self.lock = threading.Lock()
+
+    def __call__(self, request):
+        if self.basic_auth:
+            return self.basic_auth(request)
+        token = self.get_token()
+        if not token:
+            return self.basic_auth(request)
+        request.headers['X-F5-Auth-Token'] = token
+        request.register_hook('response', self._handle_401)
+        return request
+
+    def get_token(self, refresh=False):
+        """ Get valid token, logging in if needed """
+        with self.lock:
+            if refresh or not self.token or \
+               time.time() >= self.expiration:
+                self._login()
+            return self.token
+
+    def invalidate(self, token=None):
+        """ Forget token so the next request logs in again """
+        with self.lock:
+            if token is None or token == self.token:
+                self.token = None
+                self.expiration = 0
+
+    def _login(self):
+        """ Login and store token """
+        payload = dict()
+        payload['username'] = self.username
+        payload['password'] = self.password
+        payload['loginProviderName'] = self.login_provider
+        if self.session:
+            # bypass the session limiter, the login runs while the
+            # request which needs the token holds a request slot
+            response = requests.Session.request(
+                self.session, 'POST', self.login_url,
+                data=json.dumps(payload), auth=_no_auth,
+                timeout=const.CONNECTION_TIMEOUT)
+        else:
+            response = requests.post(
+                self.login_url, data=json.dumps(payload),
+                headers={'Content-Type': 'application/json'},
+                verify=False, timeout=const.CONNECTION_TIMEOUT)
+        if response.status_code < 400:
+            response_obj = json.loads(response.text)
+            token = response_obj['token']
+            lifetime = int(token.get('timeout', const.ICR_TOKEN_TIMEOUT))
+            self.token = token['token']
+            self.expiration = time.time() + lifetime - \
+                const.ICR_TOKEN_REFRESH_MARGIN
+        elif response.status_code == 404:
+            Log.info('icr', 'token login not supported on %s, '
+                            'using basic auth' % self.hostname)
+            self.token = None
+            self.basic_auth = HTTPBasicAuth(self.username, self.password)
+        else:
+            Log.error('icr', response.text)
+            raise exceptions.BigIPAuthenticationFailure(response.text)
+
+    def _handle_401(self, response, **kwargs):
+        """ Re-login once and resend request on 401 """
+        request = response.request
+        if response.status_code != 401 or \
+           getattr(request, 'token_retried', False):
+            return response
+        self.invalidate(request.headers.get('X-F5-Auth-Token'))
+        token = self.get_token()
+        if not token:
+            return response
+
+        # release the connection before resending
+        response.content
+        response.close()
+        retry = request.copy()
+        retry.token_retried = True
+        retry.headers['X-F5-Auth-Token'] = token
+        retry_response = response.connection.send(retry, **kwargs)
+        retry_response.history.append(response)
+        retry_response.request = retry
+        return retry_response
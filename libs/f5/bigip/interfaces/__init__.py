@@ -14,9 +14,16 @@
 # limitations under the License.
 #
 
+from f5.common import constants as const
+from f5.common.logger import Log
+from f5.common.metrics import REGISTRY
+
+import inspect
 import netaddr
 import os
 import logging
+import socket
+import time
 
 OBJ_PREFIX = 'uuid_'
 
@@ -30,6 +37,118 @@ def prefixed(name):
     return name
 
 
+class NormalizeCache(object):
+    """
+    Bounded cache of normalized folder and name values.
+
+    Approximates LRU with two generations. Hits in the older
+    generation are promoted and when the recent generation is
+    full the older one is dropped.
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.recent = {}
+        self.older = {}
+
+    def get(self, key):
+        """ Get cached value or None """
+        value = self.recent.get(key)
+        if value is None:
+            value = self.older.get(key)
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        """ Cache value """
+        if len(self.recent) >= self.maxsize / 2:
+            self.older = self.recent
+            self.recent = {}
+        self.recent[key] = value
+
+    def clear(self):
+        """ Drop all values """
+        self.recent = {}
+        self.older = {}
+
+
+NORMALIZE_CACHE = NormalizeCache(const.NORMALIZE_CACHE_SIZE)
+
+
+def _normalize_folder(folder):
+    """ Base name of folder with object prefix unless Common """
+    key = ('folder', OBJ_PREFIX, folder)
+    value = NORMALIZE_CACHE.get(key)
+    if value is None:
+        value = os.path.basename(folder.replace('~', '/'))
+        if not value == 'Common':
+            value = prefixed(value)
+        NORMALIZE_CACHE.put(key, value)
+    return value
+
+
+def _normalize_name(name, use_prefix=True):
+    """ Base name of object with object prefix """
+    key = ('name', OBJ_PREFIX, name, use_prefix)
+    value = NORMALIZE_CACHE.get(key)
+    if value is None:
+        value = os.path.basename(name.replace('~', '/'))
+        if use_prefix:
+            value = prefixed(value)
+        NORMALIZE_CACHE.put(key, value)
+    return value
+
+
+def _folder_path(name, folder):
+    """ Full path of name in folder, as BigIP.set_folder returns """
+    key = ('path', name, folder)
+    value = NORMALIZE_CACHE.get(key)
+    if value is None:
+        if not folder.startswith('/'):
+            folder = '/' + folder
+        if not name.startswith(folder + '/'):
+            value = folder + '/' + name
+        else:
+            value = name
+        NORMALIZE_CACHE.put(key, value)
+    return value
+
+
+class _Signature(object):
+    """
+    Precomputed kwarg handling for a decorated method.
+
+    Finds the '_folder' and '_name' arguments of the undecorated
+    method once. Methods taking **kwargs classify the passed
+    argument names on each call instead.
+    """
+    def __init__(self, method):
+        while hasattr(method, 'undecorated'):
+            method = method.undecorated
+        (args, _, varkw, _) = inspect.getargspec(method)
+        self.dynamic = bool(varkw)
+        (self.sub_folders, self.sub_names) = self.classify(args)
+
+    @staticmethod
+    def classify(names):
+        """ Get '_folder' names and ('_name', its '_folder') pairs """
+        sub_folders = []
+        sub_names = []
+        for name in names:
+            if name.find('_folder') > 0:
+                sub_folders.append(name)
+            if name.find('_name') > 0:
+                sub_names.append(
+                    (name, name[0:name.index('_name')] + '_folder'))
+        return (sub_folders, sub_names)
+
+    def get(self, kwargs):
+        """ Get '_folder' and '_name' handling for this call """
+        if self.dynamic:
+            return self.classify(kwargs.keys())
+        return (self.sub_folders, self.sub_names)
+
+
 def icontrol_folder(method):
     """
     Returns the iControl folder + object name if
@@ -47,80 +166,74 @@ def icontrol_folder(method):
 
     If the value in the name already includes '/Common/' the
     decoration honors that full path.
+
+    Normalized values are cached and each distinct folder is
+    set once, ending with the folder kwarg. The active folder is
+    session state, so the call holds the bigip SOAP lock.
     """
+    signature = _Signature(method)
+
     def wrapper(*args, **kwargs):
         """ Necessary wrapper """
+        with args[0].bigip.soap_lock:
+            return call(*args, **kwargs)
+
+    def call(*args, **kwargs):
+        """ Set the active folder and call method """
         instance = args[0]
         preserve_vlan_name = False
         if 'preserve_vlan_name' in kwargs:
             preserve_vlan_name = kwargs['preserve_vlan_name']
         if 'folder' in kwargs and kwargs['folder']:
-            if kwargs['folder'].find('~') > -1:
-                kwargs['folder'] = kwargs['folder'].replace('~', '/')
-            kwargs['folder'] = os.path.basename(kwargs['folder'])
-            if not kwargs['folder'] == 'Common':
-                kwargs['folder'] = prefixed(kwargs['folder'])
+            (sub_folders, sub_names) = signature.get(kwargs)
+            folder = _normalize_folder(kwargs['folder'])
+            kwargs['folder'] = folder
+            used_folders = []
             if 'name' in kwargs and kwargs['name']:
                 if isinstance(kwargs['name'], basestring):
-                    if kwargs['name'].find('~') > -1:
-                        kwargs['name'] = kwargs['name'].replace('~', '/')
-                    if kwargs['name'].startswith('/Common/'):
-                        kwargs['name'] = os.path.basename(kwargs['name'])
-                        kwargs['name'] = prefixed(kwargs['name'])
-                        kwargs['name'] = instance.bigip.set_folder(
-                            kwargs['name'], 'Common')
-                    else:
-                        kwargs['name'] = os.path.basename(kwargs['name'])
-                        kwargs['name'] = prefixed(kwargs['name'])
-                        kwargs['name'] = instance.bigip.set_folder(
-                            kwargs['name'], kwargs['folder'])
+                    name_folder = folder
+                    if kwargs['name'].replace('~', '/').startswith(
+                            '/Common/'):
+                        name_folder = 'Common'
+                    kwargs['name'] = _folder_path(
+                        _normalize_name(kwargs['name']), name_folder)
+                    used_folders.append(name_folder)
             if 'named_address' in kwargs and kwargs['named_address']:
                 if isinstance(kwargs['name'], basestring):
-                    if kwargs['named_address'].find('~') > -1:
-                        kwargs['named_address'] = \
-                            kwargs['named_address'].replace('~', '/')
-                    if kwargs['named_address'].startswith('/Common/'):
-                        kwargs['named_address'] = \
-                            os.path.basename(kwargs['named_address'])
-                        kwargs['named_address'] = \
-                            instance.bigip.set_folder(kwargs['named_address'],
-                                                      'Common')
-                    else:
-                        kwargs['named_address'] = \
-                            os.path.basename(kwargs['named_address'])
-                        kwargs['named_address'] = \
-                            instance.bigip.set_folder(kwargs['named_address'],
-                                                      kwargs['folder'])
-            for name in kwargs:
-                if name.find('_folder') > 0 and kwargs[name]:
-                    if kwargs[name].find('~') > -1:
-                        kwargs[name] = kwargs[name].replace('~', '/')
-                    kwargs[name] = os.path.basename(kwargs[name])
-                    if not kwargs[name] == 'Common':
-                        kwargs[name] = prefixed(kwargs[name])
-                if name.find('_name') > 0 and kwargs[name]:
+                    address_folder = folder
+                    if kwargs['named_address'].replace('~', '/').startswith(
+                            '/Common/'):
+                        address_folder = 'Common'
+                    kwargs['named_address'] = _folder_path(
+                        _normalize_name(kwargs['named_address'], False),
+                        address_folder)
+                    used_folders.append(address_folder)
+            for name in sub_folders:
+                if name in kwargs and kwargs[name]:
+                    kwargs[name] = _normalize_folder(kwargs[name])
+            for (name, specific_folder_name) in sub_names:
+                if name in kwargs and kwargs[name]:
                     if isinstance(kwargs['name'], basestring):
-                        if kwargs[name].find('~') > -1:
-                            kwargs[name] = kwargs[name].replace('~', '/')
-                        if kwargs[name].startswith('/Common/'):
-                            kwargs[name] = os.path.basename(kwargs[name])
-                            if name != 'vlan_name' or not preserve_vlan_name:
-                                kwargs[name] = prefixed(kwargs[name])
-                            kwargs[name] = instance.bigip.set_folder(
-                                kwargs[name], 'Common')
-                        else:
-                            name_prefix = name[0:name.index('_name')]
-                            specific_folder_name = name_prefix + "_folder"
-                            folder = kwargs['folder']
-                            if specific_folder_name in kwargs:
-                                folder = kwargs[specific_folder_name]
-                            kwargs[name] = os.path.basename(kwargs[name])
-                            if name != 'vlan_name' or not preserve_vlan_name:
-                                kwargs[name] = prefixed(kwargs[name])
-                            kwargs[name] = instance.bigip.set_folder(
-                                kwargs[name], folder)
-            instance.bigip.set_folder(None, kwargs['folder'])
+                        use_prefix = name != 'vlan_name' or \
+                            not preserve_vlan_name
+                        name_folder = folder
+                        if kwargs[name].replace('~', '/').startswith(
+                                '/Common/'):
+                            name_folder = 'Common'
+                        elif specific_folder_name in kwargs:
+                            name_folder = kwargs[specific_folder_name]
+                        kwargs[name] = _folder_path(
+                            _normalize_name(kwargs[name], use_prefix),
+                            name_folder)
+                        used_folders.append(name_folder)
+            # only the last active folder matters, but setting each
+            # folder still validates that it exists
+            for name_folder in set(used_folders):
+                if name_folder != folder:
+                    instance.bigip.set_folder(None, name_folder)
+            instance.bigip.set_folder(None, folder)
         return method(*args, **kwargs)
+    wrapper.undecorated = method
     return wrapper
 
 
@@ -131,7 +244,12 @@ def icontrol_rest_folder(method):
 
     The folder and the name will be prefixed with the global
     prefix OBJ_PREFIX.
+
+    Normalized values are cached and the '_folder' and '_name'
+    arguments are found once per method.
     """
+    signature = _Signature(method)
+
     def wrapper(*args, **kwargs):
         """ Necessary wrapper """
         preserve_vlan_name = False
@@ -144,33 +262,30 @@ def icontrol_rest_folder(method):
         # / in the name at all) and then use a common prefix.
         if 'folder' in kwargs and kwargs['folder']:
             if kwargs['folder'] != '/' and kwargs['folder'].find('Common') < 0:
-                temp = kwargs['folder'].replace('~', '/')
-                kwargs['folder'] = prefixed(os.path.basename(temp))
+                kwargs['folder'] = _normalize_folder(kwargs['folder'])
         if 'name' in kwargs and kwargs['name']:
             if isinstance(kwargs['name'], basestring):
-                temp = kwargs['name'].replace('~', '/')
-                kwargs['name'] = prefixed(os.path.basename(temp))
+                kwargs['name'] = _normalize_name(kwargs['name'])
             else:
                 LOG.warn('attempting to normalize non basestring name. '
                          'Argument: val: ' + str(kwargs['name']))
 
-        for name in kwargs:
-            if name.find('_folder') > 0 and kwargs[name]:
-                kwargs[name] = kwargs[name].replace('~', '/')
-                kwargs[name] = os.path.basename(kwargs[name])
-                if not kwargs[name] == 'Common':
-                    kwargs[name] = prefixed(kwargs[name])
-            if name.find('_name') > 0 and kwargs[name]:
+        (sub_folders, sub_names) = signature.get(kwargs)
+        for name in sub_folders:
+            if name in kwargs and kwargs[name]:
+                kwargs[name] = _normalize_folder(kwargs[name])
+        for (name, _) in sub_names:
+            if name in kwargs and kwargs[name]:
                 if isinstance(kwargs[name], basestring):
-                    kwargs[name] = kwargs[name].replace('~', '/')
-                    kwargs[name] = os.path.basename(kwargs[name])
-                    if name != 'vlan_name' or not preserve_vlan_name:
-                        kwargs[name] = prefixed(kwargs[name])
+                    kwargs[name] = _normalize_name(
+                        kwargs[name],
+                        name != 'vlan_name' or not preserve_vlan_name)
                 else:
                     LOG.warn('attempting to normalize non basestring name. '
                              ' Argument: name: ' + str(name) +
                              ' val:' + str(kwargs[name]))
         return method(*args, **kwargs)
+    wrapper.undecorated = method
     return wrapper
 
 
@@ -213,79 +328,88 @@ def domain_address(method):
         folder = 'Common'
         # discover the folder add global prefix
         if 'folder' in kwargs and kwargs['folder']:
-            folder = os.path.basename(kwargs['folder'])
-            if not folder == 'Common':
-                folder = prefixed(folder)
+            folder = _normalize_folder(kwargs['folder'])
+        # route domain ID by folder, looked up once per call
+        domain_ids = {}
+
+        def get_domain_id(address_folder):
+            """ Get route domain ID of folder """
+            if address_folder not in domain_ids:
+                domain_ids[address_folder] = \
+                    instance.bigip.get_domain_index(address_folder)
+            return domain_ids[address_folder]
+
         # iterate through kwargs
         for name in kwargs:
             # validate netmask IP formatting
             if name.find('mask') > -1:
                 if isinstance(kwargs[name], list):
-                    for mask in kwargs[name]:
-                        netaddr.IPAddress(mask)
-                else:
-                    if kwargs[name]:
-                        netaddr.IPAddress(kwargs[name])
+                    validate_addresses(kwargs[name])
+                elif kwargs[name]:
+                    validate_addresses([kwargs[name]])
             # find any argument ending in ip_address
-            if name.find('ip_address') > -1:
-                # if it has a value process the route domain ID
-                if kwargs[name]:
-
-                    # if this name has _ip_address in it, check
-                    # for _folder argument with the same prefix.
-                    # if found use that argument to overwrite
-                    # the folder argument
-                    if name.find('_ip_address') > -1:
-                        name_prefix = name[0:name.index('_ip_address')]
-                        specific_folder_name = name_prefix + "_folder"
-                        # do we also find another kwargs with a
-                        # folder name for this _ip_address argument
-                        if specific_folder_name in kwargs:
-                            folder = kwargs[specific_folder_name]
-
-                    # handle if they passed in a list of value
-                    if isinstance(kwargs[name], list):
-                        return_list = []
-                        for address in kwargs[name]:
-                            decorator_index = address.find('%')
-                            if decorator_index < 0:
-                                # validate address format
-                                netaddr.IPAddress(address)
-                                if instance.bigip.route_domain_required:
-                                    # discover route domain
-                                    rid = \
-                                        instance.bigip.get_domain_index(folder)
-                                    # decorate address
-                                    if rid > 0:
-                                        address = address + "%" + str(rid)
-                            else:
-                                # validate_address format
-                                netaddr.IPAddress(address[:decorator_index])
-                            return_list.append(address)
-                        # overwrite argument value with now decorated
-                        # values list
-                        kwargs[name] = return_list
-                    else:
-                        # handle an individual value
-                        decorator_index = kwargs[name].find('%')
-                        if decorator_index < 0:
-                            # validate address
-                            netaddr.IPAddress(kwargs[name])
-                            if instance.bigip.route_domain_required:
-                                # discover route domain
-                                rid = instance.bigip.get_domain_index(folder)
-                                # decorate address
-                                if rid > 0:
-                                    kwargs[name] = kwargs[name] + \
-                                        "%" + str(rid)
-                        else:
-                            # validate address
-                            address = kwargs[name][:decorator_index]
-                            netaddr.IPAddress(address)
+            if name.find('ip_address') > -1 and kwargs[name]:
+                # if this name has _ip_address in it, check
+                # for _folder argument with the same prefix.
+                # if found use that argument instead of the
+                # folder argument
+                address_folder = folder
+                if name.find('_ip_address') > -1:
+                    name_prefix = name[0:name.index('_ip_address')]
+                    specific_folder_name = name_prefix + "_folder"
+                    if specific_folder_name in kwargs and \
+                            kwargs[specific_folder_name]:
+                        address_folder = kwargs[specific_folder_name]
+                if isinstance(kwargs[name], list):
+                    kwargs[name] = _decorate_addresses(
+                        kwargs[name], address_folder, get_domain_id)
+                else:
+                    kwargs[name] = _decorate_addresses(
+                        [kwargs[name]], address_folder, get_domain_id)[0]
         return method(*args, **kwargs)
+    wrapper.undecorated = method
     return wrapper
 
 
+def validate_address(address):
+    """
+    Validate IPv4 or IPv6 address format.
+
+    Strict addresses are parsed by the socket library. Anything it
+    rejects is parsed by netaddr, which accepts the same loose forms
+    as before and raises AddrFormatError for invalid addresses.
+    """
+    try:
+        if ':' in address:
+            socket.inet_pton(socket.AF_INET6, address)
+        else:
+            socket.inet_pton(socket.AF_INET, address)
+    except (socket.error, TypeError, ValueError):
+        netaddr.IPAddress(address)
+
+
+def validate_addresses(addresses):
+    """ Validate a list of IPv4 or IPv6 addresses """
+    for address in addresses:
+        validate_address(address)
+
+
+def _decorate_addresses(addresses, folder, get_domain_id):
+    """ Validate addresses and add route domain of folder """
+    decorated = []
+    for address in addresses:
+        decorator_index = address.find('%')
+        if decorator_index < 0:
+            validate_address(address)
+            rid = get_domain_id(folder)
+            if rid > 0:
+                address = address + "%" + str(rid)
+        else:
+            validate_address(address[:decorator_index])
+        decorated.append(address)
+    return decorated
+
+
 def decorate_name(name=None, folder='Common', use_prefix=True):
     """ Add "namespace" prefix to names """
     folder = os.path.basename(folder)
@@ -335,14 +459,47 @@ def strip_domain_address(ip_address):
 
 
 def log(method):
-    """Decorator helping to log method calls."""
+    """Decorator helping to log and time method calls."""
+    method_name = method.__name__
+
     def wrapper(*args, **kwargs):
         """ Necessary wrapper """
-        instance = args[0]
-        LOG.debug('%s::%s called with args: %s kwargs: %s',
-                  instance.__class__.__name__,
-                  method.__name__,
-                  args[1:],
-                  kwargs)
-        return method(*args, **kwargs)
+        interface_name = args[0].__class__.__name__
+        if LOG.isEnabledFor(logging.DEBUG):
+            LOG.debug('%s::%s called with args: %s kwargs: %s',
+                      interface_name, method_name, args[1:], kwargs)
+        outermost = Log.start_call()
+        start = time.time()
+        error = True
+        try:
+            result = method(*args, **kwargs)
+            error = False
+            return result
+        finally:
+            if REGISTRY.enabled:
+                REGISTRY.observe_call(interface_name, method_name,
+                                      time.time() - start, error)
+            if outermost:
+                Log.end_call()
+    wrapper.undecorated = method
     return wrapper
+
+
+def invalidates(*indexes):
+    """
+    Drops the named bigip reference indexes after the decorated
+    method runs, whether or not it succeeded, as its writes may
+    have changed the references.
+    """
+    def decorator(method):
+        """ Necessary decorator """
+        def wrapper(*args, **kwargs):
+            """ Necessary wrapper """
+            try:
+                return method(*args, **kwargs)
+            finally:
+                for index in indexes:
+                    args[0].bigip.references.invalidate(index)
+        wrapper.undecorated = method
+        return wrapper
+    return decorator
@@ -17,13 +17,16 @@
 
 from f5.common.logger import Log
 from f5.common import constants as const
+from f5.common.workers import run_all
 from f5.bigip.interfaces import icontrol_rest_folder
 from f5.bigip.interfaces import icontrol_folder
 from f5.bigip.interfaces import strip_domain_address
 from f5.bigip.interfaces import domain_address
+from f5.bigip.interfaces import validate_address
 from f5.bigip.interfaces import log
 
 from f5.bigip import exceptions
+from f5.bigip.arp_table import ArpTable
 
 import json
 import urllib
@@ -41,37 +44,13 @@ class ARP(object):
         # iControl helper objects
         self.net_arp = self.bigip.icontrol.Networking.ARP
 
-    # pylint: disable=pointless-string-statement
-    '''
-    @icontrol_rest_folder
-    @domain_address
-    @log
-    def create(self, ip_address=None, mac_address=None, folder='Common'):
-        payload = dict()
-        payload['name'] = ip_address
-        payload['partition'] = folder
-        payload['ipAddress'] = ip_address
-        payload['macAddress'] = mac_address
-        request_url = self.icr_url + '/net/arp/'
-        response = self.icr_session.post(request_url,
-                              data=json.dumps(payload),
-                              timeout=)
-        Log.debug('ARP::create response',
-                  '%s' % response.json())
-        if response.status_code < 400:
-            return True
-        elif response.status_code == 409:
-            return True
-        else:
-            raise exceptions.StaticARPCreationException(response.text)
-    '''
-    # pylint: enable=pointless-string-statement
-
     @icontrol_folder
     @domain_address
     @log
     def create(self, ip_address=None, mac_address=None, folder='Common'):
         """ Create an ARP static entry """
+        if self.bigip.rest_only:
+            return self._rest_create(ip_address, mac_address, folder)
         if not self.exists(ip_address=ip_address, folder=folder):
             # ARP entries can't handle %0 on them like other
             # TMOS objects.
@@ -82,40 +61,24 @@ class ARP(object):
                 entry.address = ip_address
                 entry.mac_address = mac_address
                 self.net_arp.add_static_entry([entry])
+                self._get_table(folder).add(ip_address, mac_address)
                 return True
             except Exception as exc:
+                # the mirror may be behind the device, check again
+                self._get_table(folder).invalidate()
+                if self._get_table(folder).get(ip_address):
+                    return False
                 Log.error('ARP', 'create exception: ' + exc.message)
                 raise exceptions.StaticARPCreationException(exc.message)
         return False
 
-    # pylint: disable=pointless-string-statement
-    '''
-    @icontrol_rest_folder
-    @domain_address
-    def delete(self, ip_address=None, folder='Common'):
-        if ip_address:
-            folder = str(folder).replace('/', '')
-            request_url = self.bigip.icr_url + '/net/arp/'
-            request_url += '~' + folder + '~' + urllib.quote(
-                                  self._remove_route_domain_zero(ip_address))
-            response = self.bigip.icr_session.delete(request_url,
-                                            timeout=const.CONNECTION_TIMEOUT)
-            if response.status_code < 400:
-                return True
-            elif response.status_code == 404:
-                return True
-            else:
-                raise exceptions.StaticARPDeleteException(response.text)
-                Log.error('ARP', response.text)
-        return False
-    '''
-    # pylint: enable=pointless-string-statement
-
     @icontrol_folder
     @domain_address
     @log
     def delete(self, ip_address=None, folder='Common'):
         """ Delete an ARP static entry """
+        if self.bigip.rest_only:
+            return self._rest_delete(ip_address, folder)
         if self.exists(ip_address=ip_address, folder=folder):
             # ARP entries can't handle %0 on them like other
             # TMOS objects.
@@ -123,22 +86,109 @@ class ARP(object):
             try:
                 self.net_arp.delete_static_entry_v2(
                     ['/' + folder + '/' + ip_address])
+                self._get_table(folder).remove(ip_address)
                 return True
             except Exception as exc:
+                # the mirror may be behind the device, check again
+                self._get_table(folder).invalidate()
+                if not self._get_table(folder).get(ip_address):
+                    return False
                 Log.error('ARP', 'delete exception: ' + exc.message)
                 raise exceptions.StaticARPDeleteException(exc.message)
         return False
 
+    @icontrol_folder
+    @log
+    def create_many(self, ip_addresses=None, mac_addresses=None,
+                    folder='Common'):
+        """
+        Create ARP static entries for parallel lists of addresses.
+        Returns {ip address: error message} of entries which failed,
+        the other entries are created or already existed.
+        """
+        (entries, failed) = self._prepare_entries(
+            ip_addresses or [], mac_addresses or [], folder)
+        if not entries:
+            return failed
+        if self.bigip.rest_only:
+            results = self._run_batch(
+                lambda entry: self._batch_call(
+                    self._rest_create, entry[1], entry[2], folder),
+                entries)
+            batch_failed = {}
+            for (entry, error) in zip(entries, results):
+                if error:
+                    batch_failed[entry[0]] = error
+            failed.update(self._recheck_failed(batch_failed, entries,
+                                               folder, True))
+            return failed
+        table = self._get_table(folder)
+        static_entries = []
+        for (ip_address, address, mac_address) in entries:
+            if table.get(address):
+                continue
+            entry = self.net_arp.typefactory.create(
+                'Networking.ARP.StaticEntry')
+            entry.address = address
+            entry.mac_address = mac_address
+            static_entries.append((ip_address, entry))
+        batch_failed = self._soap_batch(self.net_arp.add_static_entry,
+                                        static_entries)
+        for (ip_address, entry) in static_entries:
+            if ip_address not in batch_failed:
+                table.add(entry.address, entry.mac_address)
+        failed.update(self._recheck_failed(batch_failed, entries,
+                                           folder, True))
+        return failed
+
+    @icontrol_folder
+    @log
+    def delete_many(self, ip_addresses=None, folder='Common'):
+        """
+        Delete ARP static entries. Returns {ip address: error
+        message} of entries which failed, missing entries are not
+        failures.
+        """
+        (entries, failed) = self._prepare_entries(
+            ip_addresses or [], None, folder)
+        if not entries:
+            return failed
+        if self.bigip.rest_only:
+            results = self._run_batch(
+                lambda entry: self._batch_call(
+                    self._rest_delete, entry[1], folder),
+                entries)
+            batch_failed = {}
+            for (entry, error) in zip(entries, results):
+                if error:
+                    batch_failed[entry[0]] = error
+            failed.update(self._recheck_failed(batch_failed, entries,
+                                               folder, False))
+            return failed
+        table = self._get_table(folder)
+        paths = [(ip_address, '/' + folder + '/' + address)
+                 for (ip_address, address, _) in entries
+                 if table.get(address)]
+        batch_failed = self._soap_batch(self.net_arp.delete_static_entry_v2,
+                                        paths)
+        for (ip_address, path) in paths:
+            if ip_address not in batch_failed:
+                table.remove(path[len(folder) + 2:])
+        failed.update(self._recheck_failed(batch_failed, entries,
+                                           folder, False))
+        return failed
+
     @icontrol_folder
     @log
     def delete_by_mac(self, mac_address=None, folder='Common'):
         """ Delete an ARP static entry by MAC address """
         if mac_address:
-            arps = self.get_arps(None, folder)
-            for arp in arps:
-                for ip_address in arp:
-                    if arp[ip_address] == mac_address:
-                        self.delete(ip_address=ip_address, folder=folder)
+            failed = self.delete_many(
+                ip_addresses=self._get_table(folder).get_by_mac(mac_address),
+                folder=folder)
+            for ip_address in failed:
+                Log.error('ARP', 'could not delete %s: %s'
+                          % (ip_address, failed[ip_address]))
 
     @icontrol_folder
     @log
@@ -178,22 +228,16 @@ class ARP(object):
         if not network:
             return []
         mac_addresses = []
-        request_url = self.bigip.icr_url + '/net/arp'
-        request_filter = 'partition eq ' + folder
-        request_url += '?$filter=' + request_filter
-        response = self.bigip.icr_session.get(
-            request_url, timeout=const.CONNECTION_TIMEOUT)
-        if response.status_code < 400:
-            response_obj = json.loads(response.text)
-            if 'items' in response_obj:
-                for arp in response_obj['items']:
-                    ad_rd_div = arp['ipAddress'].find('%')
-                    address = netaddr.IPAddress(
-                        arp['ipAddress'][0:ad_rd_div])
-                    if address in network:
-                        mac_addresses.append(arp['macAddress'])
-                        self.delete(arp['ipAddress'],
-                                    folder=arp['partition'])
+        ip_addresses = []
+        for (ip_address, mac_address) in self._get_table(
+                folder).get_in_network(network.version, network.first,
+                                       network.last):
+            mac_addresses.append(mac_address)
+            ip_addresses.append(ip_address)
+        failed = self.delete_many(ip_addresses=ip_addresses, folder=folder)
+        for ip_address in failed:
+            Log.error('ARP', 'could not delete %s: %s'
+                      % (ip_address, failed[ip_address]))
         return mac_addresses
 
     @icontrol_rest_folder
@@ -202,14 +246,18 @@ class ARP(object):
     def get_arps(self, ip_address=None, folder='Common'):
         """ Get ARP static entry """
         folder = str(folder).replace('/', '')
+        table = self._get_table(folder)
         if ip_address:
+            entry = table.get(self._remove_route_domain_zero(ip_address))
+            if entry:
+                return [{strip_domain_address(entry[0]): entry[1]}]
+            # not mirrored yet, ask the device
             request_url = self.bigip.icr_url + '/net/arp/'
             request_url += '~' + folder + '~' + urllib.quote(
                 self._remove_route_domain_zero(ip_address))
             response = self.bigip.icr_session.get(
                 request_url, timeout=const.CONNECTION_TIMEOUT)
-            Log.debug('ARP::get response',
-                      '%s' % response.json())
+            Log.debug('ARP::get response', '%s', response.text)
             if response.status_code < 400:
                 response_obj = json.loads(response.text)
                 return [
@@ -220,90 +268,23 @@ class ARP(object):
                 Log.error('ARP', response.text)
                 raise exceptions.StaticARPQueryException(response.text)
         else:
-            request_url = self.bigip.icr_url + '/net/arp'
-            request_filter = 'partition eq ' + folder
-            request_url += '?$filter=' + request_filter
-            response = self.bigip.icr_session.get(
-                request_url, timeout=const.CONNECTION_TIMEOUT)
-            Log.debug('ARP::get response',
-                      '%s' % response.json())
-            if response.status_code < 400:
-                response_obj = json.loads(response.text)
-                if 'items' in response_obj:
-                    arps = []
-                    for arp in response_obj['items']:
-                        arps.append(
-                            {strip_domain_address(arp['name']):
-                             arp['macAddress']}
-                        )
-                    return arps
-            else:
-                Log.error('ARP', response.text)
-                raise exceptions.StaticARPQueryException(response.text)
+            return [{strip_domain_address(ip_address): mac_address}
+                    for (ip_address, mac_address) in table.get_all()]
         return []
 
-    # pylint: disable=pointless-string-statement
-    '''
-    @icontrol_rest_folder
-    def delete_all(self, folder='Common'):
-        folder = str(folder).replace('/', '')
-        request_url = self.bigip.icr_url + '/net/arp/'
-        request_url += '?$select=name,selfLink'
-        request_filter = 'partition eq ' + folder
-        request_url += '&$filter=' + request_filter
-        response = self.bigip.icr_session.get(request_url,
-                                             timeout=const.CONNECTION_TIMEOUT)
-        if response.status_code < 400:
-            response_obj = json.loads(response.text)
-            deletions = []
-            if 'items' in response_obj:
-                for item in response_obj['items']:
-                    if item['name'].startswith(self.OBJ_PREFIX):
-                        deletions.append(self.bigip.icr_link(item['selfLink']))
-            for delete in deletions:
-                response = self.bigip.icr_session.delete(delete,
-                                              timeout=const.CONNECTION_TIMEOUT)
-                if response.status_code > 400 and \
-                  (not response.status_code == 404):
-                    Log.error('ARP', response.text)
-                    return False
-        elif response.status_code == 404:
-            return True
-        else:
-            Log.error('ARP', response.text)
-            exceptions.StaticARPDeleteException(response.text)
-     '''
-    # pylint: enable=pointless-string-statement
-
     @icontrol_folder
     @log
     def delete_all(self, folder='Common'):
         """ Delete all ARP entries """
+        if self.bigip.rest_only:
+            return self._rest_delete_all(folder)
         try:
             self.net_arp.delete_all_static_entries()
+            self._get_table(folder).clear()
         except Exception as exc:
             Log.error('ARP', 'delete exception: ' + exc.message)
             raise exceptions.StaticARPDeleteException(exc.message)
 
-    # pylint: disable=pointless-string-statement
-    '''
-    @icontrol_rest_folder
-    @domain_address
-    def exists(self, ip_address=None, folder='Common'):
-        folder = str(folder).replace('/', '')
-        request_url = self.bigip.icr_url + '/net/arp/'
-        request_url += '~' + folder + '~' + urllib.quote(
-                        self._remove_route_domain_zero(ip_address))
-        response = self.bigip.icr_session.get(request_url,
-                                  timeout=const.CONNECTION_TIMEOUT)
-        Log.debug('ARP::exists response',
-                      '%s' % response.text)
-        if response.status_code < 400:
-            return True
-        return False
-    '''
-    # pylint: enable=pointless-string-statement
-
     @icontrol_folder
     @domain_address
     @log
@@ -312,17 +293,199 @@ class ARP(object):
         # ARP entries can't handle %0 on them like other
         # TMOS objects.
         ip_address = self._remove_route_domain_zero(ip_address)
-        try:
-            arp_list = self.net_arp.get_static_entry_list()
-        except Exception as exc:
-            Log.error('ARP', 'query exception: %s on %s' %
-                      (exc.message, self.bigip.device_name))
-            raise exceptions.StaticARPQueryException(exc.message)
+        return self._get_table(folder).get(ip_address) is not None
 
-        if '/' + folder + '/' + ip_address in arp_list:
+    def _rest_create(self, ip_address, mac_address, folder):
+        """ Create an ARP static entry over REST """
+        # ARP entries can't handle %0 on them like other
+        # TMOS objects.
+        ip_address = self._remove_route_domain_zero(ip_address)
+        folder = str(folder).replace('/', '')
+        payload = dict()
+        payload['name'] = ip_address
+        payload['partition'] = folder
+        payload['ipAddress'] = ip_address
+        payload['macAddress'] = mac_address
+        request_url = self.bigip.icr_url + '/net/arp/'
+        response = self.bigip.icr_session.post(
+            request_url, data=json.dumps(payload),
+            timeout=const.CONNECTION_TIMEOUT)
+        if response.status_code < 400:
+            if self.bigip.icr_session.transaction_id:
+                # only queued, the commit may still fail
+                self._get_table(folder).invalidate()
+            else:
+                self._get_table(folder).add(ip_address, mac_address)
             return True
-        else:
+        elif response.status_code == 409:
+            # exists with a mac the mirror may not know
+            self._get_table(folder).invalidate()
             return False
+        else:
+            Log.error('ARP', response.text)
+            raise exceptions.StaticARPCreationException(response.text)
+
+    def _rest_delete(self, ip_address, folder):
+        """ Delete an ARP static entry over REST """
+        if ip_address:
+            folder = str(folder).replace('/', '')
+            request_url = self.bigip.icr_url + '/net/arp/'
+            request_url += '~' + folder + '~' + urllib.quote(
+                self._remove_route_domain_zero(ip_address))
+            response = self.bigip.icr_session.delete(
+                request_url, timeout=const.CONNECTION_TIMEOUT)
+            if self.bigip.icr_session.transaction_id:
+                # only queued, the commit may still fail
+                self._get_table(folder).invalidate()
+            elif response.status_code < 400 or response.status_code == 404:
+                self._get_table(folder).remove(
+                    self._remove_route_domain_zero(ip_address))
+            if response.status_code < 400:
+                return True
+            elif response.status_code != 404:
+                Log.error('ARP', response.text)
+                raise exceptions.StaticARPDeleteException(response.text)
+        return False
+
+    def _rest_delete_all(self, folder):
+        """ Delete all ARP static entries over REST """
+        folder = str(folder).replace('/', '')
+        request_url = self.bigip.icr_url + '/net/arp/'
+        request_url += '?$select=name,selfLink'
+        request_filter = 'partition eq ' + folder
+        request_url += '&$filter=' + request_filter
+        response = self.bigip.icr_session.get(
+            request_url, timeout=const.CONNECTION_TIMEOUT)
+        if response.status_code < 400:
+            response_obj = json.loads(response.text)
+            if 'items' in response_obj and response_obj['items']:
+                responses = self._run_batch(
+                    lambda item: self.bigip.icr_session.delete(
+                        self.bigip.icr_link(item['selfLink']),
+                        timeout=const.CONNECTION_TIMEOUT),
+                    response_obj['items'])
+                errors = [response.text for response in responses
+                          if response.status_code >= 400 and
+                          response.status_code != 404]
+                # entries left after errors are found on next use
+                self._get_table(folder).invalidate()
+                if errors:
+                    Log.error('ARP', '; '.join(errors))
+                    raise exceptions.StaticARPDeleteException(
+                        '; '.join(errors))
+        elif response.status_code != 404:
+            Log.error('ARP', response.text)
+            raise exceptions.StaticARPQueryException(response.text)
+
+    def _prepare_entries(self, ip_addresses, mac_addresses, folder):
+        """
+        Validate addresses and add the folder route domain in one
+        pass. Returns ([(ip address, address, mac)], {ip address:
+        error message}).
+        """
+        entries = []
+        failed = {}
+        rid = None
+        for index in range(len(ip_addresses)):
+            ip_address = ip_addresses[index]
+            address = ip_address
+            try:
+                decorator_index = address.find('%')
+                if decorator_index < 0:
+                    validate_address(address)
+                    if self.bigip.route_domain_required:
+                        if rid is None:
+                            rid = self.bigip.get_domain_index(folder)
+                        if rid > 0:
+                            address = address + '%' + str(rid)
+                else:
+                    validate_address(address[:decorator_index])
+            except Exception as exc:
+                failed[ip_address] = 'invalid address: %s' % str(exc)
+                continue
+            mac_address = None
+            if mac_addresses is not None:
+                mac_address = mac_addresses[index]
+            # ARP entries can't handle %0 on them like other
+            # TMOS objects.
+            entries.append((ip_address,
+                            self._remove_route_domain_zero(address),
+                            mac_address))
+        return (entries, failed)
+
+    def _recheck_failed(self, batch_failed, entries, folder, created):
+        """
+        Resync the mirror after failures and drop the failures of
+        entries the device already has, if created, or no longer has
+        """
+        if not batch_failed:
+            return batch_failed
+        self._get_table(folder).invalidate()
+        table = self._get_table(folder)
+        for (ip_address, address, _) in entries:
+            if ip_address in batch_failed and \
+                    bool(table.get(address)) == created:
+                del batch_failed[ip_address]
+        return batch_failed
+
+    def _run_batch(self, function, entries):
+        """ Call function for entries in parallel """
+        # workers do not share the caller's transaction
+        return run_all(function, entries, const.ARP_BATCH_CONCURRENCY,
+                       serial=bool(self.bigip.icr_session.transaction_id))
+
+    def _batch_call(self, function, *args):
+        """ Call function, returning its error message or None """
+        try:
+            function(*args)
+        except Exception as exc:
+            return exc.message or str(exc)
+        return None
+
+    def _soap_batch(self, function, items):
+        """
+        Call function with all (ip address, item) items, one by one
+        if the batch fails to find the failing entries.
+        """
+        failed = {}
+        if not items:
+            return failed
+        try:
+            function([item for (_, item) in items])
+            return failed
+        except Exception as exc:
+            Log.debug('ARP', 'batch failed, retrying entries: %s'
+                      % exc.message)
+        for (ip_address, item) in items:
+            try:
+                function([item])
+            except Exception as exc:
+                Log.error('ARP', 'exception on %s: %s'
+                          % (ip_address, exc.message))
+                failed[ip_address] = exc.message
+        return failed
+
+    def _get_table(self, folder):
+        """ Get the ARP mirror of folder, merged with the device if stale """
+        folder = str(folder).replace('/', '')
+        table = ArpTable.get_table(self.bigip.hostname, folder)
+        if table.is_stale():
+            request_url = self.bigip.icr_url + '/net/arp'
+            request_url += '?$select=ipAddress,macAddress'
+            request_url += '&$filter=partition eq ' + folder
+            response = self.bigip.icr_session.get(
+                request_url, timeout=const.CONNECTION_TIMEOUT)
+            if response.status_code < 400:
+                response_obj = json.loads(response.text)
+                table.update(dict(
+                    (arp['ipAddress'], arp['macAddress'])
+                    for arp in response_obj.get('items', [])))
+            elif response.status_code == 404:
+                table.update({})
+            else:
+                Log.error('ARP', response.text)
+                raise exceptions.StaticARPQueryException(response.text)
+        return table
 
     def _remove_route_domain_zero(self, ip_address):
         """ Remove route domain zero from ip_address """
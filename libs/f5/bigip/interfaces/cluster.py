@@ -51,6 +51,41 @@ class Cluster(object):
             raise exceptions.ClusterQueryException(response.text)
         return None
 
+    @log
+    def get_device_group_sync_status(self, name):
+        """ Get (color, status) of a device group, e.g. ('green',
+            'In Sync') """
+        if not self.bigip.rest_only:
+            try:
+                sync_status = self.mgmt_dg.get_sync_status([name])[0]
+            except Exception as e:
+                Log.error('device-group', e.message)
+                raise exceptions.ClusterQueryException(e.message)
+            color = str(sync_status.color).replace('COLOR_', '').lower()
+            return (color, sync_status.status)
+        request_url = self.bigip.icr_url + '/cm/sync-status'
+        response = self.bigip.icr_session.get(request_url,
+                                              timeout=const.CONNECTION_TIMEOUT)
+        if response.status_code < 400:
+            response_obj = json.loads(response.text)
+            entries = response_obj['entries']
+            status = entries['https://localhost/mgmt/tm/cm/sync-status/0']
+            status = status['nestedStats']['entries']
+            color = status['color']['description']
+            details = status.get('https://localhost/mgmt/tm/cm/syncStatus/0/'
+                                 'details', {})
+            details = details.get('nestedStats', {}).get('entries', {})
+            # details read '<group> (<status>): <description>'
+            for detail in details.values():
+                desc = detail['nestedStats']['entries']['details']
+                desc = desc['description']
+                if desc.startswith(name + ' ('):
+                    return (color, desc[len(name) + 2:desc.find(')')])
+            return (color, status['status']['description'])
+        else:
+            Log.error('sync-status', response.text)
+            raise exceptions.ClusterQueryException(response.text)
+
     @log
     def save_config(self):
         """ Save the bigip configuration """
@@ -285,22 +320,16 @@ class Cluster(object):
                 Log.info('Cluster', 'Device %s - adding peer %s'
                                     % (local_device, name))
 
-                self.mgmt_trust.add_authority_device(mgmt_ip_address,
-                                                     username,
-                                                     password,
-                                                     name,
-                                                     '', '',
-                                                     '', '')
+                self.bigip.device.add_trust_device(name, mgmt_ip_address,
+                                                   username, password)
                 attempts = 0
                 while attempts < const.PEER_ADD_ATTEMPTS_MAX:
                     if self.get_sync_status() == "OFFLINE":
-                        self.mgmt_trust.remove_device([name])
-                        self.mgmt_trust.add_authority_device(mgmt_ip_address,
-                                                             username,
-                                                             password,
-                                                             name,
-                                                             '', '',
-                                                             '', '')
+                        self.bigip.device.remove_trust_devices([name])
+                        self.bigip.device.add_trust_device(name,
+                                                           mgmt_ip_address,
+                                                           username,
+                                                           password)
                     else:
                         self.bigip.device.release_lock()
                         return
@@ -440,11 +440,7 @@ class Device(object):
             if dev != current_dev_name:
                 devs_to_remove.append(dev)
         if devs_to_remove:
-            try:
-                self.mgmt_trust.remove_device(devs_to_remove)
-            except Exception as e:
-                Log.error('device', e.message)
-                raise exceptions.DeviceUpdateException(e.message)
+            self.remove_trust_devices(devs_to_remove)
         self.remove_metadata(None, {
                              'root_device_name': None,
                              'root_device_mgmt_address': None})
@@ -454,17 +450,100 @@ class Device(object):
         """ Remove trust """
         self.bigip.system.set_folder('/Common')
         self.remove_all_peers()
-        try:
-            self.mgmt_trust.reset_all(new_name, False, '', '')
-        except Exception as e:
-            Log.error('device', e.message)
-            raise exceptions.DeviceUpdateException(e.message)
+        self.reset_all(new_name)
         self.remove_metadata(None, {
                              'root_device_name': None,
                              'root_device_mgmt_address': None})
         self.devicename = None
         self.get_device_name()
 
+    @log
+    def add_trust_device(self, name, mgmt_ip_address, username, password):
+        """ Add device to the local trust domain """
+        if not self.bigip.rest_only:
+            try:
+                self.mgmt_trust.add_authority_device(mgmt_ip_address,
+                                                     username, password,
+                                                     name, '', '', '', '')
+                return True
+            except Exception as e:
+                Log.error('device', e.message)
+                raise exceptions.DeviceUpdateException(e.message)
+        payload = dict()
+        payload['command'] = 'run'
+        payload['name'] = 'Root'
+        payload['caDevice'] = True
+        payload['device'] = mgmt_ip_address
+        payload['deviceName'] = name
+        payload['username'] = username
+        payload['password'] = password
+        request_url = self.bigip.icr_url + '/cm/add-to-trust'
+        response = self.bigip.icr_session.post(
+            request_url, data=json.dumps(payload),
+            timeout=const.CONNECTION_TIMEOUT)
+        if response.status_code < 400:
+            return True
+        else:
+            Log.error('device', response.text)
+            raise exceptions.DeviceUpdateException(response.text)
+
+    @log
+    def remove_trust_devices(self, names):
+        """ Remove devices from the local trust domain """
+        if not self.bigip.rest_only:
+            try:
+                self.mgmt_trust.remove_device(names)
+                return True
+            except Exception as e:
+                Log.error('device', e.message)
+                raise exceptions.DeviceUpdateException(e.message)
+        request_url = self.bigip.icr_url + '/cm/remove-from-trust'
+        for name in names:
+            payload = dict()
+            payload['command'] = 'run'
+            payload['name'] = 'Root'
+            payload['deviceName'] = name
+            response = self.bigip.icr_session.post(
+                request_url, data=json.dumps(payload),
+                timeout=const.CONNECTION_TIMEOUT)
+            if response.status_code >= 400:
+                Log.error('device', response.text)
+                raise exceptions.DeviceUpdateException(response.text)
+        return True
+
+    @log
+    def reset_all(self, new_name):
+        """ Reset the trust domain and rename the device """
+        if not self.bigip.rest_only:
+            try:
+                self.mgmt_trust.reset_all(new_name, False, '', '')
+                return True
+            except Exception as e:
+                Log.error('device', e.message)
+                raise exceptions.DeviceUpdateException(e.message)
+        request_url = self.bigip.icr_url + '/cm/trust-domain/~Common~Root'
+        response = self.bigip.icr_session.delete(
+            request_url, timeout=const.CONNECTION_TIMEOUT)
+        if response.status_code >= 400 and response.status_code != 404:
+            Log.error('device', response.text)
+            raise exceptions.DeviceUpdateException(response.text)
+        self.devicename = None
+        current_name = self.get_device_name()
+        if current_name and current_name != new_name:
+            payload = dict()
+            payload['command'] = 'mv'
+            payload['name'] = current_name
+            payload['target'] = new_name
+            request_url = self.bigip.icr_url + '/cm/device'
+            response = self.bigip.icr_session.post(
+                request_url, data=json.dumps(payload),
+                timeout=const.CONNECTION_TIMEOUT)
+            if response.status_code >= 400:
+                Log.error('device', response.text)
+                raise exceptions.DeviceUpdateException(response.text)
+        self.devicename = None
+        return True
+
     @log
     def set_metadata(self, name=None, device_dict=None):
         """ Set device metadata """
@@ -15,9 +15,11 @@
 
 from f5.common.logger import Log
 from f5.common import constants as const
+from f5.common.cache import TTLCache
 from f5.bigip.interfaces import icontrol_rest_folder
 #from f5.bigip.interfaces import strip_folder_and_prefix
 from f5.bigip import exceptions
+from f5.bigip.catalog import TypeCatalog
 from f5.bigip.interfaces import log
 
 import json
@@ -42,6 +44,13 @@ class Monitor(object):
             'udp': {'name': 'udp', 'url': '/ltm/monitor/udp'},
             'inband': {'name': 'inband',
                        'url': '/ltm/monitor/inband'}}
+        # monitor types and monitors by folder, shared per device
+        self.catalog = TypeCatalog(bigip, '/ltm/monitor',
+                                   exceptions.MonitorQueryException,
+                                   fields=['defaultsFrom'])
+        # names not found after a refresh, so repeated lookups of a
+        # missing monitor do not sweep every monitor type again
+        self.misses = TTLCache(const.MONITOR_MISS_TTL)
 
     @icontrol_rest_folder
     @log
@@ -67,8 +76,12 @@ class Monitor(object):
             request_url, data=json.dumps(payload),
             timeout=const.CONNECTION_TIMEOUT)
         if response.status_code < 400:
+            # inside a transaction the catalog drops the folder instead
+            self.catalog.add(folder, mon_type, json.loads(response.text))
+            self.misses.invalidate((folder, name))
             return True
         elif response.status_code == 409:
+            self.misses.invalidate((folder, name))
             return True
         else:
             Log.error('monitor', response.text)
@@ -87,8 +100,10 @@ class Monitor(object):
             response = self.bigip.icr_session.delete(
                 request_url, timeout=const.CONNECTION_TIMEOUT)
             if response.status_code < 400:
+                self.catalog.remove(folder, name)
                 return True
             elif response.status_code == 404:
+                self.catalog.remove(folder, name)
                 return True
             else:
                 Log.error('monitor', response.text)
@@ -99,87 +114,46 @@ class Monitor(object):
     @log
     def delete_all(self, folder='Common'):
         """ Create all monitors """
-        request_url = self.bigip.icr_url + '/ltm/monitor'
         folder = str(folder).replace('/', '')
-        request_filter = 'partition eq ' + folder
-        request_url += '?$filter=' + request_filter
-        response = self.bigip.icr_session.get(
-            request_url, timeout=const.CONNECTION_TIMEOUT)
-        if response.status_code < 400:
-            return_obj = json.loads(response.text)
-            monitor_types = []
-            if 'items' in return_obj:
-                for monitor_type in return_obj['items']:
-                    ref = monitor_type['reference']['link']
-                    monitor_types.append(
-                        self.bigip.icr_link(ref).split('?')[0])
-            for monitor in monitor_types:
-                mon_req = monitor
-                mon_req += '?$select=name,selfLink'
-                if folder:
-                    mon_req += '&$filter=' + request_filter
-                mon_resp = self.bigip.icr_session.get(
-                    mon_req, timeout=const.CONNECTION_TIMEOUT)
-                if mon_resp.status_code < 400:
-                    mon_resp_obj = json.loads(mon_resp.text)
-                    if 'items' in mon_resp_obj:
-                        for mon_def in mon_resp_obj['items']:
-                            if mon_def['name'].startswith(self.OBJ_PREFIX):
-                                response = self.bigip.icr_session.delete(
-                                    self.bigip.icr_link(mon_def['selfLink']),
-                                    timeout=const.CONNECTION_TIMEOUT)
-                                if response.status_code > 400 and \
-                                   response.status_code != 404:
-                                    Log.error('monitor', response.text)
-                                    raise exceptions.MonitorDeleteException(
-                                        response.text)
-            return True
-        elif response.status_code != 404:
-            Log.error('monitor', response.text)
-            raise exceptions.MonitorQueryException(response.text)
-        return False
+        for monitor in self.catalog.get_instances(folder):
+            if monitor['name'].startswith(self.OBJ_PREFIX):
+                response = self.bigip.icr_session.delete(
+                    self.bigip.icr_link(monitor['selfLink']),
+                    timeout=const.CONNECTION_TIMEOUT)
+                if response.status_code > 400 and \
+                   response.status_code != 404:
+                    Log.error('monitor', response.text)
+                    self.catalog.invalidate(folder)
+                    raise exceptions.MonitorDeleteException(response.text)
+                self.catalog.remove(folder, monitor['name'])
+        return True
 
     @icontrol_rest_folder
     @log
     def get_type(self, name=None, folder='Common'):
         """ Get monitor type """
         folder = str(folder).replace('/', '')
-        request_url = self.bigip.icr_url + '/ltm/monitor'
-        request_filter = 'partition eq ' + folder
-        request_url += '?$filter=' + request_filter
-        response = self.bigip.icr_session.get(
-            request_url, timeout=const.CONNECTION_TIMEOUT)
-        if response.status_code < 400:
-            return_obj = json.loads(response.text)
-            monitor_types = []
-            if 'items' in return_obj:
-                for monitor_type in return_obj['items']:
-                    ref = monitor_type['reference']['link']
-                    monitor_types.append(ref.replace(
-                        'https://localhost/mgmt/tm', '').split('?')[0])
-            for monitor in monitor_types:
-                mon_req = self.bigip.icr_url + monitor
-                mon_req += '?$select=name,defaultsFrom'
-                if folder:
-                    mon_req += '&$filter=' + request_filter
-                mon_resp = self.bigip.icr_session.get(
-                    mon_req, timeout=const.CONNECTION_TIMEOUT)
-                if mon_resp.status_code < 400:
-                    mon_resp_obj = json.loads(mon_resp.text)
-                    if 'items' not in mon_resp_obj:
-                        continue
-                    for mon_def in mon_resp_obj['items']:
-                        if mon_def['name'] != name:
-                            continue
-                        def_from = mon_def['defaultsFrom']
-                        mon_type = def_from.replace('/Common/', '')
-                        return self._get_monitor_type_from_parent(mon_type)
-                else:
-                    Log.error('monitor', mon_resp.text)
-                    raise exceptions.MonitorQueryException(mon_resp.text)
-        else:
-            Log.error('monitor', response.text)
-            raise exceptions.MonitorQueryException(response.text)
+        cached = self.catalog.is_cached(folder)
+        monitor = self._find_monitor(name, folder)
+        if not monitor and cached and not self.misses.get((folder, name)):
+            # refresh cache on miss
+            self.catalog.invalidate(folder)
+            monitor = self._find_monitor(name, folder)
+        if not monitor:
+            self.misses.put((folder, name), True)
+        if monitor:
+            if 'defaultsFrom' in monitor:
+                mon_type = monitor['defaultsFrom'].replace('/Common/', '')
+            else:
+                mon_type = monitor['type'].replace('-', '_')
+            return self._get_monitor_type_from_parent(mon_type)
+        return None
+
+    def _find_monitor(self, name, folder):
+        """ Find cached monitor by name """
+        for monitor in self.catalog.get_instances(folder):
+            if monitor['name'] == name:
+                return monitor
         return None
 
     @icontrol_rest_folder
@@ -404,21 +378,10 @@ class Monitor(object):
     def get_monitors(self, folder='Common'):
         """ Get monitors """
         folder = str(folder).replace('/', '')
-        request_filter = 'partition eq ' + folder
+        rest_types = [self.monitor_type[mon]['name']
+                      for mon in self.monitor_type]
         return_monitors = []
-        urls = {}
-        for mon in self.monitor_type:
-            if not self.monitor_type[mon]['url'] in urls:
-                mon_req = self.bigip.icr_url + self.monitor_type[mon]['url']
-                mon_req += '?$select=name,partition'
-                if folder:
-                    mon_req += '&$filter=' + request_filter
-                mon_resp = self.bigip.icr_session.get(
-                    mon_req, timeout=const.CONNECTION_TIMEOUT)
-                urls[self.monitor_type[mon]['url']] = mon_resp.status_code
-                if mon_resp.status_code < 400:
-                    mon_resp_obj = json.loads(mon_resp.text)
-                    if 'items' in mon_resp_obj:
-                        for mon_def in mon_resp_obj['items']:
-                            return_monitors.append(mon_def['name'])
+        for monitor in self.catalog.get_instances(folder):
+            if monitor['type'] in rest_types:
+                return_monitors.append(monitor['name'])
         return return_monitors
@@ -19,8 +19,13 @@ from f5.bigip.interfaces import domain_address
 from f5.bigip.interfaces import icontrol_rest_folder
 from f5.bigip.interfaces import strip_folder_and_prefix
 from f5.bigip.interfaces import strip_domain_address
+from f5.bigip.interfaces import validate_address
 from f5.bigip import exceptions
+from f5.bigip.fdb import FdbSync
 from f5.bigip.interfaces import log
+from f5.bigip.interfaces.statistics import POOL_STATS
+from f5.bigip.interfaces.statistics import translate_entries
+from f5.bigip.interfaces.statistics import translate_stat
 
 import os
 import urllib
@@ -30,6 +35,8 @@ import json
 class Pool(object):
     def __init__(self, bigip):
         self.bigip = bigip
+        self.fdb = FdbSync(bigip, 'fdb', exceptions.PoolQueryException,
+                           exceptions.PoolUpdateException)
 
     @icontrol_rest_folder
     @log
@@ -72,7 +79,8 @@ class Pool(object):
                 return_obj = json.loads(response.text)
                 if 'items' in return_obj:
                     for member in return_obj['items']:
-                        node_addresses.append(member['address'])
+                        if member['address'] not in node_addresses:
+                            node_addresses.append(member['address'])
             elif response.status_code != 404:
                 Log.error('members', response.text)
                 raise exceptions.PoolQueryException(response.text)
@@ -80,77 +88,62 @@ class Pool(object):
             response = self.bigip.icr_session.delete(
                 request_url, timeout=const.CONNECTION_TIMEOUT)
             if response.status_code < 400 or response.status_code == 404:
-                for node_address in node_addresses:
-                    node_url = self.bigip.icr_url + '/ltm/node/'
-                    node_url += '~' + folder + '~' + urllib.quote(node_address)
-                    node_res = self.bigip.icr_session.delete(
-                        node_url, timeout=const.CONNECTION_TIMEOUT)
-                    # we only care if this works.  Otherwise node is likely
-                    # in use by another pool
-                    if node_res.status_code < 400:
-                        self._del_arp_and_fdb(node_address, folder)
-                    elif node_res.status_code == 400 and \
-                            node_res.text.find('is referenced') > 0:
-                        # same node can be in multiple pools
-                        pass
-                    else:
-                        raise exceptions.PoolDeleteException(node_res.text)
+                # nodes may be in use by other pools, only the freed
+                # ones are deleted once the pool delete is committed
+                self._release_nodes(node_addresses, folder)
             return True
         return False
 
     # best effort ARP and fdb cleanup
-    def _del_arp_and_fdb(self, ip_address, folder):
-        if not const.FDB_POPULATE_STATIC_ARP:
+    def _del_arp_and_fdb(self, ip_addresses, folder):
+        """
+        Delete the ARP entries of freed node addresses and the fdb
+        records of their MACs with one lookup of each table
+        """
+        if not const.FDB_POPULATE_STATIC_ARP or not ip_addresses:
+            return
+        addresses = set(strip_domain_address(ip_address)
+                        for ip_address in ip_addresses)
+        arp_addresses = []
+        macs = set()
+        try:
+            arps = self.bigip.arp.get_arps(folder=folder)
+        except Exception as exc:
+            Log.error('ARP', exc.message)
             return
-        arp_req = self.bigip.icr_url + '/net/arp'
-        arp_req += '?$select=ipAddress,macAddress,selfLink'
-        arp_req += '&$filter=partition eq ' + folder
-        arp_res = self.bigip.icr_session.get(
-            arp_req, timeout=const.CONNECTION_TIMEOUT)
-        if not (arp_res.status_code < 400):
+        for arp in arps:
+            for (ip_address, mac_address) in arp.items():
+                if strip_domain_address(ip_address) in addresses:
+                    arp_addresses.append(ip_address)
+                    macs.add(mac_address)
+        if not arp_addresses:
             return
-        arp_obj = json.loads(arp_res.text)
-        if not 'items' in arp_obj:
+        try:
+            failed = self.bigip.arp.delete_many(ip_addresses=arp_addresses,
+                                                folder=folder)
+            for ip_address in failed:
+                Log.error('ARP', failed[ip_address])
+        except Exception as exc:
+            Log.error('ARP', exc.message)
+        fdb_req = self.bigip.icr_url + '/net/fdb/tunnel'
+        fdb_req += '?$select=name,records'
+        fdb_req += '&$filter=partition eq ' + folder
+        response = self.bigip.icr_session.get(
+            fdb_req, timeout=const.CONNECTION_TIMEOUT)
+        if not response.status_code < 400:
             return
-        for arp in arp_obj['items']:
-            if ip_address != arp['ipAddress']:
+        for tunnel in json.loads(response.text).get('items', []):
+            records = dict((record['name'], record.get('endpoint'))
+                           for record in tunnel.get('records', []))
+            if not macs.intersection(records):
                 continue
-            # iControl REST ARP is broken < 11.7
-            # self.bigip.arp.delete(
-            #                  arp['ipAddress'],
-            #                  folder)
+            # the tunnel records were just read, so the removal is
+            # sent as a delta without reading each tunnel again
+            self.fdb.seed(tunnel['name'], folder, records)
             try:
-                self.bigip.arp.delete(arp['ipAddress'], folder=folder)
+                self.fdb.apply(tunnel['name'], folder, remove=list(macs))
             except Exception as exc:
-                Log.error('ARP', exc.message)
-            fdb_req = self.bigip.icr_url + '/net/fdb/tunnel'
-            fdb_req += '?$select=records,selfLink'
-            fdb_req += '&$filter=partition eq ' + folder
-            response = self.bigip.icr_session.get(
-                fdb_req, timeout=const.CONNECTION_TIMEOUT)
-            if not response.status_code < 400:
-                continue
-            fdb_obj = json.loads(response.text)
-            if not 'items' in fdb_obj:
-                continue
-            for tunnel in fdb_obj['items']:
-                if not 'records' in tunnel:
-                    continue
-                records = list(tunnel['records'])
-                need_to_update = False
-                for record in tunnel['records']:
-                    if record['name'] == arp['macAddress']:
-                        records.remove(record)
-                        need_to_update = True
-                if need_to_update:
-                    payload = dict()
-                    payload['records'] = records
-                    response = self.bigip.icr_session.put(
-                        self.bigip.icr_link(tunnel['selfLink']),
-                        data=json.dumps(payload),
-                        timeout=const.CONNECTION_TIMEOUT)
-                if response.status_code > 399:
-                    Log.error('fdb', response.text)
+                Log.error('fdb', exc.message)
 
     @icontrol_rest_folder
     @log
@@ -264,15 +257,20 @@ class Pool(object):
             if decorated_pool in cleanup_list:
                 del cleanup_list[decorated_pool]
 
+        # resolve every pool's virtual servers from one build of the
+        # reference index, deleting a virtual server drops the index
+        pool_virtual_servers = {}
+        for pool in cleanup_list:
+            pool_virtual_servers[pool] = \
+                self.bigip.virtual_server.get_virtual_servers_by_pool_name(
+                    pool_name=pool, folder=cleanup_list[pool])
+
         # anything left should be purged
         for pool in cleanup_list:
             Log.debug('purge_orphaned_pools',
                       "Purging pool %s in folder %s" %
                       (pool, cleanup_list[pool]))
-            vs_name = \
-                self.bigip.virtual_server.get_virtual_servers_by_pool_name(
-                    pool_name=pool, folder=cleanup_list[pool])
-            if vs_name:
+            for vs_name in pool_virtual_servers[pool]:
                 try:
                     self.bigip.virtual_server.delete(
                         name=vs_name, folder=cleanup_list[pool])
@@ -334,16 +332,8 @@ class Pool(object):
         return_stats = {}
         if response.status_code < 400:
             return_obj = json.loads(response.text)
-            if 'entries' in return_obj:
-                for stat in return_obj['entries']:
-                    name = stat
-                    if 'value' in return_obj['entries'][name]:
-                        value = return_obj['entries'][name]['value']
-                    if 'description' in return_obj['entries'][name]:
-                        value = return_obj['entries'][name]['description']
-                    (st, val) = self._get_icontrol_stat(name, value)
-                    if st:
-                        return_stats[st] = val
+            return_stats = translate_entries(
+                POOL_STATS, return_obj.get('entries', {}))
         elif response.status_code != 404:
             Log.error('pool', response.text)
             raise exceptions.PoolQueryException(response.text)
@@ -486,26 +476,194 @@ class Pool(object):
             response = self.bigip.icr_session.delete(
                 request_url, timeout=const.CONNECTION_TIMEOUT)
             if response.status_code < 400 or response.status_code == 404:
-                # delete nodes
-                node_req = self.bigip.icr_url + '/ltm/node/'
-                node_req += '~' + folder + '~' + urllib.quote(ip_address)
-                response = self.bigip.icr_session.delete(
-                    node_req, timeout=const.CONNECTION_TIMEOUT)
-                if response.status_code == 400 and \
-                        response.text.find('is referenced') > 0:
-                    # Node address is part of multiple pools
-                    pass
-                elif response.status_code > 399 and \
-                        (not response.status_code == 404):
-                    Log.error('node', response.text)
-                    raise exceptions.PoolDeleteException(response.text)
-                else:
-                    self._del_arp_and_fdb(ip_address, folder)
+                self._release_nodes([ip_address], folder)
             else:
                 Log.error('pool', response.text)
                 raise exceptions.PoolDeleteException(response.text)
         return False
 
+    def _release_nodes(self, ip_addresses, folder):
+        """
+        Delete nodes no other pool references and their ARP and fdb
+        entries, after the commit if a transaction is active, as the
+        member deletes are only queued until then.
+        """
+        def release():
+            """ Delete the freed nodes """
+            freed_addresses = [ip_address for ip_address in ip_addresses
+                               if self._delete_node(ip_address, folder)]
+            self._del_arp_and_fdb(freed_addresses, folder)
+        if ip_addresses:
+            self.bigip.icr_session.after_commit(release)
+
+    def _delete_node(self, ip_address, folder):
+        """ Delete node unless another pool references it, True if gone """
+        node_req = self.bigip.icr_url + '/ltm/node/'
+        node_req += '~' + folder + '~' + urllib.quote(ip_address)
+        response = self.bigip.icr_session.delete(
+            node_req, timeout=const.CONNECTION_TIMEOUT)
+        if response.status_code == 400 and \
+                response.text.find('is referenced') > 0:
+            # Node address is part of multiple pools
+            pass
+        elif response.status_code > 399 and \
+                (not response.status_code == 404):
+            Log.error('node', response.text)
+            raise exceptions.PoolDeleteException(response.text)
+        else:
+            return True
+        return False
+
+    @icontrol_rest_folder
+    @log
+    def set_members(self, name=None, members=None, folder='Common'):
+        """
+        Make members the pool membership. Members are dicts with
+        'addr' and 'port' and optional 'ratio' and 'enabled'.
+        Missing members are added, changed ones updated and the
+        rest removed. Members already matching are not touched.
+        """
+        return self._apply_members(name, members, folder, remove=True)
+
+    @icontrol_rest_folder
+    @log
+    def update_members(self, name=None, members=None, folder='Common'):
+        """
+        Add or update members like set_members, without removing
+        members which are not listed.
+        """
+        return self._apply_members(name, members, folder, remove=False)
+
+    def _apply_members(self, name, members, folder, remove):
+        """ Apply member delta in one request or transaction """
+        if not name:
+            return False
+        folder = str(folder).replace('/', '')
+        pool_url = self.bigip.icr_url + '/ltm/pool/'
+        pool_url += '~' + folder + '~' + name + '/members'
+        current = self._get_member_states(pool_url, folder, name)
+        if current is None:
+            return False
+        desired = self._decorate_members(members or [], folder)
+
+        changes = []
+        for key in desired:
+            member = desired[key]
+            if key not in current:
+                payload = dict()
+                payload['name'] = key[0] + ':' + key[1]
+                payload['partition'] = folder
+                payload['address'] = key[0]
+                if 'ratio' in member:
+                    payload['ratio'] = member['ratio']
+                if 'enabled' in member and not member['enabled']:
+                    payload['session'] = 'user-disabled'
+                changes.append(('post', pool_url, payload))
+                continue
+            payload = dict()
+            if 'ratio' in member and \
+                    member['ratio'] != current[key]['ratio']:
+                payload['ratio'] = member['ratio']
+            if 'enabled' in member and \
+                    bool(member['enabled']) != current[key]['enabled']:
+                if member['enabled']:
+                    payload['session'] = 'user-enabled'
+                else:
+                    payload['session'] = 'user-disabled'
+            if payload:
+                changes.append(
+                    ('put', pool_url + '/' + current[key]['path'], payload))
+        removed_addresses = []
+        if remove:
+            for key in current:
+                if key not in desired:
+                    changes.append(
+                        ('delete', pool_url + '/' + current[key]['path'],
+                         None))
+                    if key[0] not in removed_addresses:
+                        removed_addresses.append(key[0])
+        if not changes:
+            return True
+
+        if len(changes) == 1:
+            self._send_member_change(*changes[0])
+        else:
+            with self.bigip.transaction():
+                for change in changes:
+                    self._send_member_change(*change)
+        # nodes may be shared with other pools, so they
+        # are cleaned up outside of the transaction
+        self._release_nodes(removed_addresses, folder)
+        return True
+
+    def _get_member_states(self, pool_url, folder, name):
+        """ Get {(address, port): state} of members, None if no pool """
+        request_url = pool_url + '?$select=name,address,ratio,session'
+        response = self.bigip.icr_session.get(
+            request_url, timeout=const.CONNECTION_TIMEOUT)
+        if response.status_code == 404:
+            Log.error('pool', 'tried to set members of non-existant pool %s.'
+                      % ('/' + folder + '/' + name))
+            return None
+        elif response.status_code > 399:
+            Log.error('pool', response.text)
+            raise exceptions.PoolQueryException(response.text)
+        members = {}
+        for member in json.loads(response.text).get('items', []):
+            address = member['address']
+            if member['name'].startswith(address):
+                port = member['name'][len(address) + 1:]
+                path = urllib.quote(address) + member['name'][len(address):]
+            else:
+                port = member['name'].split(':')[-1]
+                path = member['name']
+            members[(address, port)] = {
+                'path': '~' + folder + '~' + path,
+                'ratio': member.get('ratio', 1),
+                'enabled': member.get('session') != 'user-disabled'}
+        return members
+
+    def _decorate_members(self, members, folder):
+        """ Get {(address, port): member} with route domain addresses """
+        decorated = {}
+        rid = None
+        for member in members:
+            address = member['addr']
+            decorator_index = address.find('%')
+            if decorator_index < 0:
+                validate_address(address)
+                if self.bigip.route_domain_required:
+                    if rid is None:
+                        rid = self.bigip.get_domain_index(folder)
+                    if rid > 0:
+                        address = address + '%' + str(rid)
+            else:
+                validate_address(address[:decorator_index])
+            decorated[(address, str(member['port']))] = member
+        return decorated
+
+    def _send_member_change(self, method, request_url, payload):
+        """ Send a member POST, PUT or DELETE """
+        if method == 'delete':
+            response = self.bigip.icr_session.delete(
+                request_url, timeout=const.CONNECTION_TIMEOUT)
+        else:
+            response = getattr(self.bigip.icr_session, method)(
+                request_url, data=json.dumps(payload),
+                timeout=const.CONNECTION_TIMEOUT)
+        if response.status_code < 400:
+            return
+        elif method == 'post' and response.status_code == 409:
+            return
+        elif method == 'delete' and response.status_code == 404:
+            return
+        Log.error('pool', response.text)
+        if method == 'post':
+            raise exceptions.PoolCreationException(response.text)
+        elif method == 'put':
+            raise exceptions.PoolUpdateException(response.text)
+        raise exceptions.PoolDeleteException(response.text)
+
     @icontrol_rest_folder
     @log
     def delete_all_nodes(self, folder='Common'):
@@ -518,13 +676,8 @@ class Pool(object):
         if response.status_code < 400:
             return_obj = json.loads(response.text)
             if 'items' in return_obj:
-                for node in return_obj['items']:
-                    ip_address = node['address']
-                    response = self.bigip.icr_session.delete(
-                        self.bigip.icr_link(node['selfLink']),
-                        timeout=const.CONNECTION_TIMEOUT)
-                    if response.status_code < 400:
-                        self._del_arp_and_fdb(ip_address, folder)
+                self._release_nodes(
+                    [node['address'] for node in return_obj['items']], folder)
         elif response.status_code != 404:
             Log.error('node', response.text)
             return False
@@ -903,65 +1056,7 @@ class Pool(object):
             return 'round-robin'
 
     def _get_icontrol_stat(self, name, value):
-        if name == "activeMemberCnt":
-            return ('POOL_ACTIVE_MEMBERS', value)
-        elif name == "connqAll.ageEdm":
-            return ('STATISTIC_CONNQUEUE_AGGR_AGE_EXPONENTIAL_DECAY_MAX',
-                    value)
-        elif name == "connqAll.ageEma":
-            return ('STATISTIC_CONNQUEUE_AGGR_AGE_MOVING_AVG', value)
-        elif name == "connqAll.ageHead":
-            return ('STATISTIC_CONNQUEUE_AGGR_AGE_OLDEST_ENTRY', value)
-        elif name == "connqAll.ageMax":
-            return ('STATISTIC_CONNQUEUE_AGGR_AGE_MAX', value)
-        elif name == "connqAll.depth":
-            return ('STATISTIC_CONNQUEUE_AGGR_CONNECTIONS', value)
-        elif name == "connqAll.serviced":
-            return ('STATISTIC_CONNQUEUE_AGGR_SERVICED', value)
-        elif name == "connq.ageEdm":
-            return ('STATISTIC_CONNQUEUE_AGE_EXPONENTIAL_DECAY_MAX', value)
-        elif name == "connq.ageEma":
-            return ('STATISTIC_CONNQUEUE_AGE_MOVING_AVG', value)
-        elif name == "connq.ageHead":
-            return ('STATISTIC_CONNQUEUE_AGE_OLDEST_ENTRY', value)
-        elif name == "connq.ageMax":
-            return ('STATISTIC_CONNQUEUE_AGE_MAX', value)
-        elif name == "connq.depth":
-            return ('STATISTIC_CONNQUEUE_CONNECTIONS', value)
-        elif name == "connq.serviced":
-            return ('STATISTIC_CONNQUEUE_SERVICED', value)
-        elif name == "curSessions":
-            return ('STATISTIC_CURRENT_SESSIONS', value)
-        elif name == "minActiveMembers":
-            return ('POOL_MINIMUM_ACTIVE_MEMBERS', value)
-        elif name == "monitorRule":
-            return ('POOL_MONITOR_RULE', value)
-        elif name == "tmName":
-            return ('POOL_NAME', os.path.basename(value))
-        elif name == "serverside.bitsIn":
-            return ('STATISTIC_SERVER_SIDE_BYTES_IN', int(value) * 8)
-        elif name == "serverside.bitsOut":
-            return ('STATISTIC_SERVER_SIDE_BYTES_OUT', int(value) * 8)
-        elif name == "serverside.curConns":
-            return ('STATISTIC_SERVER_SIDE_CURRENT_CONNECTIONS', value)
-        elif name == "serverside.maxConns":
-            return ('STATISTIC_SERVER_SIDE_MAXIMUM_CONNECTIONS', value)
-        elif name == "serverside.pktsIn":
-            return ('STATISTIC_SERVER_SIDE_PACKETS_IN', value)
-        elif name == "serverside.pktsOut":
-            return ('STATISTIC_SERVER_SIDE_PACKETS_OUT', value)
-        elif name == "serverside.totConns":
-            return ('STATISTIC_SERVER_SIDE_TOTAL_CONNECTIONS', value)
-        elif name == "status.availabilityState":
-            return ('AVAILABLE_STATE', value)
-        elif name == "status.enabledState":
-            return ('ENABLED_STATE', value)
-        elif name == "status.statusReason":
-            return ('STATUS_REASON', value)
-        elif name == "totRequests":
-            return ('STATISTIC_TOTAL_REQUESTS', value)
-        else:
-            return (None, None)
+        return translate_stat(POOL_STATS, name, value)
 
     @icontrol_rest_folder
     @log
@@ -15,6 +15,7 @@
 
 from f5.common.logger import Log
 from f5.common import constants as const
+from f5.common.cache import TTLCache
 from f5.bigip.interfaces import domain_address
 from f5.bigip.interfaces import icontrol_rest_folder
 from f5.bigip.interfaces import strip_folder_and_prefix
@@ -22,12 +23,27 @@ from f5.bigip import exceptions
 from f5.bigip.interfaces import log
 
 import json
+import threading
 
 
 class Route(object):
+    # route domain ids by folder, shared by all BigIP objects
+    # for the same device
+    domain_caches = {}
+    domain_caches_lock = threading.Lock()
+
     def __init__(self, bigip):
         self.bigip = bigip
-        self.domain_index = {'Common': 0}
+        self.domain_index = Route.get_domain_cache(bigip.hostname)
+
+    @staticmethod
+    def get_domain_cache(hostname):
+        """ Get the shared route domain id cache for a device """
+        with Route.domain_caches_lock:
+            if hostname not in Route.domain_caches:
+                Route.domain_caches[hostname] = \
+                    TTLCache(const.ROUTE_DOMAIN_CACHE_TTL)
+            return Route.domain_caches[hostname]
 
     @domain_address
     @icontrol_rest_folder
@@ -189,7 +205,8 @@ class Route(object):
             payload = dict()
             payload['name'] = folder
             payload['partition'] = '/' + folder
-            payload['id'] = self._get_next_domain_id()
+            domain_id = self._get_next_domain_id()
+            payload['id'] = domain_id
             if self.bigip.strict_route_isolation:
                 payload['strict'] = 'enabled'
             else:
@@ -200,8 +217,10 @@ class Route(object):
                 request_url, data=json.dumps(payload),
                 timeout=const.CONNECTION_TIMEOUT)
             if response.status_code < 400:
+                self.domain_index.put(folder, domain_id)
                 return True
             elif response.status_code == 409:
+                self.domain_index.invalidate(folder)
                 return True
             else:
                 Log.error('route-domain', response.text)
@@ -217,6 +236,7 @@ class Route(object):
         if not folder == 'Common':
             request_url = self.bigip.icr_url + '/net/route-domain/'
             request_url += '~' + folder + '~' + folder
+            self.domain_index.invalidate(folder)
             response = self.bigip.icr_session.delete(
                 request_url, timeout=const.CONNECTION_TIMEOUT)
             if response.status_code < 400:
@@ -253,8 +273,9 @@ class Route(object):
         folder = str(folder).replace('/', '')
         if folder == 'Common':
             return 0
-        if folder in self.domain_index:
-            return self.domain_index[folder]
+        domain_id = self.domain_index.get(folder)
+        if domain_id is not None:
+            return domain_id
         else:
             request_url = self.bigip.icr_url + '/net/route-domain/'
             request_url += '~' + folder + '~' + folder
@@ -264,8 +285,9 @@ class Route(object):
             if response.status_code < 400:
                 response_obj = json.loads(response.text)
                 if 'id' in response_obj:
-                    self.domain_index[folder] = int(response_obj['id'])
-                    return self.domain_index[folder]
+                    domain_id = int(response_obj['id'])
+                    self.domain_index.put(folder, domain_id)
+                    return domain_id
             elif response.status_code != 404:
                 Log.error('route-domain', response.text)
                 raise exceptions.RouteQueryException(response.text)
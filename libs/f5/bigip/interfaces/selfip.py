@@ -17,6 +17,7 @@ from f5.common.logger import Log
 from f5.common import constants as const
 from f5.bigip.interfaces import domain_address
 from f5.bigip.interfaces import icontrol_rest_folder
+from f5.bigip.interfaces import invalidates
 from f5.bigip.interfaces import strip_folder_and_prefix
 from f5.bigip.interfaces import strip_domain_address
 from f5.bigip import exceptions
@@ -33,6 +34,7 @@ class SelfIP(object):
     def __init__(self, bigip):
         self.bigip = bigip
 
+    @invalidates('selfip_vlan')
     @icontrol_rest_folder
     @domain_address
     @log
@@ -99,6 +101,7 @@ class SelfIP(object):
                 raise exceptions.SelfIPCreationException(response.text)
         return False
 
+    @invalidates('selfip_vlan')
     @icontrol_rest_folder
     @log
     def delete(self, name=None, folder='Common', preserve_vlan_name=False):
@@ -118,6 +121,7 @@ class SelfIP(object):
                 return True
         return False
 
+    @invalidates('selfip_vlan')
     @icontrol_rest_folder
     @log
     def delete_by_vlan_name(self, vlan_name=None, folder='Common'):
@@ -170,6 +174,7 @@ class SelfIP(object):
                 raise exceptions.SelfIPQueryException(response.text)
         return False
 
+    @invalidates('selfip_vlan')
     @icontrol_rest_folder
     @log
     def delete_all(self, folder='Common'):
@@ -347,6 +352,7 @@ class SelfIP(object):
                 raise exceptions.SelfIPQueryException(response.text)
         return None
 
+    @invalidates('selfip_vlan')
     @icontrol_rest_folder
     @log
     def set_vlan(self, name=None, vlan_name=None, folder='Common'):
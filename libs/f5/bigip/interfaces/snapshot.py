@@ -0,0 +1,220 @@
+# Copyright 2014 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5.common.logger import Log
+from f5.common import constants as const
+from f5.bigip.interfaces import icontrol_rest_folder
+from f5.bigip.interfaces import prefixed
+from f5.bigip.interfaces import strip_domain_address
+from f5.bigip.interfaces import strip_folder_and_prefix
+from f5.bigip import exceptions
+from f5.bigip.interfaces import log
+
+import json
+import time
+
+# collection kind: (REST path, expand subcollections)
+COLLECTIONS = {
+    'pool': ('/ltm/pool', True),
+    'virtual': ('/ltm/virtual', True),
+    'virtual_address': ('/ltm/virtual-address', False),
+    'node': ('/ltm/node', False),
+    'snat_translation': ('/ltm/snat-translation', False),
+    'snatpool': ('/ltm/snatpool', False),
+    'selfip': ('/net/self', False),
+    'vlan': ('/net/vlan', True),
+    'route': ('/net/route', False),
+    'arp': ('/net/arp', False)
+}
+
+# kind: [(referenced kind, attribute)], attribute may be dotted
+REFERENCES = {
+    'virtual': [('pool', 'pool'),
+                ('vlan', 'vlans'),
+                ('snatpool', 'sourceAddressTranslation.pool')],
+    'pool_member': [('pool', 'pool'),
+                    ('node', 'node')],
+    'snatpool': [('snat_translation', 'members')],
+    'selfip': [('vlan', 'vlan')]
+}
+
+# kind: address attribute
+ADDRESSES = {
+    'virtual': 'destination',
+    'virtual_address': 'address',
+    'node': 'address',
+    'pool_member': 'address',
+    'snat_translation': 'address',
+    'selfip': 'address',
+    'arp': 'ipAddress'
+}
+
+
+class Snapshot(object):
+    """ Bulk loader of partition configuration """
+    def __init__(self, bigip):
+        self.bigip = bigip
+
+    @icontrol_rest_folder
+    @log
+    def load(self, folder='Common', kinds=None):
+        """ Get a PartitionSnapshot of folder with one GET per kind """
+        folder = str(folder).replace('/', '')
+        if not kinds:
+            kinds = sorted(COLLECTIONS)
+        snapshot = PartitionSnapshot(folder)
+        for kind in kinds:
+            snapshot.add(kind, self._get_items(kind, folder))
+        return snapshot
+
+    def _get_items(self, kind, folder):
+        """ Get all items of a collection in folder """
+        (path, expand) = COLLECTIONS[kind]
+        request_url = self.bigip.icr_url + path
+        request_url += '?$filter=partition eq ' + folder
+        if expand:
+            request_url += '&expandSubcollections=true'
+        response = self.bigip.icr_session.get(
+            request_url, timeout=const.CONNECTION_TIMEOUT)
+        if response.status_code < 400:
+            return json.loads(response.text).get('items', [])
+        elif response.status_code != 404:
+            Log.error('snapshot', response.text)
+            raise exceptions.SnapshotQueryException(response.text)
+        return []
+
+
+class PartitionSnapshot(object):
+    """
+    Indexed in memory copy of a partition's configuration.
+
+    Items are the REST objects as returned by the device, looked
+    up by full path, by address (without route domain) or by the
+    objects which reference them. Pool members are indexed as
+    'pool_member' items with 'pool' and 'node' paths added.
+    """
+    def __init__(self, folder='Common'):
+        self.folder = folder
+        self.loaded_at = time.time()
+        self.items = {}
+        self.addresses = {}
+        self.referrers = {}
+
+    def add(self, kind, items):
+        """ Add and index items of a kind """
+        by_path = self.items.setdefault(kind, {})
+        for item in items:
+            by_path[item['fullPath']] = item
+            self._index(kind, item)
+            if kind == 'pool':
+                for member in self._get_pool_members(item):
+                    self._index('pool_member', member)
+
+    def age(self):
+        """ Seconds since the snapshot was loaded """
+        return time.time() - self.loaded_at
+
+    def get(self, kind, name):
+        """ Get item by full path or by name in the snapshot folder """
+        by_path = self.items.get(kind, {})
+        if name.startswith('/'):
+            return by_path.get(name)
+        item = by_path.get('/' + self.folder + '/' + name)
+        if not item:
+            item = by_path.get('/' + self.folder + '/' + prefixed(name))
+        return item
+
+    def get_all(self, kind):
+        """ Get all items of a kind """
+        return self.items.get(kind, {}).values()
+
+    def get_names(self, kind):
+        """ Get names of a kind without folder and prefix """
+        return [strip_folder_and_prefix(item['name'])
+                for item in self.get_all(kind)]
+
+    def get_by_address(self, address, kind=None):
+        """ Get (kind, item) tuples with address """
+        matches = self.addresses.get(_base_address(address), [])
+        return [match for match in matches if not kind or match[0] == kind]
+
+    def get_referrers(self, kind, name, referrer_kind=None):
+        """ Get (kind, item) tuples which reference an item """
+        if not name.startswith('/'):
+            item = self.get(kind, name)
+            if not item:
+                return []
+            name = item['fullPath']
+        matches = self.referrers.get((kind, name), [])
+        return [match for match in matches
+                if not referrer_kind or match[0] == referrer_kind]
+
+    def _index(self, kind, item):
+        """ Index item by address and references """
+        if kind in ADDRESSES:
+            address = item.get(ADDRESSES[kind])
+            if address:
+                if kind == 'virtual':
+                    address = _split_port(address.split('/')[-1])[0]
+                self.addresses.setdefault(
+                    _base_address(address), []).append((kind, item))
+        for (referenced_kind, attribute) in REFERENCES.get(kind, []):
+            for path in _get_values(item, attribute):
+                self.referrers.setdefault(
+                    (referenced_kind, path), []).append((kind, item))
+
+    @staticmethod
+    def _get_pool_members(pool):
+        """ Get pool member items with pool and node paths """
+        members = []
+        for member in pool.get('membersReference', {}).get('items', []):
+            member = dict(member)
+            member['pool'] = pool['fullPath']
+            if 'fullPath' not in member:
+                member['fullPath'] = \
+                    '/' + member['partition'] + '/' + member['name']
+            member['node'] = _split_port(member['fullPath'])[0]
+            members.append(member)
+        return members
+
+
+def _get_values(item, attribute):
+    """ Get list of values of a dotted attribute """
+    value = item
+    for key in attribute.split('.'):
+        if not isinstance(value, dict):
+            return []
+        value = value.get(key)
+    if not value:
+        return []
+    if isinstance(value, list):
+        return value
+    return [value]
+
+
+def _split_port(name):
+    """ Split address:port, or address.port for IPv6 """
+    if name.count(':') > 1:
+        index = name.rfind('.')
+    else:
+        index = name.rfind(':')
+    if index < 0:
+        return (name, None)
+    return (name[:index], name[index + 1:])
+
+
+def _base_address(address):
+    """ Address without route domain or mask """
+    return strip_domain_address(address).split('/')[0]
@@ -17,6 +17,7 @@ from f5.common.logger import Log
 from f5.common import constants as const
 from f5.bigip.interfaces import domain_address
 from f5.bigip.interfaces import icontrol_rest_folder
+from f5.bigip.interfaces import invalidates
 from f5.bigip.interfaces import strip_folder_and_prefix
 from f5.bigip.interfaces import strip_domain_address
 from f5.bigip import exceptions
@@ -30,6 +31,7 @@ class SNAT(object):
     def __init__(self, bigip):
         self.bigip = bigip
 
+    @invalidates('snatpool_member')
     @icontrol_rest_folder
     @domain_address
     @log
@@ -133,6 +135,7 @@ class SNAT(object):
             raise exceptions.SNATQueryException(response.text)
         return False
 
+    @invalidates('snatpool_member')
     @icontrol_rest_folder
     @log
     def delete_snatpool(self, name=None, folder='Common'):
@@ -164,6 +167,7 @@ class SNAT(object):
                 raise exceptions.SNATQueryException(response.text)
         return False
 
+    @invalidates('snatpool_member')
     @icontrol_rest_folder
     @log
     def delete_all_snatpools(self, folder='Common'):
@@ -263,24 +267,11 @@ class SNAT(object):
     @log
     def get_snatpool_member_use_count(self, name):
         """ Get use count for all SNAT pool members """
-        request_url = self.bigip.icr_url + '/ltm/snatpool'
-        response = self.bigip.icr_session.get(
-            request_url, timeout=const.CONNECTION_TIMEOUT)
-        use_count = 0
-        if response.status_code < 400:
-            return_obj = json.loads(response.text)
-            if 'items' in return_obj:
-                items = return_obj['items']
-                for item in items:
-                    if 'members' in item:
-                        for snat_name in item['members']:
-                            if name in strip_folder_and_prefix(snat_name):
-                                use_count += 1
-        elif response.status_code != 404:
-            Log.error('snatpool', response.text)
-            raise exceptions.SNATQueryException(response.text)
+        use_count = len(self.bigip.references.get_referrers(
+            'snatpool_member', name))
         return use_count
 
+    @invalidates('snatpool_member')
     @icontrol_rest_folder
     @log
     def create_pool(self, name=None, member_name=None, folder='Common'):
@@ -303,6 +294,7 @@ class SNAT(object):
                 raise exceptions.SNATCreationException(response.text)
         return False
 
+    @invalidates('snatpool_member')
     @icontrol_rest_folder
     @log
     def add_to_pool(self, name=None, member_name=None, folder='Common'):
@@ -340,6 +332,7 @@ class SNAT(object):
             raise exceptions.SNATUpdateException(response.text)
         return False
 
+    @invalidates('snatpool_member')
     @icontrol_rest_folder
     @log
     def remove_from_pool(self, name=None, member_name=None, folder='Common'):
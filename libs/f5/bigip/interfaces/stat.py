@@ -13,10 +13,16 @@
 # limitations under the License.
 #
 
+from f5.common.logger import Log
 from f5.common import constants as const
 from f5.bigip.interfaces import log
+from f5.bigip import exceptions
 
+import collections
+import json
+import threading
 import time
+import weakref
 
 
 class Stat(object):
@@ -32,14 +38,19 @@ class Stat(object):
         self.sys_info = self.bigip.icontrol.System.SystemInfo
         self.sys_stat = self.bigip.icontrol.System.Statistics
 
+        self.sampler = None
+
     @log
     def get_composite_score(self):
-        """ Get composite score """
-        cpu_score = self.get_cpu_health_score() * \
+        """ Get composite score from the latest health samples """
+        (previous, latest) = self._get_sample_window()
+        cpu_score = _get_cpu_score(latest['cpu_used'],
+                                   latest['cpu_idle']) * \
                     const.DEVICE_HEALTH_SCORE_CPU_WEIGHT
-        mem_score = self.get_mem_health_score() * \
+        mem_score = _get_mem_score(latest['mem_total'],
+                                   latest['mem_used']) * \
                     const.DEVICE_HEALTH_SCORE_MEM_WEIGHT
-        cps_score = self.get_cps_health_score() * \
+        cps_score = _get_cps_score(previous, latest) * \
                     const.DEVICE_HEALTH_SCORE_CPS_WEIGHT
 
         total_weight = const.DEVICE_HEALTH_SCORE_CPU_WEIGHT + \
@@ -52,26 +63,88 @@ class Stat(object):
     @log
     def get_mem_health_score(self):
         """ use TMM memory usage for memory health """
+        with self.bigip.soap_lock:
+            (total_memory, used_memory) = self._get_mem_usage()
+        return _get_mem_score(total_memory, used_memory)
+
+    @log
+    def get_cpu_health_score(self):
+        """ Get cpu health score """
+        with self.bigip.soap_lock:
+            (used_cycles, idle_cycles) = self._get_cpu_usage()
+        return _get_cpu_score(used_cycles, idle_cycles)
+
+    @log
+    def get_cps_health_score(self):
+        """ Get cps health score from the latest health samples """
+        (previous, latest) = self._get_sample_window()
+        return _get_cps_score(previous, latest)
+
+    def start_sampler(self, period=None):
+        """ Start sampling health counters in the background """
+        if self.sampler and self.sampler.is_running():
+            return self.sampler
+        self.sampler = HealthSampler(self, period)
+        self.sampler.start()
+        return self.sampler
+
+    def stop_sampler(self):
+        """ Stop the background sampler """
+        if self.sampler:
+            self.sampler.stop()
+            self.sampler = None
+
+    def get_health_samples(self):
+        """ Get the recorded health samples, oldest first """
+        if not self.sampler:
+            return []
+        return self.sampler.get_samples()
+
+    def get_health_sample(self):
+        """ Read TCP accepted, CPU and TMM memory counters now """
+        # the suds clients are shared with the other interfaces
+        with self.bigip.soap_lock:
+            (cpu_used, cpu_idle) = self._get_cpu_usage()
+            (mem_total, mem_used) = self._get_mem_usage()
+            tcp_accepted = self._get_tcp_accepted_count()
+        return {'time': time.time(),
+                'tcp_accepted': tcp_accepted,
+                'cpu_used': cpu_used,
+                'cpu_idle': cpu_idle,
+                'mem_total': mem_total,
+                'mem_used': mem_used}
+
+    def _get_sample_window(self):
+        """ Get the two latest samples, starting the sampler if needed """
+        sampler = self.start_sampler()
+        samples = sampler.wait_for_samples(
+            2, 2 * sampler.period + const.CONNECTION_TIMEOUT)
+        if len(samples) < 2:
+            raise exceptions.SystemQueryException(
+                'health sampler has no samples for %s' % self.bigip.hostname)
+        return (samples[-2], samples[-1])
+
+    def _get_mem_usage(self):
+        """ Get (total, used) TMM memory """
+        if self.bigip.rest_only:
+            return self._get_rest_mem_usage()
         stat_type = self.sys_stat.typefactory.create(
                                     'Common.StatisticType')
 
+        total_memory = 0.0
+        used_memory = 0.0
         for stat in self.sys_stat.get_all_tmm_statistics(
                                     ['0.0']).statistics[0].statistics:
             if stat.type == stat_type.STATISTIC_MEMORY_TOTAL_BYTES:
                 total_memory = float(self.bigip.ulong_to_int(stat.value))
             if stat.type == stat_type.STATISTIC_MEMORY_USED_BYTES:
                 used_memory = float(self.bigip.ulong_to_int(stat.value))
+        return (total_memory, used_memory)
 
-        if total_memory and used_memory:
-            score = int(100 * \
-                    ((total_memory - used_memory) / total_memory))
-            return score
-        else:
-            return 0
-
-    @log
-    def get_cpu_health_score(self):
-        """ Get cpu health score """
+    def _get_cpu_usage(self):
+        """ Get (used, idle) cpu cycles """
+        if self.bigip.rest_only:
+            return self._get_rest_cpu_usage()
         cpu_stats = self.sys_info.get_cpu_usage_information()
         used_cycles = 1
         idle_cycles = 1
@@ -80,32 +153,175 @@ class Stat(object):
             used_cycles += self.bigip.ulong_to_int(cpus.user)
             used_cycles += self.bigip.ulong_to_int(cpus.system)
             idle_cycles = self.bigip.ulong_to_int(cpus.idle)
-
-        score = int(100 - \
-                (100 * (float(used_cycles) / float(idle_cycles))))
-        return score
-
-    @log
-    def get_cps_health_score(self):
-        """ Get cps health score """
-        count_init = self._get_tcp_accepted_count()
-        time.sleep(const.DEVICE_HEALTH_SCORE_CPS_PERIOD)
-        count_final = self._get_tcp_accepted_count()
-        cps = (count_final - count_init) \
-              / const.DEVICE_HEALTH_SCORE_CPS_PERIOD
-
-        if cps >= const.DEVICE_HEALTH_SCORE_CPS_MAX:
-            return 0
-        else:
-            score = int(100 - ((100 * float(cps)) \
-            / float(const.DEVICE_HEALTH_SCORE_CPS_MAX)))
-        return score
+        return (used_cycles, idle_cycles)
 
     def _get_tcp_accepted_count(self):
         """ Get tcp accepted count """
+        if self.bigip.rest_only:
+            return self._get_rest_tcp_accepted_count()
         stat_type = self.sys_stat.typefactory.create(
                                     'Common.StatisticType')
 
         for stat in self.sys_stat.get_tcp_statistics().statistics:
             if stat.type == stat_type.STATISTIC_TCP_ACCEPTED_CONNECTIONS:
                 return self.bigip.ulong_to_int(stat.value)
+
+    def _get_rest_mem_usage(self):
+        """ Get (total, used) TMM memory over REST """
+        total_memory = 0.0
+        used_memory = 0.0
+        for stats in self._get_rest_stats('/sys/tmm-info/stats'):
+            if 'memoryTotal' in stats and 'memoryUsed' in stats:
+                total_memory += float(stats['memoryTotal']['value'])
+                used_memory += float(stats['memoryUsed']['value'])
+        return (total_memory, used_memory)
+
+    def _get_rest_cpu_usage(self):
+        """ Get (used, idle) cpu cycles over REST """
+        used_cycles = 1
+        idle_cycles = 1
+
+        for stats in self._get_rest_stats('/sys/cpu/stats'):
+            if 'idle' in stats:
+                used_cycles += int(stats['user']['value'])
+                used_cycles += int(stats['system']['value'])
+                idle_cycles = int(stats['idle']['value'])
+        return (used_cycles, idle_cycles)
+
+    def _get_rest_tcp_accepted_count(self):
+        """ Get client side connection count over REST """
+        count = 0
+        for stats in self._get_rest_stats('/sys/tmm-traffic/stats'):
+            if 'clientSideTraffic.totConns' in stats:
+                count += int(stats['clientSideTraffic.totConns']['value'])
+        return count
+
+    def _get_rest_stats(self, path):
+        """ Get the innermost stat entries of a stats resource """
+        request_url = self.bigip.icr_url + path
+        response = self.bigip.icr_session.get(
+            request_url, timeout=const.CONNECTION_TIMEOUT)
+        if response.status_code >= 400:
+            Log.error('stats', response.text)
+            raise exceptions.SystemQueryException(response.text)
+        nested = [json.loads(response.text).get('entries', {})]
+        stats_list = []
+        while nested:
+            entries = nested.pop()
+            leaf = True
+            for entry in entries.values():
+                if 'nestedStats' in entry:
+                    leaf = False
+                    nested.append(entry['nestedStats'].get('entries', {}))
+            if leaf:
+                stats_list.append(entries)
+        return stats_list
+
+
+class HealthSampler(object):
+    """
+    Background sampler of device health counters.
+
+    A daemon thread reads the TCP accepted, CPU and TMM memory
+    counters every period seconds into a ring buffer of the last
+    DEVICE_HEALTH_SAMPLE_COUNT samples, so health scores are
+    computed from recorded samples instead of sleeping between
+    two reads. Sampling errors are logged and retried next period.
+    The thread stops once the samples have not been read for
+    DEVICE_HEALTH_SAMPLER_IDLE_PERIODS periods, or the Stat object
+    is gone, and holds only a weak reference to it so a discarded
+    BigIP is not kept alive.
+    """
+    def __init__(self, stat, period=None):
+        self.stat = weakref.ref(stat)
+        self.hostname = stat.bigip.hostname
+        self.period = period or const.DEVICE_HEALTH_SCORE_CPS_PERIOD
+        self.samples = collections.deque(
+            maxlen=const.DEVICE_HEALTH_SAMPLE_COUNT)
+        self.sampled = threading.Condition()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.read_at = time.time()
+
+    def start(self):
+        """ Start the sampling thread """
+        self.stopped.clear()
+        self.thread = threading.Thread(
+            target=self._run,
+            name='health-sampler-' + str(self.hostname))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """ Stop the sampling thread after the current sample """
+        self.stopped.set()
+        with self.sampled:
+            self.sampled.notify_all()
+
+    def is_running(self):
+        """ Is the sampling thread alive? """
+        return self.thread is not None and self.thread.is_alive() and \
+            not self.stopped.is_set()
+
+    def get_samples(self):
+        """ Get the recorded samples, oldest first """
+        with self.sampled:
+            self.read_at = time.time()
+            return list(self.samples)
+
+    def wait_for_samples(self, count, timeout):
+        """ Wait until count samples are recorded or timeout """
+        deadline = time.time() + timeout
+        with self.sampled:
+            self.read_at = time.time()
+            while len(self.samples) < count and self.is_running():
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self.sampled.wait(remaining)
+            return list(self.samples)
+
+    def _run(self):
+        """ Record a sample every period until stopped """
+        while not self.stopped.is_set():
+            stat = self.stat()
+            if stat is None or time.time() - self.read_at > \
+                    self.period * const.DEVICE_HEALTH_SAMPLER_IDLE_PERIODS:
+                Log.debug('stat', 'health sampler for %s idle, stopping'
+                          % self.hostname)
+                self.stop()
+                return
+            try:
+                sample = stat.get_health_sample()
+                with self.sampled:
+                    self.samples.append(sample)
+                    self.sampled.notify_all()
+            except Exception as exc:
+                Log.error('stat', 'health sample failed: %s' % str(exc))
+            del stat
+            self.stopped.wait(self.period)
+
+
+def _get_mem_score(total_memory, used_memory):
+    """ Percentage of TMM memory free """
+    if total_memory and used_memory:
+        return int(100 * ((total_memory - used_memory) / total_memory))
+    return 0
+
+
+def _get_cpu_score(used_cycles, idle_cycles):
+    """ Cpu score from used and idle cycles """
+    return int(100 - (100 * (float(used_cycles) / float(idle_cycles))))
+
+
+def _get_cps_score(previous, latest):
+    """ Connections per second score between two samples """
+    elapsed = latest['time'] - previous['time']
+    if elapsed <= 0:
+        return 100
+    cps = (latest['tcp_accepted'] - previous['tcp_accepted']) / elapsed
+
+    if cps >= const.DEVICE_HEALTH_SCORE_CPS_MAX:
+        return 0
+    return int(100 - ((100 * float(cps)) /
+                      float(const.DEVICE_HEALTH_SCORE_CPS_MAX)))
@@ -0,0 +1,257 @@
+# Copyright 2014 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5.common.logger import Log
+from f5.common import constants as const
+from f5.common.cache import TTLCache
+from f5.bigip.interfaces import icontrol_rest_folder
+from f5.bigip.interfaces import strip_folder_and_prefix
+from f5.bigip import exceptions
+from f5.bigip.interfaces import log
+
+import json
+import os
+import threading
+import time
+
+
+def _bytes(value):
+    """ Counter reported in bits as legacy byte statistic """
+    return int(value) * 8
+
+
+# REST stat: (iControl statistic, value conversion or None, is counter)
+POOL_STATS = {
+    'activeMemberCnt': ('POOL_ACTIVE_MEMBERS', None, False),
+    'connqAll.ageEdm':
+        ('STATISTIC_CONNQUEUE_AGGR_AGE_EXPONENTIAL_DECAY_MAX', None, False),
+    'connqAll.ageEma':
+        ('STATISTIC_CONNQUEUE_AGGR_AGE_MOVING_AVG', None, False),
+    'connqAll.ageHead':
+        ('STATISTIC_CONNQUEUE_AGGR_AGE_OLDEST_ENTRY', None, False),
+    'connqAll.ageMax': ('STATISTIC_CONNQUEUE_AGGR_AGE_MAX', None, False),
+    'connqAll.depth': ('STATISTIC_CONNQUEUE_AGGR_CONNECTIONS', None, False),
+    'connqAll.serviced': ('STATISTIC_CONNQUEUE_AGGR_SERVICED', None, True),
+    'connq.ageEdm':
+        ('STATISTIC_CONNQUEUE_AGE_EXPONENTIAL_DECAY_MAX', None, False),
+    'connq.ageEma': ('STATISTIC_CONNQUEUE_AGE_MOVING_AVG', None, False),
+    'connq.ageHead': ('STATISTIC_CONNQUEUE_AGE_OLDEST_ENTRY', None, False),
+    'connq.ageMax': ('STATISTIC_CONNQUEUE_AGE_MAX', None, False),
+    'connq.depth': ('STATISTIC_CONNQUEUE_CONNECTIONS', None, False),
+    'connq.serviced': ('STATISTIC_CONNQUEUE_SERVICED', None, True),
+    'curSessions': ('STATISTIC_CURRENT_SESSIONS', None, False),
+    'minActiveMembers': ('POOL_MINIMUM_ACTIVE_MEMBERS', None, False),
+    'monitorRule': ('POOL_MONITOR_RULE', None, False),
+    'tmName': ('POOL_NAME', os.path.basename, False),
+    'serverside.bitsIn': ('STATISTIC_SERVER_SIDE_BYTES_IN', _bytes, True),
+    'serverside.bitsOut': ('STATISTIC_SERVER_SIDE_BYTES_OUT', _bytes, True),
+    'serverside.curConns':
+        ('STATISTIC_SERVER_SIDE_CURRENT_CONNECTIONS', None, False),
+    'serverside.maxConns':
+        ('STATISTIC_SERVER_SIDE_MAXIMUM_CONNECTIONS', None, False),
+    'serverside.pktsIn': ('STATISTIC_SERVER_SIDE_PACKETS_IN', None, True),
+    'serverside.pktsOut': ('STATISTIC_SERVER_SIDE_PACKETS_OUT', None, True),
+    'serverside.totConns':
+        ('STATISTIC_SERVER_SIDE_TOTAL_CONNECTIONS', None, True),
+    'status.availabilityState': ('AVAILABLE_STATE', None, False),
+    'status.enabledState': ('ENABLED_STATE', None, False),
+    'status.statusReason': ('STATUS_REASON', None, False),
+    'totRequests': ('STATISTIC_TOTAL_REQUESTS', None, True)
+}
+
+VIRTUAL_STATS = {
+    'clientside.bitsIn': ('STATISTIC_CLIENT_SIDE_BYTES_IN', _bytes, True),
+    'clientside.bitsOut': ('STATISTIC_CLIENT_SIDE_BYTES_OUT', _bytes, True),
+    'clientside.curConns':
+        ('STATISTIC_CLIENT_SIDE_CURRENT_CONNECTIONS', None, False),
+    'clientside.maxConns':
+        ('STATISTIC_CLIENT_SIDE_MAXIMUM_CONNECTIONS', None, False),
+    'clientside.pktsIn': ('STATISTIC_CLIENT_SIDE_PACKETS_IN', None, True),
+    'clientside.pktsOut': ('STATISTIC_CLIENT_SIDE_PACKETS_OUT', None, True),
+    'clientside.totConns':
+        ('STATISTIC_CLIENT_SIDE_TOTAL_CONNECTIONS', None, True),
+    'csMaxConnDur': ('STATISTIC_MAXIMUM_CONNECTION_DURATION', None, False),
+    'csMeanConnDur': ('STATISTIC_MEAN_CONNECTION_DURATION', None, False),
+    'csMinConnDur': ('STATISTIC_MINIMUM_CONNECTION_DURATION', None, False),
+    'ephemeral.bitsIn': ('STATISTIC_EPHEMERAL_BYTES_IN', _bytes, True),
+    'ephemeral.bitsOut': ('STATISTIC_EPHEMERAL_BYTES_OUT', _bytes, True),
+    'ephemeral.curConns':
+        ('STATISTIC_EPHEMERAL_CURRENT_CONNECTIONS', None, False),
+    'ephemeral.maxConns':
+        ('STATISTIC_EPHEMERAL_MAXIMUM_CONNECTIONS', None, False),
+    'ephemeral.pktsIn': ('STATISTIC_EPHEMERAL_PACKETS_IN', None, True),
+    'ephemeral.pktsOut': ('STATISTIC_EPHEMERAL_PACKETS_OUT', None, True),
+    'ephemeral.totConns':
+        ('STATISTIC_EPHEMERAL_TOTAL_CONNECTIONS', None, True),
+    'fiveMinAvgUsageRatio':
+        ('STATISTIC_VIRTUAL_SERVER_FIVE_MIN_AVG_CPU_USAGE', None, False),
+    'fiveSecAvgUsageRatio':
+        ('STATISTIC_VIRTUAL_SERVER_FIVE_SEC_AVG_CPU_USAGE', None, False),
+    'oneMinAvgUsageRatio':
+        ('STATISTIC_VIRTUAL_SERVER_ONE_MIN_AVG_CPU_USAGE', None, False),
+    'syncookie.accepts':
+        ('STATISTIC_VIRTUAL_SERVER_SYNCOOKIE_SW_ACCEPTS', None, True),
+    'syncookie.hwAccepts':
+        ('STATISTIC_VIRTUAL_SERVER_SYNCOOKIE_HW_ACCEPTS', None, True),
+    'syncookie.hwSyncookies':
+        ('STATISTIC_VIRTUAL_SERVER_SYNCOOKIE_HW_TOTAL', None, True),
+    'syncookie.hwsyncookieInstance':
+        ('STATISTIC_VIRTUAL_SERVER_SYNCOOKIE_HW_INSTANCES', None, False),
+    'syncookie.rejects':
+        ('STATISTIC_VIRTUAL_SERVER_SYNCOOKIE_SW_REJECTS', None, True),
+    'syncookie.swsyncookieInstance':
+        ('STATISTIC_VIRTUAL_SERVER_SYNCOOKIE_SW_INSTANCES', None, False),
+    'syncookie.syncacheCurr':
+        ('STATISTIC_VIRTUAL_SERVER_SYNCOOKIE_CACHE_USAGE', None, False),
+    'syncookie.syncacheOver':
+        ('STATISTIC_VIRTUAL_SERVER_SYNCOOKIE_CACHE_OVERFLOWS', None, True),
+    'syncookie.syncookies':
+        ('STATISTIC_VIRTUAL_SERVER_SYNCOOKIE_SW_TOTAL', None, True),
+    'totRequests': ('STATISTIC_TOTAL_REQUESTS', None, True)
+}
+
+# kind: (stats collection, translation table, query exception)
+COLLECTIONS = {
+    'pool': ('/ltm/pool/stats', POOL_STATS,
+             exceptions.PoolQueryException),
+    'virtual': ('/ltm/virtual/stats', VIRTUAL_STATS,
+                exceptions.VirtualServerQueryException)
+}
+
+RATE_SUFFIX = '_PER_SECOND'
+
+
+def translate_stat(table, name, value):
+    """ Get (iControl statistic, value) or (None, None) """
+    if name not in table:
+        return (None, None)
+    (stat, convert, _) = table[name]
+    if convert:
+        value = convert(value)
+    return (stat, value)
+
+
+def translate_entries(table, entries):
+    """ Translate REST stats entries to iControl statistics """
+    stats = {}
+    for name in entries:
+        if name not in table:
+            continue
+        entry = entries[name]
+        if 'description' in entry:
+            value = entry['description']
+        elif 'value' in entry:
+            value = entry['value']
+        else:
+            continue
+        (stat, value) = translate_stat(table, name, value)
+        stats[stat] = value
+    return stats
+
+
+class Statistics(object):
+    """
+    Bulk pool and virtual server statistics.
+
+    Each kind is read for all partitions with one GET of its stats
+    collection. The translated sample is kept for STATISTICS_SAMPLE_TTL
+    seconds so polling every partition costs one request per kind,
+    and counters are compared with the previous sample to add
+    per second rates, named with the '_PER_SECOND' suffix.
+    """
+    def __init__(self, bigip):
+        self.bigip = bigip
+        self.lock = threading.Lock()
+        self.samples = TTLCache(const.STATISTICS_SAMPLE_TTL)
+        self.previous = {}
+
+    @icontrol_rest_folder
+    @log
+    def get_pool_statistics(self, folder='Common'):
+        """ Get {pool name: statistics} of folder """
+        return self._get_folder_statistics('pool', folder)
+
+    @icontrol_rest_folder
+    @log
+    def get_virtual_statistics(self, folder='Common'):
+        """ Get {virtual server name: statistics} of folder """
+        return self._get_folder_statistics('virtual', folder)
+
+    def invalidate(self):
+        """ Drop the cached samples, the next query reads the device """
+        self.samples.invalidate()
+
+    def _get_folder_statistics(self, kind, folder):
+        """ Get statistics of a kind in folder from the sample """
+        folder = str(folder).replace('/', '')
+        prefix = '/' + folder + '/'
+        statistics = {}
+        sample = self._get_sample(kind)
+        for path in sample:
+            if path.startswith(prefix):
+                statistics[strip_folder_and_prefix(path)] = sample[path]
+        return statistics
+
+    def _get_sample(self, kind):
+        """ Get {full path: statistics} of all objects of a kind """
+        with self.lock:
+            sample = self.samples.get(kind)
+            if sample is None:
+                sample = self._read_sample(kind)
+                self.samples.put(kind, sample)
+            return sample
+
+    def _read_sample(self, kind):
+        """ Read a kind's stats collection and compute rates """
+        (path, table, exception) = COLLECTIONS[kind]
+        request_url = self.bigip.icr_url + path
+        response = self.bigip.icr_session.get(
+            request_url, timeout=const.CONNECTION_TIMEOUT)
+        sampled_at = time.time()
+        sample = {}
+        if response.status_code < 400:
+            return_obj = json.loads(response.text)
+            for entry in return_obj.get('entries', {}).values():
+                entries = entry.get('nestedStats', {}).get('entries', {})
+                if 'tmName' not in entries:
+                    continue
+                sample[entries['tmName']['description']] = \
+                    translate_entries(table, entries)
+        elif response.status_code != 404:
+            Log.error('statistics', response.text)
+            raise exception(response.text)
+        self._add_rates(kind, table, sample, sampled_at)
+        return sample
+
+    def _add_rates(self, kind, table, sample, sampled_at):
+        """ Add per second rates of counters since previous sample """
+        (previous_at, previous) = self.previous.get(kind, (None, {}))
+        self.previous[kind] = (sampled_at, sample)
+        if previous_at is None or sampled_at <= previous_at:
+            return
+        elapsed = sampled_at - previous_at
+        counters = [stat for (stat, _, counter) in table.values() if counter]
+        for path in sample:
+            if path not in previous:
+                continue
+            rates = {}
+            for stat in counters:
+                if stat not in sample[path] or stat not in previous[path]:
+                    continue
+                delta = sample[path][stat] - previous[path][stat]
+                # counters reset when the object is recreated
+                if delta >= 0:
+                    rates[stat + RATE_SUFFIX] = delta / elapsed
+            sample[path].update(rates)
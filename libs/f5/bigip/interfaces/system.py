@@ -51,6 +51,7 @@ class System(object):
         self.version = None
         self.current_folder = None
         self.systeminfo = None
+        self.self_device = None
         self.exempt_folders = ['/', 'Common']
         self.existing_folders = {}
         self.existint_folders_updated = None
@@ -77,6 +78,7 @@ class System(object):
                 request_url, timeout=const.CONNECTION_TIMEOUT)
             if response.status_code < 400:
                 self.existing_folders[folder] = 1
+                self.existint_folders_updated = time.time()
                 return True
             elif response.status_code == 404:
                 return False
@@ -128,6 +130,9 @@ class System(object):
             We need to do a fake query and fake command
             because setting your active folder, by itself, does
             not do anything. """
+        if self.bigip.rest_only:
+            self.current_folder = '/'
+            return
         self.sys_session.set_active_folder('/')
         self.current_folder = '/'
         self.mgmt_folder.get_list()
@@ -183,6 +188,13 @@ class System(object):
             Log.error('System', msg)
             raise exceptions.SystemUpdateException(msg)
 
+        if self.bigip.rest_only:
+            # REST requests carry the partition in the URL
+            if not str(folder).startswith('/'):
+                folder = '/' + folder
+            self.current_folder = folder
+            return
+
         if not self.folder_exists(folder):
             msg = 'set_folder:set_active_folder failed, ' + \
                   'folder does not exist!'
@@ -379,6 +391,8 @@ class System(object):
     @log
     def get_platform(self):
         """ Get platform """
+        if self.bigip.rest_only:
+            return self._get_self_device_attribute('platformId')
         if not self.systeminfo:
             try:
                 self.systeminfo = self.sys_info.get_system_information()
@@ -389,6 +403,8 @@ class System(object):
     @log
     def get_serial_number(self):
         """ Get serial number """
+        if self.bigip.rest_only:
+            return self._get_self_device_attribute('chassisId')
         if not self.systeminfo:
             try:
                 self.systeminfo = self.sys_info.get_system_information()
@@ -400,12 +416,39 @@ class System(object):
     def get_version(self):
         """ Get version """
         if not self.version:
+            if self.bigip.rest_only:
+                version = self.bigip.get_tmos_version()
+                if not version:
+                    raise exceptions.SystemQueryException(
+                        'could not get version')
+                self.version = 'BIG-IP_v' + version.split('_')[0]
+                return self.version
             try:
                 self.version = self.sys_info.get_version()
             except Exception as exc:
                 raise exceptions.SystemQueryException(exc.message)
         return self.version
 
+    def _get_self_device_attribute(self, attribute):
+        """ Get attribute of the local device """
+        if not self.self_device:
+            request_url = self.bigip.icr_url + '/cm/device'
+            request_url += '?$select=selfDevice,platformId,chassisId'
+            response = self.bigip.icr_session.get(
+                request_url, timeout=const.CONNECTION_TIMEOUT)
+            if response.status_code < 400:
+                response_obj = json.loads(response.text)
+                if 'items' in response_obj:
+                    for device in response_obj['items']:
+                        if device['selfDevice'] == 'true':
+                            self.self_device = device
+            else:
+                Log.error('device', response.text)
+                raise exceptions.SystemQueryException(response.text)
+        if self.self_device:
+            return self.self_device.get(attribute)
+        return None
+
     @log
     def get_major_version(self):
         """ Get major version """
@@ -17,10 +17,15 @@ from f5.common import constants as const
 from f5.common.logger import Log
 from f5.bigip.interfaces import domain_address
 from f5.bigip.interfaces import icontrol_rest_folder
+from f5.bigip.interfaces import invalidates
 from f5.bigip.interfaces import strip_folder_and_prefix
 from f5.bigip.interfaces import strip_domain_address
 from f5.bigip import exceptions
+from f5.bigip.catalog import TypeCatalog
 from f5.bigip.interfaces import log
+from f5.bigip.interfaces.statistics import VIRTUAL_STATS
+from f5.bigip.interfaces.statistics import translate_entries
+from f5.bigip.interfaces.statistics import translate_stat
 
 import os
 import json
@@ -36,6 +41,11 @@ class VirtualServer(object):
         self.folder_persistence_profiles = {}
         self.common_profiles = {}
         self.folder_profiles = {}
+        self.profile_catalog = TypeCatalog(
+            bigip, '/ltm/profile', exceptions.VirtualServerQueryException)
+        self.persistence_catalog = TypeCatalog(
+            bigip, '/ltm/persistence',
+            exceptions.VirtualServerQueryException)
 
     @icontrol_rest_folder
     @domain_address
@@ -398,38 +408,14 @@ class VirtualServer(object):
     def get_all_profiles(self, folder='Common'):
         """ Get profiles """
         folder = str(folder).replace('/', '')
-        request_url = self.bigip.icr_url + '/ltm/profile'
-        response = self.bigip.icr_session.get(
-            request_url, timeout=const.CONNECTION_TIMEOUT)
         return_profiles = []
-        if response.status_code < 400:
-            response_obj = json.loads(response.text)
-            if 'items' in response_obj:
-                for p in response_obj['items']:
-                    type_link = self.bigip.icr_link(
-                        p['reference']['link']
-                        ) + '&$select=name,partition&$filter=partition eq ' \
-                          + folder
-                    pr_res = self.bigip.icr_session.get(
-                        type_link, timeout=const.CONNECTION_TIMEOUT)
-                    if pr_res.status_code < 400:
-                        pr_res_obj = json.loads(pr_res.text)
-                        if 'items' in pr_res_obj:
-                            for profile in pr_res_obj['items']:
-                                if profile['partition'] == 'Common':
-                                    self.common_profiles[profile['name']] = 1
-                                else:
-                                    self.folder_profiles[profile['name']] = \
-                                        profile['partition']
-                                return_profiles.append(profile['name'])
-                    else:
-                        Log.error('profile', pr_res.text)
-                        raise exceptions.VirtualServerQueryException(
-                            pr_res.text)
-        elif response.status_code == 404:
-            return []
-        else:
-            raise exceptions.VirtualServerQueryException(response.text)
+        for profile in self.profile_catalog.get_instances(folder):
+            if profile['partition'] == 'Common':
+                self.common_profiles[profile['name']] = 1
+            else:
+                self.folder_profiles[profile['name']] = \
+                    profile['partition']
+            return_profiles.append(profile['name'])
 
         self.folder_profiles[folder] = folder
 
@@ -440,47 +426,11 @@ class VirtualServer(object):
     def delete_all_profiles(self, folder='Common'):
         """ Delete profiles """
         folder = str(folder).replace('/', '')
-        request_url = self.bigip.icr_url + '/ltm/profile'
-        response = self.bigip.icr_session.get(
-            request_url, timeout=const.CONNECTION_TIMEOUT)
-        if response.status_code < 400:
-            response_obj = json.loads(response.text)
-            if 'items' in response_obj:
-                for p in response_obj['items']:
-                    type_link = self.bigip.icr_link(
-                        p['reference']['link']
-                        ) + '&$select=name,selfLink&$filter=partition eq ' + \
-                            folder
-                    pr_res = self.bigip.icr_session.get(
-                        type_link, timeout=const.CONNECTION_TIMEOUT)
-                    if pr_res.status_code < 400:
-                        pr_res_obj = json.loads(pr_res.text)
-                        if 'items' in pr_res_obj:
-                            for profile in pr_res_obj['items']:
-                                if profile['name'].startswith(self.OBJ_PREFIX):
-                                    profile['selfLink'] = \
-                                        profile['selfLink'].spit('?')[0]
-                                    del_resp = self.bigip.icr_session.delete(
-                                        self.bigip.icr_link(
-                                            profile['selfLink']),
-                                        timeout=const.CONNECTION_TIMEOUT)
-                                    if del_resp.status_code > 399 and \
-                                            del_resp.status_code != 404:
-                                        Log.error('profile', del_resp.text)
-                                        exps = exceptions
-                                        exp = exps.VirtualServerDeleteException
-                                        raise exp(del_resp.text)
-                                    else:
-                                        self.folder_profiles = {}
-                                        self.common_profiles = {}
-                    else:
-                        Log.error('profile', pr_res.text)
-                        raise exceptions.VirtualServerQueryException(
-                            pr_res.text)
-        elif response.status_code == 404:
-            True
-        else:
-            raise exceptions.VirtualServerQueryException(response.text)
+        self._delete_catalog_instances(
+            self.profile_catalog, folder,
+            lambda name: name.startswith(self.OBJ_PREFIX))
+        self.folder_profiles = {}
+        self.common_profiles = {}
         return True
 
     @icontrol_rest_folder
@@ -490,47 +440,11 @@ class VirtualServer(object):
         if not match:
             return False
         folder = str(folder).replace('/', '')
-        request_url = self.bigip.icr_url + '/ltm/profile'
-        response = self.bigip.icr_session.get(
-            request_url, timeout=const.CONNECTION_TIMEOUT)
-        if response.status_code < 400:
-            response_obj = json.loads(response.text)
-            if 'items' in response_obj:
-                for p in response_obj['items']:
-                    type_link = self.bigip.icr_link(
-                        p['reference']['link']
-                        ) + '&$select=name,selfLink&$filter=partition eq ' + \
-                            folder
-                    pr_res = self.bigip.icr_session.get(
-                        type_link, timeout=const.CONNECTION_TIMEOUT)
-                    if pr_res.status_code < 400:
-                        pr_res_obj = json.loads(pr_res.text)
-                        if 'items' in pr_res_obj:
-                            for profile in pr_res_obj['items']:
-                                if profile['name'].find(match) > -1:
-                                    profile['selfLink'] = \
-                                        profile['selfLink'].spit('?')[0]
-                                    del_resp = self.bigip.icr_session.delete(
-                                        self.bigip.icr_link(
-                                            profile['selfLink']),
-                                        timeout=const.CONNECTION_TIMEOUT)
-                                    if del_resp.status_code > 399 and \
-                                       del_resp.status_code != 404:
-                                        Log.error('profile', del_resp.text)
-                                        exps = exceptions
-                                        exp = exps.VirtualServerDeleteException
-                                        raise exp(del_resp.text)
-                                    else:
-                                        self.folder_profiles = {}
-                                        self.common_profiles = {}
-                    else:
-                        Log.error('profile', pr_res.text)
-                        raise exceptions.VirtualServerQueryException(
-                            pr_res.text)
-        elif response.status_code == 404:
-            True
-        else:
-            raise exceptions.VirtualServerQueryException(response.text)
+        self._delete_catalog_instances(
+            self.profile_catalog, folder,
+            lambda name: name.find(match) > -1)
+        self.folder_profiles = {}
+        self.common_profiles = {}
         return True
 
     @icontrol_rest_folder
@@ -563,6 +477,8 @@ class VirtualServer(object):
                 timeout=const.CONNECTION_TIMEOUT)
             if response.status_code < 400:
                 self.folder_profiles[name] = folder
+                self.profile_catalog.add(folder, 'http',
+                                         json.loads(response.text))
                 return True
             elif response.status_code == 409:
                 return True
@@ -600,32 +516,12 @@ class VirtualServer(object):
     def delete_all_http_profiles(self, folder='Common'):
         """ Delete all http profiles """
         folder = str(folder).replace('/', '')
-        request_url = self.bigip.icr_url + '/ltm/profile/http'
-        request_url += '?$select=name,selfLink'
-        request_url += '&$filter=partition eq ' + folder
-
-        response = self.bigip.icr_session.get(
-            request_url, timeout=const.CONNECTION_TIMEOUT)
-        if response.status_code < 400:
-            response_obj = json.loads(response.text)
-            if 'items' in response_obj:
-                for profile in response_obj['items']:
-                    if profile['name'].startswith(self.OBJ_PREFIX):
-                        profile['selfLink'] = profile['selfLink'].split('?')[0]
-                        response = self.bigip.icr_session.delete(
-                            self.bigip.icr_link(profile['selfLink']),
-                            timeout=const.CONNECTION_TIMEOUT)
-                        if response.status_code > 399 and \
-                           response.status_code != 404:
-                            Log.error('persistence', response.text)
-                            raise exceptions.VirtualServerDeleteException(
-                                response.text)
-                        else:
-                            self.common_profiles = {}
-                            self.folder_profiles = {}
-        elif response.status_code != 404:
-            Log.error('persistence', response.text)
-            raise exceptions.VirtualServerQueryException(response.text)
+        self._delete_catalog_instances(
+            self.profile_catalog, folder,
+            lambda name: name.startswith(self.OBJ_PREFIX),
+            instance_type='http')
+        self.common_profiles = {}
+        self.folder_profiles = {}
         return True
 
     @icontrol_rest_folder
@@ -646,6 +542,8 @@ class VirtualServer(object):
                 timeout=const.CONNECTION_TIMEOUT)
             if response.status_code < 400:
                 self.folder_persistence_profiles[name] = folder
+                self.persistence_catalog.add(folder, 'cookie',
+                                             json.loads(response.text))
                 return True
             elif response.status_code == 409:
                 return True
@@ -659,40 +557,14 @@ class VirtualServer(object):
     def get_all_persistence_profiles(self, folder='Common'):
         """ Get all persistence profiles """
         folder = str(folder).replace('/', '')
-        request_url = self.bigip.icr_url + '/ltm/persistence'
-        response = self.bigip.icr_session.get(
-            request_url, timeout=const.CONNECTION_TIMEOUT)
         return_profiles = []
-        if response.status_code < 400:
-            response_obj = json.loads(response.text)
-            if 'items' in response_obj:
-                for p in response_obj['items']:
-                    type_link = self.bigip.icr_link(
-                        p['reference']['link']
-                        ) + '&$select=name,partition&$filter=partition eq ' \
-                          + folder
-                    pr_res = self.bigip.icr_session.get(
-                        type_link, timeout=const.CONNECTION_TIMEOUT)
-                    if pr_res.status_code < 400:
-                        pr_res_obj = json.loads(pr_res.text)
-                        if 'items' in pr_res_obj:
-                            for profile in pr_res_obj['items']:
-                                if profile['partition'] == 'Common':
-                                    self.common_persistence_profiles[
-                                        profile['name']] = 1
-                                else:
-                                    self.folder_persistence_profiles[
-                                        profile['name']] = \
-                                        profile['partition']
-                                return_profiles.append(profile['name'])
-                    else:
-                        Log.error('persistence', pr_res.text)
-                        raise exceptions.VirtualServerQueryException(
-                            pr_res.text)
-        elif response.status_code == 404:
-            return []
-        else:
-            raise exceptions.VirtualServerQueryException(response.text)
+        for profile in self.persistence_catalog.get_instances(folder):
+            if profile['partition'] == 'Common':
+                self.common_persistence_profiles[profile['name']] = 1
+            else:
+                self.folder_persistence_profiles[profile['name']] = \
+                    profile['partition']
+            return_profiles.append(profile['name'])
 
         self.folder_persistence_profiles[folder] = folder
 
@@ -702,49 +574,12 @@ class VirtualServer(object):
     @log
     def delete_all_presistence_profiles(self, folder='Common'):
         """ Delete all persistence profiles """
-        timeout = const.CONNECTION_TIMEOUT
         folder = str(folder).replace('/', '')
-        request_url = self.bigip.icr_url + '/ltm/persistence'
-        response = self.bigip.icr_session.get(
-            request_url, timeout=timeout)
-        if response.status_code < 400:
-            response_obj = json.loads(response.text)
-            if 'items' in response_obj:
-                for p in response_obj['items']:
-                    type_link = self.bigip.icr_link(
-                        p['reference']['link']
-                        ) + '&$select=name,selfLink&$filter=partition eq ' + \
-                            folder
-                    pr_res = self.bigip.icr_session.get(
-                        type_link, timeout=timeout)
-                    if pr_res.status_code < 400:
-                        pr_res_obj = json.loads(pr_res.text)
-                        if 'items' in pr_res_obj:
-                            for profile in pr_res_obj['items']:
-                                if profile['name'].startswith(self.OBJ_PREFIX):
-                                    profile['selfLink'] = \
-                                        profile['selfLink'].split('?')[0]
-                                    del_resp = self.bigip.icr_session.delete(
-                                        self.bigip.icr_link(
-                                            profile['selfLink']),
-                                        timeout=timeout)
-                                    if del_resp.status_code > 399 and \
-                                       del_resp.status_code != 404:
-                                        Log.error('persistence', del_resp.text)
-                                        exps = exceptions
-                                        exp = exps.VirtualServerDeleteException
-                                        raise exp(del_resp.text)
-                                    else:
-                                        self.folder_persistence_profiles = {}
-                                        self.common_persistence_profiles = {}
-                    else:
-                        Log.error('persistence', pr_res.text)
-                        raise exceptions.VirtualServerQueryException(
-                            pr_res.text)
-        elif response.status_code == 404:
-            True
-        else:
-            raise exceptions.VirtualServerQueryException(response.text)
+        self._delete_catalog_instances(
+            self.persistence_catalog, folder,
+            lambda name: name.startswith(self.OBJ_PREFIX))
+        self.folder_persistence_profiles = {}
+        self.common_persistence_profiles = {}
         return True
 
     @icontrol_rest_folder
@@ -784,10 +619,11 @@ class VirtualServer(object):
                 del_res = self.bigip.icr_session.delete(
                     del_req, timeout=const.CONNECTION_TIMEOUT)
                 if del_res.status_code < 400:
+                    self.persistence_catalog.remove(folder, name)
                     if name in self.folder_persistence_profiles:
                         del self.folder_persistence_profiles[name]
                     if name in self.common_persistence_profiles:
-                        del self.common_profiles[name]
+                        del self.common_persistence_profiles[name]
                     return True
                 else:
                     Log.error('persistence', del_res.text)
@@ -813,6 +649,8 @@ class VirtualServer(object):
                 timeout=const.CONNECTION_TIMEOUT)
             if response.status_code < 400:
                 self.folder_persistence_profiles[name] = folder
+                self.persistence_catalog.add(folder, 'universal',
+                                             json.loads(response.text))
                 return True
             elif response.status_code == 409:
                 return True
@@ -858,6 +696,7 @@ class VirtualServer(object):
                 del_res = self.bigip.icr_session.delete(
                     del_req, timeout=const.CONNECTION_TIMEOUT)
                 if del_res.status_code < 400:
+                    self.persistence_catalog.remove(folder, name)
                     if name in self.folder_persistence_profiles:
                         del self.folder_persistence_profiles[name]
                     if name in self.common_persistence_profiles:
@@ -882,6 +721,7 @@ class VirtualServer(object):
             response = self.bigip.icr_session.delete(
                 link, timeout=const.CONNECTION_TIMEOUT)
             if response.status_code < 400:
+                self.persistence_catalog.remove(folder, name)
                 if name in self.folder_persistence_profiles:
                     del self.folder_persistence_profiles[name]
                 if name in self.common_persistence_profiles:
@@ -900,47 +740,11 @@ class VirtualServer(object):
         if not match:
             return False
         folder = str(folder).replace('/', '')
-        request_url = self.bigip.icr_url + '/ltm/persistence'
-        response = self.bigip.icr_session.get(
-            request_url, timeout=const.CONNECTION_TIMEOUT)
-        if response.status_code < 400:
-            response_obj = json.loads(response.text)
-            if 'items' in response_obj:
-                for p in response_obj['items']:
-                    type_link = self.bigip.icr_link(
-                        p['reference']['link']
-                        ) + '&$select=name,selfLink&$filter=partition eq ' + \
-                            folder
-                    pr_res = self.bigip.icr_session.get(
-                        type_link, timeout=const.CONNECTION_TIMEOUT)
-                    if pr_res.status_code < 400:
-                        pr_res_obj = json.loads(pr_res.text)
-                        if 'items' in pr_res_obj:
-                            for profile in pr_res_obj['items']:
-                                if profile['name'].find(match) > -1:
-                                    profile['selfLink'] = \
-                                        profile['selfLink'].split('?')[0]
-                                    del_resp = self.bigip.icr_session.delete(
-                                        self.bigip.icr_link(
-                                            profile['selfLink']),
-                                        timeout=const.CONNECTION_TIMEOUT)
-                                    if del_resp.status_code > 399 and \
-                                            del_resp.status_code != 404:
-                                        Log.error('persistence', del_resp.text)
-                                        exps = exceptions
-                                        exp = exps.VirtualServerDeleteException
-                                        raise exp(del_resp.text)
-                                    else:
-                                        self.folder_persistence_profiles = {}
-                                        self.common_persistence_profiles = {}
-                    else:
-                        Log.error('persistence', pr_res.text)
-                        raise exceptions.VirtualServerQueryException(
-                            pr_res.text)
-        elif response.status_code == 404:
-            True
-        else:
-            raise exceptions.VirtualServerQueryException(response.text)
+        self._delete_catalog_instances(
+            self.persistence_catalog, folder,
+            lambda name: name.find(match) > -1)
+        self.folder_persistence_profiles = {}
+        self.common_persistence_profiles = {}
         return True
 
     @icontrol_rest_folder
@@ -948,54 +752,21 @@ class VirtualServer(object):
     def get_profile_link(self, name=None, folder='Common'):
         """ Get profile link """
         folder = str(folder).replace('/', '')
-        request_url = self.bigip.icr_url + '/ltm/profile/'
-        response = self.bigip.icr_session.get(
-            request_url, timeout=const.CONNECTION_TIMEOUT)
-        if response.status_code < 400:
-            response_obj = json.loads(response.text)
-            for refs in response_obj['items']:
-                link = self.bigip.icr_link(refs['reference']['link'])
-                link += '&$select=name,fullPath,selfLink'
-                profile_resp = self.bigip.icr_session.get(
-                    link, timeout=const.CONNECTION_TIMEOUT)
-                if profile_resp.status_code < 400:
-                    profile_obj = json.loads(profile_resp.text)
-                    if 'items' in profile_obj:
-                        for profile in profile_obj['items']:
-                            if profile['name'] == name:
-                                return self.bigip.icr_link(
-                                    profile['selfLink'])
-        elif response.status_code == 404:
-            return None
-        else:
-            raise exceptions.VirtualServerQueryException(response.text)
+        profile = self.profile_catalog.find(name, folder)
+        if profile:
+            return self.bigip.icr_link(profile['selfLink'])
+        return None
 
     @icontrol_rest_folder
     @log
-    def get_persistence_link(self, name=None):
+    def get_persistence_link(self, name=None, folder='Common'):
         """ Get persistence link """
         if name:
-            request_url = self.bigip.icr_url + '/ltm/persistence/'
-            response = self.bigip.icr_session.get(
-                request_url, timeout=const.CONNECTION_TIMEOUT)
-            if response.status_code < 400:
-                response_obj = json.loads(response.text)
-                for refs in response_obj['items']:
-                    link = self.bigip.icr_link(refs['reference']['link'])
-                    link += '&$select=name,partition,fullPath,selfLink'
-                    profile_resp = self.bigip.icr_session.get(
-                        link, timeout=const.CONNECTION_TIMEOUT)
-                    if profile_resp.status_code < 400:
-                        profile_obj = json.loads(profile_resp.text)
-                        if 'items' in profile_obj:
-                            for profile in profile_obj['items']:
-                                if profile['name'] == name:
-                                    return self.bigip.icr_link(
-                                        profile['selfLink'])
-        elif response.status_code == 404:
-            return None
-        else:
-            raise exceptions.VirtualServerQueryException(response.text)
+            folder = str(folder).replace('/', '')
+            profile = self.persistence_catalog.find(name, folder)
+            if profile:
+                return self.bigip.icr_link(profile['selfLink'])
+        return None
 
     @icontrol_rest_folder
     @log
@@ -1250,6 +1021,7 @@ class VirtualServer(object):
                 raise exceptions.VirtualServerUpdateException(response.text)
         return False
 
+    @invalidates('virtual_pool')
     @icontrol_rest_folder
     @log
     def delete(self, name=None, folder='Common'):
@@ -1298,25 +1070,13 @@ class VirtualServer(object):
                                          folder='Common'):
         """ Get vips by pool name """
         folder = str(folder).replace('/', '')
-        request_url = self.bigip.icr_url + '/ltm/virtual'
-        request_url += '?$select=name,pool'
-        request_url += '&$filter=partition eq ' + folder
-
-        response = self.bigip.icr_session.get(
-            request_url, timeout=const.CONNECTION_TIMEOUT)
         vs_names = []
-        if response.status_code < 400:
-            return_obj = json.loads(response.text)
-            if 'items' in return_obj:
-                for vs in return_obj['items']:
-                    if 'pool' in vs and \
-                            os.path.basename(vs['pool']) == pool_name:
-                        vs_names.append(strip_folder_and_prefix(vs['name']))
-        elif response.status_code != 404:
-            Log.error('virtual', response.text)
-            raise exceptions.VirtualServerQueryException(response.text)
+        for vs_name in self.bigip.references.get_referrers(
+                'virtual_pool', pool_name, folder=folder):
+            vs_names.append(strip_folder_and_prefix(vs_name))
         return vs_names
 
+    @invalidates('virtual_pool')
     @icontrol_rest_folder
     @log
     def delete_all(self, folder='Common'):
@@ -1372,6 +1132,7 @@ class VirtualServer(object):
                 raise exceptions.VirtualServerQueryException(response.text)
         return None
 
+    @invalidates('virtual_pool')
     @icontrol_rest_folder
     @log
     def set_pool(self, name=None, pool_name=None, folder='Common'):
@@ -1797,16 +1558,8 @@ class VirtualServer(object):
             return_stats = {}
             if response.status_code < 400:
                 return_obj = json.loads(response.text)
-                if 'entries' in return_obj:
-                    for stat in return_obj['entries']:
-                        name = stat
-                        if 'value' in return_obj['entries'][name]:
-                            value = return_obj['entries'][name]['value']
-                        if 'description' in return_obj['entries'][name]:
-                            value = return_obj['entries'][name]['description']
-                        (st, val) = self._get_icontrol_stat(name, value)
-                        if st:
-                            return_stats[st] = val
+                return_stats = translate_entries(
+                    VIRTUAL_STATS, return_obj.get('entries', {}))
             elif response.status_code != 404:
                 Log.error('pool', response.text)
                 raise exceptions.VirtualServerQueryException(response.text)
@@ -1834,69 +1587,7 @@ class VirtualServer(object):
 
     def _get_icontrol_stat(self, name, value):
         """ Get vip stats """
-        if name == "clientside.bitsIn":
-            return ('STATISTIC_CLIENT_SIDE_BYTES_IN', (value * 8))
-        elif name == "clientside.bitsOut":
-            return ('STATISTIC_CLIENT_SIDE_BYTES_OUT', (value * 8))
-        elif name == "clientside.curConns":
-            return ('STATISTIC_CLIENT_SIDE_CURRENT_CONNECTIONS', value)
-        elif name == "clientside.maxConns":
-            return ('STATISTIC_CLIENT_SIDE_MAXIMUM_CONNECTIONS', value)
-        elif name == "clientside.pktsIn":
-            return ('STATISTIC_CLIENT_SIDE_PACKETS_IN', value)
-        elif name == "clientside.pktsOut":
-            return ('STATISTIC_CLIENT_SIDE_PACKETS_OUT', value)
-        elif name == "clientside.totConns":
-            return ('STATISTIC_CLIENT_SIDE_TOTAL_CONNECTIONS', value)
-        elif name == "csMaxConnDur":
-            return ('STATISTIC_MAXIMUM_CONNECTION_DURATION', value)
-        elif name == "csMeanConnDur":
-            return ('STATISTIC_MEAN_CONNECTION_DURATION', value)
-        elif name == "csMinConnDur":
-            return ('STATISTIC_MINIMUM_CONNECTION_DURATION', value)
-        elif name == "ephemeral.bitsIn":
-            return ('STATISTIC_EPHEMERAL_BYTES_IN', (value * 8))
-        elif name == "ephemeral.bitsOut":
-            return ('STATISTIC_EPHEMERAL_BYTES_OUT', (value * 8))
-        elif name == "ephemeral.curConns":
-            return ('STATISTIC_EPHEMERAL_CURRENT_CONNECTIONS', value)
-        elif name == "ephemeral.maxConns":
-            return ('STATISTIC_EPHEMERAL_MAXIMUM_CONNECTIONS', value)
-        elif name == "ephemeral.pktsIn":
-            return ('STATISTIC_EPHEMERAL_PACKETS_IN', value)
-        elif name == "ephemeral.pktsOut":
-            return ('STATISTIC_EPHEMERAL_PACKETS_OUT', value)
-        elif name == "ephemeral.totConns":
-            return ('STATISTIC_EPHEMERAL_TOTAL_CONNECTIONS', value)
-        elif name == "fiveMinAvgUsageRatio":
-            return ('STATISTIC_VIRTUAL_SERVER_FIVE_MIN_AVG_CPU_USAGE', value)
-        elif name == "fiveSecAvgUsageRatio":
-            return ('STATISTIC_VIRTUAL_SERVER_FIVE_SEC_AVG_CPU_USAGE', value)
-        elif name == "oneMinAvgUsageRatio":
-            return ('STATISTIC_VIRTUAL_SERVER_ONE_MIN_AVG_CPU_USAGE', value)
-        elif name == "syncookie.accepts":
-            return ('STATISTIC_VIRTUAL_SERVER_SYNCOOKIE_SW_ACCEPTS', value)
-        elif name == "syncookie.hwAccepts":
-            return ('STATISTIC_VIRTUAL_SERVER_SYNCOOKIE_HW_ACCEPTS', value)
-        elif name == "syncookie.hwSyncookies":
-            return ('STATISTIC_VIRTUAL_SERVER_SYNCOOKIE_HW_TOTAL', value)
-        elif name == "syncookie.hwsyncookieInstance":
-            return ('STATISTIC_VIRTUAL_SERVER_SYNCOOKIE_HW_INSTANCES', value)
-        elif name == "syncookie.rejects":
-            return ('STATISTIC_VIRTUAL_SERVER_SYNCOOKIE_SW_REJECTS', value)
-        elif name == "syncookie.swsyncookieInstance":
-            return ('STATISTIC_VIRTUAL_SERVER_SYNCOOKIE_SW_INSTANCES', value)
-        elif name == "syncookie.syncacheCurr":
-            return ('STATISTIC_VIRTUAL_SERVER_SYNCOOKIE_CACHE_USAGE', value)
-        elif name == "syncookie.syncacheOver":
-            return ('STATISTIC_VIRTUAL_SERVER_SYNCOOKIE_CACHE_OVERFLOWS',
-                    value)
-        elif name == "syncookie.syncookies":
-            return ('STATISTIC_VIRTUAL_SERVER_SYNCOOKIE_SW_TOTAL', value)
-        elif name == "totRequests":
-            return ('STATISTIC_TOTAL_REQUESTS', value)
-        else:
-            return (None, None)
+        return translate_stat(VIRTUAL_STATS, name, value)
 
     @icontrol_rest_folder
     @log
@@ -2036,6 +1727,7 @@ class VirtualServer(object):
         Log.debug('profile',
                   'refreshing profile cache for %s on cache miss'
                   % folder)
+        self.profile_catalog.invalidate(folder)
         self.get_all_profiles(folder=folder)
         if profile_name in self.folder_profiles:
             return profile_name
@@ -2068,7 +1760,25 @@ class VirtualServer(object):
         Log.debug('presistence',
                   'refreshing persisetence profile cache for %s on cache miss'
                   % folder)
+        self.persistence_catalog.invalidate(folder)
         self.get_all_persistence_profiles(folder=folder)
         if profile_name in self.folder_persistence_profiles:
             return profile_name
         return None
+
+    def _delete_catalog_instances(self, catalog, folder, matches,
+                                  instance_type=None):
+        """ Delete cataloged instances in folder with matching names """
+        for instance in catalog.get_instances(folder):
+            if instance_type and instance['type'] != instance_type:
+                continue
+            if not matches(instance['name']):
+                continue
+            del_resp = self.bigip.icr_session.delete(
+                self.bigip.icr_link(instance['selfLink'].split('?')[0]),
+                timeout=const.CONNECTION_TIMEOUT)
+            if del_resp.status_code > 399 and del_resp.status_code != 404:
+                Log.error('profile', del_resp.text)
+                catalog.invalidate(folder)
+                raise exceptions.VirtualServerDeleteException(del_resp.text)
+            catalog.remove(folder, instance['name'])
@@ -328,26 +328,10 @@ class Vlan(object):
     def _in_use(self, name=None, folder=None):
         """ Does selfip use vlan? """
         if name:
-            folder = str(folder).replace('/', '')
-            request_url = self.bigip.icr_url + '/net/self?$select=vlan'
             if folder:
-                request_filter = 'partition eq ' + folder
-                request_url += '&$filter=' + request_filter
-            else:
-                folder = 'Common'
-            response = self.bigip.icr_session.get(
-                request_url, timeout=const.CONNECTION_TIMEOUT)
-            if response.status_code < 400:
-                return_obj = json.loads(response.text)
-                if 'items' in return_obj:
-                    for selfip in return_obj['items']:
-                        vlan_name = os.path.basename(selfip['vlan'])
-                        if vlan_name == name:
-                            return True
-                        if vlan_name == \
-                           strip_folder_and_prefix(name):
-                            return True
-            elif response.status_code != 404:
-                Log.error('VLAN', response.text)
-                raise exceptions.VLANQueryException(response.text)
+                folder = str(folder).replace('/', '')
+            for vlan_name in [name, strip_folder_and_prefix(name)]:
+                if self.bigip.references.get_referrers(
+                        'selfip_vlan', vlan_name, folder=folder):
+                    return True
         return False
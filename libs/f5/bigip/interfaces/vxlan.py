@@ -22,6 +22,7 @@ from f5.bigip.interfaces import strip_folder_and_prefix
 from f5.bigip.interfaces import strip_domain_address
 from f5.bigip.interfaces import prefixed
 from f5.bigip import exceptions
+from f5.bigip.fdb import FdbSync
 from f5.bigip.interfaces import log
 
 import json
@@ -36,6 +37,9 @@ class VXLAN(object):
 
     def __init__(self, bigip):
         self.bigip = bigip
+        self.fdb = FdbSync(bigip, 'VXLAN',
+                           exceptions.VXLANQueryException,
+                           exceptions.VXLANUpdateException)
 
     @icontrol_rest_folder
     @log
@@ -144,6 +148,7 @@ class VXLAN(object):
                 timeout=const.CONNECTION_TIMEOUT)
             response = self.bigip.icr_session.delete(
                 tunnel_link, timeout=const.CONNECTION_TIMEOUT)
+            self.fdb.invalidate(name, folder)
             if response.status_code > 399:
                 Log.error('fdb', response.text)
                 raise exceptions.VXLANDeleteException(response.text)
@@ -234,100 +239,56 @@ class VXLAN(object):
                       folder=None):
         """ Add vxlan fdb entry """
         folder = str(folder).replace('/', '')
-        request_url = self.bigip.icr_url + '/net/fdb/tunnel/'
-        request_url += '~' + folder + '~' + tunnel_name
-        records = self.get_fdb_entry(tunnel_name=tunnel_name,
-                                     mac=None,
-                                     folder=folder)
-        fdb_entry = dict()
-        fdb_entry['name'] = mac_address
-        fdb_entry['endpoint'] = vtep_ip_address
-
-        for i in range(len(records)):
-            if records[i]['name'] == mac_address:
-                records[i] = fdb_entry
-                break
-        else:
-            records.append(fdb_entry)
-
-        payload = dict()
-        payload['records'] = records
-        response = self.bigip.icr_session.put(
-            request_url, data=json.dumps(payload),
-            timeout=const.CONNECTION_TIMEOUT)
-        if response.status_code < 400:
-            if const.FDB_POPULATE_STATIC_ARP:
-                if arp_ip_address:
-                    try:
-                        if self.bigip.arp.create(ip_address=arp_ip_address,
-                                                 mac_address=mac_address,
-                                                 folder=folder):
-                            return True
-                        else:
-                            return False
-                    except Exception as exc:
-                        Log.error('VXLAN',
-                                  'could not create static arp: %s on %s'
-                                  % (exc.message, self.bigip.device_name))
+        if self.fdb.apply(tunnel_name, folder,
+                          add={mac_address: vtep_ip_address}) is None:
+            Log.error('VXLAN', 'tried to add fdb entry to non-existant '
+                      'tunnel %s' % ('/' + folder + '/' + tunnel_name))
+            raise exceptions.VXLANUpdateException(
+                'tunnel %s not found' % ('/' + folder + '/' + tunnel_name))
+        if const.FDB_POPULATE_STATIC_ARP:
+            if arp_ip_address:
+                try:
+                    if self.bigip.arp.create(ip_address=arp_ip_address,
+                                             mac_address=mac_address,
+                                             folder=folder):
+                        return True
+                    else:
                         return False
-            return True
-        else:
-            Log.error('VXLAN', response.text)
-            raise exceptions.VXLANUpdateException(response.text)
-        return False
+                except Exception as exc:
+                    Log.error('VXLAN',
+                              'could not create static arp: %s on %s'
+                              % (exc.message, self.bigip.device_name))
+                    return False
+        return True
 
     @icontrol_rest_folder
     @log
     def add_fdb_entries(self, fdb_entries=None):
         """ Add vxlan fdb entries """
+        if not fdb_entries:
+            return False
         for tunnel_name in fdb_entries:
             folder = prefixed(fdb_entries[tunnel_name]['folder'])
-            request_url = self.bigip.icr_url + '/net/fdb/tunnel/'
-            request_url += '~' + folder + '~' + self.OBJ_PREFIX + tunnel_name
-            existing_records = self.get_fdb_entry(tunnel_name=tunnel_name,
-                                                  mac=None,
-                                                  folder=folder)
-            new_records = []
-            new_mac_addresses = []
-            new_arp_addresses = {}
-
             tunnel_records = fdb_entries[tunnel_name]['records']
-            for mac in tunnel_records:
-                fdb_entry = dict()
-                fdb_entry['name'] = mac
-                fdb_entry['endpoint'] = tunnel_records[mac]['endpoint']
-                new_records.append(fdb_entry)
-                new_mac_addresses.append(mac)
-                new_arp_addresses[mac] = tunnel_records[mac]['ip_address']
-
-            for record in existing_records:
-                if not record['name'] in new_mac_addresses:
-                    new_records.append(record)
-                else:
-                    # This fdb entry exists and is not being updated.
-                    # So, do not update the ARP record either.
-                    if record['name'] in new_arp_addresses:
-                        del new_arp_addresses[record['name']]
-
-            payload = dict()
-            payload['records'] = new_records
-            response = self.bigip.icr_session.put(
-                request_url, data=json.dumps(payload),
-                timeout=const.CONNECTION_TIMEOUT)
-            if response.status_code < 400:
-                if const.FDB_POPULATE_STATIC_ARP:
-                    for mac in new_arp_addresses:
-                        try:
-                            self.bigip.arp.create(
-                                ip_address=new_arp_addresses[mac],
-                                mac_address=mac,
-                                folder=folder)
-                        except Exception as exc:
-                            Log.error('VXLAN',
-                                      'could not create static arp: %s'
-                                      % exc.message)
-            return True
-        return False
+            records = dict((mac, tunnel_records[mac]['endpoint'])
+                           for mac in tunnel_records)
+            delta = self.fdb.apply(self.OBJ_PREFIX + tunnel_name, folder,
+                                   add=records)
+            if delta is None:
+                continue
+            # only new fdb entries get an ARP record
+            (added, _, _) = delta
+            if const.FDB_POPULATE_STATIC_ARP and added:
+                macs = sorted(added)
+                failed = self.bigip.arp.create_many(
+                    ip_addresses=[tunnel_records[mac]['ip_address']
+                                  for mac in macs],
+                    mac_addresses=macs,
+                    folder=folder)
+                for ip_address in failed:
+                    Log.error('VXLAN', 'could not create static arp %s: %s'
+                              % (ip_address, failed[ip_address]))
+        return True
 
     @icontrol_rest_folder
     @log
@@ -342,33 +303,11 @@ class VXLAN(object):
             if arp_ip_address:
                 self.bigip.arp.delete(ip_address=arp_ip_address,
                                       folder=folder)
-        request_url = self.bigip.icr_url + '/net/fdb/tunnel/'
-        request_url += '~' + folder + '~' + tunnel_name
-        records = self.get_fdb_entry(tunnel_name=tunnel_name,
-                                     mac=None,
-                                     folder=folder)
-        if not records:
-            return False
-        original_len = len(records)
-        records = [record for record in records
-                   if record.get('name') != mac_address]
-        if original_len != len(records):
-            if len(records) == 0:
-                records = None
-            payload = dict()
-            payload['records'] = records
-            response = self.bigip.icr_session.put(
-                request_url, data=json.dumps(payload),
-                timeout=const.CONNECTION_TIMEOUT)
-            if response.status_code < 400:
-                return True
-            elif response.status_code == 404:
-                return True
-            else:
-                Log.error('VXLAN', response.text)
-                raise exceptions.VXLANUpdateException(response.text)
+        delta = self.fdb.apply(tunnel_name, folder, remove=[mac_address])
+        if delta is None:
             return False
-        return False
+        (_, _, removed) = delta
+        return len(removed) > 0
 
     @icontrol_rest_folder
     @log
@@ -376,55 +315,33 @@ class VXLAN(object):
                            tunnel_name=None,
                            fdb_entries=None):
         """ Delete vxlan fdb entries """
+        if not fdb_entries:
+            return False
         for tunnel_name in fdb_entries:
             folder = prefixed(fdb_entries[tunnel_name]['folder'])
-            request_url = self.bigip.icr_url + '/net/fdb/tunnel/'
-            request_url += '~' + folder + '~' + tunnel_name
-            existing_records = self.get_fdb_entry(tunnel_name=tunnel_name,
-                                                  mac=None,
-                                                  folder=folder)
-            arps_to_delete = {}
-            new_records = []
-
-            for record in existing_records:
-                for mac in fdb_entries[tunnel_name]['records']:
-                    if record['name'] == mac:
-                        arps_to_delete[mac] = mac['ip_address']
-                        break
-                else:
-                    new_records.append(record)
-
-            if len(new_records) == 0:
-                new_records = None
-            payload = dict()
-            payload['records'] = new_records
-            response = self.bigip.icr_session.put(
-                request_url, data=json.dumps(payload),
-                timeout=const.CONNECTION_TIMEOUT)
-            if response.status_code < 400:
-                if const.FDB_POPULATE_STATIC_ARP:
-                    for mac in arps_to_delete:
-                        self.bigip.arp.delete(ip_address=arps_to_delete[mac],
-                                              folder='Common')
-            return True
-        return False
+            tunnel_records = fdb_entries[tunnel_name]['records']
+            delta = self.fdb.apply(self.OBJ_PREFIX + tunnel_name, folder,
+                                   remove=list(tunnel_records))
+            if delta is None:
+                continue
+            (_, _, removed) = delta
+            if const.FDB_POPULATE_STATIC_ARP and removed:
+                failed = self.bigip.arp.delete_many(
+                    ip_addresses=[tunnel_records[mac]['ip_address']
+                                  for mac in removed],
+                    folder=folder)
+                for ip_address in failed:
+                    Log.error('VXLAN', 'could not delete static arp %s: %s'
+                              % (ip_address, failed[ip_address]))
+        return True
 
     @icontrol_rest_folder
     @log
     def delete_all_fdb_entries(self, tunnel_name=None, folder='Common'):
         """ Delete fdb entries """
         folder = str(folder).replace('/', '')
-        request_url = self.bigip.icr_url + '/net/fdb/tunnel/'
-        request_url += '~' + folder + '~' + tunnel_name
-        response = self.bigip.icr_session.put(
-            request_url, data=json.dumps({'records': None}),
-            timeout=const.CONNECTION_TIMEOUT)
-        if response.status_code < 400:
-            return True
-        else:
-            Log.error('VXLAN', response.text)
-            raise exceptions.VXLANUpdateException(response.text)
-        return False
+        self.fdb.replace(tunnel_name, folder, {})
+        return True
 
     @icontrol_rest_folder
     @log
@@ -16,12 +16,16 @@
 #
 
 import logging
+import os
+import stat
+import threading
 
 from urllib import pathname2url
 import platform
 import StringIO
 
 from suds.cache import Cache
+from suds.cache import ObjectCache
 from suds.client import Client
 from suds.client import ServiceSelector
 from suds.client import Factory
@@ -50,7 +54,8 @@ class BIGIP(object):
     def __init__(self, hostname=None, username=None,
                  password=None, wsdls=None, directory=None,
                  fromurl=False, debug=False, proto='https',
-                 sessions=False, cache=True, **kwargs):
+                 sessions=False, cache=True, definitions_cache_dir=None,
+                 version=None, lazy=True, **kwargs):
 
         self.hostname = hostname
         self.username = username
@@ -62,6 +67,8 @@ class BIGIP(object):
         self.debug = debug
         self.kw = kwargs
         self.sessionid = None
+        self.lazy = lazy
+        self.timeout = None
 
         # Setup the in-memory object cache
         if cache:
@@ -69,6 +76,21 @@ class BIGIP(object):
         else:
             self.cache = None
 
+        # Setup the on-disk cache of parsed WSDL definitions. Entries
+        # are keyed by TMOS version, which may be given as a callable
+        # so it is only resolved when the first WSDL is loaded.
+        self.definitions_cache = None
+        if cache and definitions_cache_dir:
+            definitions_cache_dir = os.path.expanduser(definitions_cache_dir)
+            if make_private_dir(definitions_cache_dir):
+                self.definitions_cache = DefinitionsCache(
+                    definitions_cache_dir)
+            else:
+                logging.getLogger(__name__).warning(
+                    'WSDL definitions cache %s is not private to this '
+                    'user, not using it' % definitions_cache_dir)
+        self._version = version
+
         if self.debug:
             self._set_trace_logging()
 
@@ -86,33 +108,27 @@ class BIGIP(object):
         else:
             self.wsdls = wsdls
 
-        self.clients = self._get_clients()
-
-        for client in self.clients:
-            self._build_suds_interface(client)
+        self.clients = []
+        for wsdl in self.wsdls:
+            self._add_interface(wsdl)
 
     #---------------------
     # Methods to modify active pyControl objects
     #---------------------
     def set_timeout(self, timeout):
         if 0 < timeout <= 300:
+            self.timeout = timeout
             for client in self.clients:
                 client.set_options(timeout=timeout)
 
     def add_interface(self, wsdl):
         if not wsdl in self.wsdls:
             self.wsdls.append(wsdl)
-            client = self._get_client(wsdl)
-            self._build_suds_interface(client)
-            self.clients.append(client)
+            self._add_interface(wsdl)
 
     def add_interfaces(self, wsdls):
         for wsdl in wsdls:
-            if not wsdl in self.wsdls:
-                self.wsdls.append(wsdl)
-                client = self._get_client(wsdl)
-                self._build_suds_interface(client)
-                self.clients.append(client)
+            self.add_interface(wsdl)
 
     #---------------------
     # Setters and getters.
@@ -157,9 +173,52 @@ class BIGIP(object):
 
             self.set_sessionid(self.sessionid.__str__(), client)
 
+    def _add_interface(self, wsdl):
+        """
+        Register an interface. When lazy, only a placeholder interface
+        is created and the WSDL is fetched and the suds client built
+        the first time one of its attributes is used.
+        """
+        if not self.lazy:
+            self._load_interface(wsdl)
+            return
+        (module_name, interface_name) = \
+            wsdl.replace('.wsdl', '').split('.')[:2]
+        if not hasattr(self, module_name):
+            setattr(self, module_name, ModuleInstance(module_name))
+        module = getattr(self, module_name)
+        if not isinstance(getattr(module, interface_name, None),
+                          InterfaceInstance):
+            setattr(module, interface_name, InterfaceInstance(
+                interface_name, loader=lambda: self._load_interface(wsdl)))
+
+    def _load_interface(self, wsdl):
+        """ Fetch the WSDL and build the suds interface """
+        client = self._get_client(wsdl)
+        if self.timeout:
+            client.set_options(timeout=self.timeout)
+        self.clients.append(client)
+        self._build_suds_interface(client)
+
     def _get_client(self, wsdl):
         url = self._set_url(wsdl)
-        return self._get_suds_client(url, **self.kw)
+        definitions_key = None
+        if self.definitions_cache:
+            version = self._get_version()
+            if version:
+                definitions_key = '%s_%s' % (version, wsdl)
+        return self._get_suds_client(url, definitions_key, **self.kw)
+
+    def _get_version(self):
+        """ Resolve TMOS version used to key cached definitions """
+        if callable(self._version):
+            try:
+                self._version = self._version()
+            except Exception as e:
+                logging.getLogger(__name__).debug(
+                    'could not get version for WSDL cache: %s' % e)
+                self._version = None
+        return self._version
 
     def _get_clients(self):
         """ Get a suds client for the wsdls passed in."""
@@ -201,7 +260,7 @@ class BIGIP(object):
         methods = [method[0] for method in c.sd[0].ports[0][1]]
         return methods
 
-    def _get_suds_client(self, url, **kw):
+    def _get_suds_client(self, url, definitions_key=None, **kw):
         """
         Make a suds client for a specifij WSDL (via url).
         Added new Suds cache features. Warning: These don't work on
@@ -213,10 +272,14 @@ class BIGIP(object):
             t = transport.http.HttpAuthenticated(username=self.username,
                                                   password=self.password)
             c = ROClient(url, transport=t, username=self.username,
-                         password=self.password, doctor=DOCTOR, **kw)
+                         password=self.password, doctor=DOCTOR,
+                         definitions_cache=self.definitions_cache,
+                         definitions_key=definitions_key, **kw)
         else:
             c = ROClient(url, username=self.username,
-                         password=self.password, doctor=DOCTOR, **kw)
+                         password=self.password, doctor=DOCTOR,
+                         definitions_cache=self.definitions_cache,
+                         definitions_key=definitions_key, **kw)
         return c
 
     def _set_url(self, wsdl):
@@ -265,6 +328,9 @@ class BIGIP(object):
         """ Sets appropriate attributes for a Module. """
         module = self._get_module_object(c)
         interface = self._get_interface_name(c)
+        # keep lazy placeholders so references to them stay valid
+        if isinstance(getattr(module, interface, None), InterfaceInstance):
+            return
         setattr(module, interface, InterfaceInstance(interface))
 
     def _set_interface_methods(self, c):
@@ -324,16 +390,48 @@ class ModuleInstance(object):
 
 
 class InterfaceInstance(object):
-    """ An iControl interface object to set attributes against. """
-    def __init__(self, name):
+    """
+    An iControl interface object to set attributes against.
+
+    If a loader is given, the first lookup of an attribute which is
+    not set yet (a method, typefactory or suds) calls the loader to
+    build the interface and then retries the lookup. Other threads
+    looking up attributes during the load wait for it to finish.
+    """
+    def __init__(self, name, loader=None):
         self.name = name
+        self._loader = loader
+        self._lock = threading.RLock()
+        self._loading = False
+
+    def __getattr__(self, attr):
+        if attr.startswith('__') or not self.__dict__.get('_loader'):
+            raise AttributeError(attr)
+        with self._lock:
+            loader = self._loader
+            if loader and self._loading:
+                # looked up by the loader itself
+                raise AttributeError(attr)
+            if loader:
+                self._loading = True
+                try:
+                    loader()
+                    self._loader = None
+                finally:
+                    self._loading = False
+        return getattr(self, attr)
 
 
 class ROClient(Client):
-    def __init__(self, url, **kwargs):
+    def __init__(self, url, definitions_cache=None, definitions_key=None,
+                 **kwargs):
         """
         @param url: The URL for the WSDL.
         @type url: str
+        @param definitions_cache: Persistent cache of parsed WSDLs.
+        @type definitions_cache: L{DefinitionsCache}
+        @param definitions_key: Cache key, independent of the device.
+        @type definitions_key: str
         @param kwargs: keyword arguments.
         @see: L{Options}
         """
@@ -342,8 +440,19 @@ class ROClient(Client):
         self.options = options
         options.cache = InMemoryCache()
         self.set_options(**kwargs)
-        reader = DefinitionsReader(options, Definitions)
-        self.wsdl = reader.open(url)
+        self.wsdl = None
+        if definitions_cache and definitions_key:
+            self.wsdl = definitions_cache.get(definitions_key)
+        if self.wsdl is None:
+            reader = DefinitionsReader(options, Definitions)
+            self.wsdl = reader.open(url)
+            if definitions_cache and definitions_key:
+                definitions_cache.put(definitions_key, self.wsdl)
+        else:
+            # options are not pickled with the definitions
+            self.wsdl.options = options
+            for imp in self.wsdl.imports:
+                imp.imported.options = options
         plugins = PluginContainer(options.plugins)
         plugins.init.initialized(wsdl=self.wsdl)
         self.factory = Factory(self.wsdl)
@@ -355,6 +464,46 @@ class ROClient(Client):
         self.messages = dict(tx=None, rx=None)
 
 
+class DefinitionsCache(ObjectCache):
+    """
+    On-disk cache of pickled WSDL definitions.
+
+    Keys are TMOS version plus WSDL name, so the definitions parsed for
+    one device are reused by every device running the same version.
+    Loading a pickle runs code, so the location must be a directory
+    made by make_private_dir and files other users could have written
+    are not loaded.
+    """
+    fnprefix = 'f5wsdl'
+
+    def __init__(self, location, days=30):
+        ObjectCache.__init__(self, location=location, days=days)
+
+    def open(self, fn, *args):
+        if (not args or 'r' in args[0]) and os.path.lexists(fn) and \
+                not is_private(fn, stat.S_ISREG):
+            raise IOError('%s is not private to this user' % fn)
+        return ObjectCache.open(self, fn, *args)
+
+
+def make_private_dir(path):
+    """ Create path with mode 0700, True if only this user can write it """
+    if not os.path.lexists(path):
+        try:
+            os.makedirs(path, 0700)
+        except OSError:
+            return False
+    return is_private(path, stat.S_ISDIR)
+
+
+def is_private(path, is_type):
+    """ Is path of type, owned by this user and not writable by others? """
+    path_stat = os.lstat(path)
+    return is_type(path_stat.st_mode) and \
+        path_stat.st_uid == os.getuid() and \
+        not path_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
 class InMemoryCache(Cache):
     """
     In-memory cache.
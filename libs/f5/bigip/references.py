@@ -0,0 +1,119 @@
+# Copyright 2014 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5.common.logger import Log
+from f5.common import constants as const
+from f5.common.cache import TTLCache
+from f5.bigip.interfaces import strip_folder_and_prefix
+from f5.bigip import exceptions
+
+import json
+import os
+import threading
+import time
+
+# index: (referrer collection, reference attribute, strip prefix,
+#         query exception)
+INDEXES = {
+    'virtual_pool': ('/ltm/virtual', 'pool', False,
+                     exceptions.VirtualServerQueryException),
+    'snatpool_member': ('/ltm/snatpool', 'members', True,
+                        exceptions.SNATQueryException),
+    'selfip_vlan': ('/net/self', 'vlan', False,
+                    exceptions.VLANQueryException)
+}
+
+
+def reference_key(path, strip_prefix=False):
+    """ Key of a referenced object, its name without folder """
+    if strip_prefix:
+        return os.path.basename(strip_folder_and_prefix(path))
+    return os.path.basename(path.replace('~', '/'))
+
+
+class ReferenceIndex(object):
+    """
+    Reverse reference maps of a device.
+
+    Each index maps a referenced object name to the (partition, name)
+    of every object referencing it and is built with one GET of the
+    referring collection across all partitions. Indexes are shared by
+    all BigIP objects for the same device, expire after
+    REFERENCE_INDEX_TTL seconds and are dropped by the interface
+    methods which change the references.
+    """
+    caches = {}
+    caches_lock = threading.Lock()
+
+    def __init__(self, bigip):
+        self.bigip = bigip
+        self.indexes = ReferenceIndex.get_cache(bigip.hostname)
+
+    @staticmethod
+    def get_cache(hostname):
+        """ Get the shared index cache for a device """
+        with ReferenceIndex.caches_lock:
+            if hostname not in ReferenceIndex.caches:
+                ReferenceIndex.caches[hostname] = \
+                    TTLCache(const.REFERENCE_INDEX_TTL)
+            return ReferenceIndex.caches[hostname]
+
+    def get_referrers(self, index, name, folder=None, max_age=None):
+        """ Get names of objects in folder, or any, referencing name """
+        (_, _, strip_prefix, _) = INDEXES[index]
+        referrers = self.get_index(index, max_age).get(
+            reference_key(name, strip_prefix), [])
+        return [referrer_name for (partition, referrer_name) in referrers
+                if not folder or partition == folder]
+
+    def get_index(self, index, max_age=None):
+        """ Get reverse map, rebuilt if expired or older than max_age """
+        cached = self.indexes.get(index)
+        if cached:
+            (built_at, references) = cached
+            if max_age is None or time.time() - built_at <= max_age:
+                return references
+        references = self._build(index)
+        self.indexes.put(index, (time.time(), references))
+        return references
+
+    def invalidate(self, index=None):
+        """ Drop an index or all indexes """
+        self.indexes.invalidate(index)
+
+    def _build(self, index):
+        """ Build reverse map with one pass over the collection """
+        (path, attribute, strip_prefix, exception) = INDEXES[index]
+        request_url = self.bigip.icr_url + path
+        request_url += '?$select=name,partition,' + attribute
+        response = self.bigip.icr_session.get(
+            request_url, timeout=const.CONNECTION_TIMEOUT)
+        references = {}
+        if response.status_code < 400:
+            return_obj = json.loads(response.text)
+            for item in return_obj.get('items', []):
+                values = item.get(attribute)
+                if not values:
+                    continue
+                if not isinstance(values, list):
+                    values = [values]
+                for value in values:
+                    references.setdefault(
+                        reference_key(value, strip_prefix), []).append(
+                            (item.get('partition', 'Common'), item['name']))
+        elif response.status_code != 404:
+            Log.error('references', response.text)
+            raise exception(response.text)
+        return references
@@ -965,12 +965,12 @@ class F5Manager():
         for _ in range(0, 60):
             try:
                 sync_status = \
-                    bigip.cluster.mgmt_dg.get_sync_status(\
-                                                     ['device_trust_group'])
+                    bigip.cluster.get_device_group_sync_status(
+                                                     'device_trust_group')
                 print 'Device_trust_group sync status: %s, %s' % \
-                      (sync_status[0].color, sync_status[0].status)
-                if sync_status[0].color == 'COLOR_GREEN' and \
-                   sync_status[0].status == ok_status:
+                      (sync_status[0], sync_status[1])
+                if sync_status[0] == 'green' and \
+                   sync_status[1] == ok_status:
                     print 'Peer device_trust_group is in sync.'
                     return
             # pylint: disable=broad-except
@@ -980,7 +980,7 @@ class F5Manager():
             time.sleep(retry_delay)
 
         raise Exception('device_trust_group not in sync - status: %s, %s' % \
-                        (sync_status[0].color, sync_status[0].status))
+                        (sync_status[0], sync_status[1]))
 
     def build_cluster(self, policy_file):
         fd = open(policy_file, 'r')
@@ -1143,9 +1143,7 @@ class F5Manager():
                 reset_tries = 10
                 while reset_tries > 0:
                     try:
-                        ibigip.device.mgmt_trust.reset_all(dn,
-                                                           False,
-                                                            '', '')
+                        ibigip.device.reset_all(dn)
                         time.sleep(5)
                         if ibigip.device.get_device_name() == dn:
                             break
@@ -0,0 +1,50 @@
+# Copyright 2014 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import threading
+import time
+
+
+class TTLCache(object):
+    """ Thread safe cache of values which expire after ttl seconds """
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """ Get unexpired value or None """
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                return None
+            (value, expires) = entry
+            if time.time() >= expires:
+                del self.values[key]
+                return None
+            return value
+
+    def put(self, key, value):
+        """ Cache value """
+        with self.lock:
+            self.values[key] = (value, time.time() + self.ttl)
+
+    def invalidate(self, key=None):
+        """ Drop value for key or all values """
+        with self.lock:
+            if key is None:
+                self.values = {}
+            else:
+                self.values.pop(key, None)
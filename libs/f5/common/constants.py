@@ -21,13 +21,62 @@ DEFAULT_HOSTNAME = 'bigip1'
 MAX_HOSTNAME_LENGTH = 128
 DEFAULT_FOLDER = "/Common"
 FOLDER_CACHE_TIMEOUT = 120
+NORMALIZE_CACHE_SIZE = 4096
+ROUTE_DOMAIN_CACHE_TTL = 300
+REFERENCE_INDEX_TTL = 30
+CATALOG_TTL = 300
+CATALOG_FETCH_CONCURRENCY = 8
+WORKER_POOL_SIZE = 16
+MONITOR_MISS_TTL = 30
+STATISTICS_SAMPLE_TTL = 10
 CONNECTION_TIMEOUT = 30
+# ICONTROL REST TOKEN AUTH CONSTANTS
+ICR_TOKEN_LOGIN_PROVIDER = 'tmos'
+ICR_TOKEN_TIMEOUT = 1200
+ICR_TOKEN_REFRESH_MARGIN = 60
+# ICONTROL REST CONNECTION POOL CONSTANTS
+ICR_POOL_MAXSIZE = 10
+ICR_POOL_BLOCK = False
+# ICONTROL REST RETRY AND CIRCUIT BREAKER CONSTANTS
+ICR_RETRY_MAX = 3
+ICR_RETRY_BACKOFF_BASE = 0.5
+ICR_RETRY_BACKOFF_MAX = 10
+ICR_RETRY_STATUS_CODES = [429, 502, 503, 504]
+ICR_BREAKER_FAILURE_THRESHOLD = 5
+ICR_BREAKER_RESET_TIMEOUT = 30
+# ICONTROL REST PER DEVICE LIMITS.  0 IS UNLIMITED
+ICR_MAX_CONCURRENT_READS = 8
+ICR_MAX_CONCURRENT_WRITES = 4
+ICR_MAX_READS_PER_SECOND = 0
+ICR_MAX_WRITES_PER_SECOND = 0
+# ICONTROL REST TRANSACTION CONSTANTS
+TRANSACTION_POLL_ATTEMPTS = 30
+TRANSACTION_POLL_DELAY = 1
+# LOGGING CONSTANTS
+LOG_JSON = False
+# INSTRUMENTATION CONSTANTS
+METRICS_ENABLED = True
+METRICS_LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                           0.5, 1, 2.5, 5, 10, 30]
+# GREEN THREADS SHARED BY ASYNC BIGIP CLIENTS
+ASYNC_BIGIP_POOL_SIZE = 100
 FDB_POPULATE_STATIC_ARP = True
+FDB_MIRROR_TTL = 300
+FDB_SYNC_MAX_DELTA = 32
+FDB_QUEUE_WINDOW = 0.5
+FDB_QUEUE_MAX_PENDING = 4096
+FDB_QUEUE_RETRY_BASE = 1
+FDB_QUEUE_RETRY_MAX = 60
+ARP_BATCH_CONCURRENCY = 8
+ARP_MIRROR_TTL = 60
 # DEVICE LOCK PREFIX
 DEVICE_LOCK_PREFIX = 'lock_'
 # DIR TO CACHE WSDLS.  SET TO NONE TO READ FROM DEVICE
 # WSDL_CACHE_DIR = "/data/iControl-11.4.0/sdk/wsdl/"
 WSDL_CACHE_DIR = ''
+# DIR TO PERSIST PARSED WSDLS PER TMOS VERSION.  SET TO '' TO DISABLE
+# MUST BE PRIVATE TO THE USER, IT IS CREATED WITH MODE 0700
+WSDL_DEFINITIONS_CACHE_DIR = '~/.f5-wsdl-definitions'
 # HA CONSTANTS
 HA_VLAN_NAME = "HA"
 HA_SELFIP_NAME = "HA"
@@ -48,6 +97,8 @@ DEVICE_HEALTH_SCORE_MEM_WEIGHT = 1
 DEVICE_HEALTH_SCORE_CPS_WEIGHT = 1
 DEVICE_HEALTH_SCORE_CPS_PERIOD = 5
 DEVICE_HEALTH_SCORE_CPS_MAX = 100
+DEVICE_HEALTH_SAMPLE_COUNT = 12
+DEVICE_HEALTH_SAMPLER_IDLE_PERIODS = 60
 # DEVICE GROUP CONSTANTS
 PEER_ADD_ATTEMPTS_MAX = 10
 PEER_ADD_ATTEMPT_DELAY = 2
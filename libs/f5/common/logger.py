@@ -13,42 +13,132 @@
 # limitations under the License.
 #
 
+from f5.common import constants as const
+
+import itertools
+import json
 import logging
 import sys
+import threading
+
+LOG = logging.getLogger(__name__)
+
+# per thread correlation id of the outermost interface call
+_context = threading.local()
+_correlation_ids = itertools.count(1)
+
+
+class TextFormatter(logging.Formatter):
+    """ Plain text with optional correlation id """
+    def __init__(self):
+        logging.Formatter.__init__(self, '%(asctime)s %(message)s')
+
+    def format(self, record):
+        text = logging.Formatter.format(self, record)
+        correlation_id = getattr(record, 'correlation_id', None)
+        if correlation_id:
+            return '[%s] %s' % (correlation_id, text)
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    """ One JSON object per record """
+    def format(self, record):
+        entry = {'time': self.formatTime(record),
+                 'level': record.levelname,
+                 'prefix': getattr(record, 'prefix', None),
+                 'message': record.getMessage()}
+        correlation_id = getattr(record, 'correlation_id', None)
+        if correlation_id:
+            entry['correlation_id'] = correlation_id
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class CorrelationFilter(logging.Filter):
+    """ Add the active correlation id to records """
+    def filter(self, record):
+        record.correlation_id = getattr(_context, 'correlation_id', None)
+        return True
 
 
 class Log(object):
+    """ Logging helpers for the library
+
+    Messages may take %-style arguments which are only formatted when
+    the level is enabled, e.g. Log.debug('pool', 'added %s', name).
+    """
+    handler = None
+
     @staticmethod
-    def debug(prefix, msg):
-        Log._log('debug', prefix, msg)
+    def configure(json_output=None, level=None, stream=None):
+        """ Configure the shared handler once """
+        if json_output is None:
+            json_output = const.LOG_JSON
+        if Log.handler:
+            LOG.removeHandler(Log.handler)
+        Log.handler = logging.StreamHandler(stream or sys.stdout)
+        if json_output:
+            Log.handler.setFormatter(JsonFormatter())
+        else:
+            Log.handler.setFormatter(TextFormatter())
+        Log.handler.addFilter(CorrelationFilter())
+        LOG.addHandler(Log.handler)
+        if level is not None:
+            LOG.setLevel(level)
 
     @staticmethod
-    def error(prefix, msg):
-        Log._log('error', prefix, msg)
+    def debug(prefix, msg, *args):
+        if LOG.isEnabledFor(logging.DEBUG):
+            Log._log(logging.DEBUG, prefix, msg, args)
 
     @staticmethod
-    def crit(prefix, msg):
-        Log._log('crit', prefix, msg)
+    def error(prefix, msg, *args):
+        if LOG.isEnabledFor(logging.ERROR):
+            Log._log(logging.ERROR, prefix, msg, args)
 
     @staticmethod
-    def info(prefix, msg):
-        Log._log('info', prefix, msg)
+    def crit(prefix, msg, *args):
+        if LOG.isEnabledFor(logging.CRITICAL):
+            Log._log(logging.CRITICAL, prefix, msg, args)
 
     @staticmethod
-    def _log(level, prefix, msg):
-        log_string = prefix + ': ' + msg
-        log = logging.getLogger(__name__)
-        out_hdlr = logging.StreamHandler(sys.stdout)
-        out_hdlr.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
-        log.addHandler(out_hdlr)
+    def info(prefix, msg, *args):
+        if LOG.isEnabledFor(logging.INFO):
+            Log._log(logging.INFO, prefix, msg, args)
 
-        if level == 'debug':
-            log.debug(log_string)
-        elif level == 'error':
-            log.error(log_string)
-        elif level == 'crit':
-            log.critical(log_string)
+    @staticmethod
+    def _log(level, prefix, msg, args):
+        if args:
+            # only the message carries format arguments
+            log_string = prefix.replace('%', '%%') + ': ' + msg
         else:
-            log.info(log_string)
+            log_string = prefix + ': ' + msg
+        LOG.log(level, log_string, *args, extra={'prefix': prefix})
+
+    @staticmethod
+    def get_correlation_id():
+        """ Get correlation id of the current call """
+        return getattr(_context, 'correlation_id', None)
+
+    @staticmethod
+    def set_correlation_id(correlation_id):
+        """ Continue a correlated call on another thread """
+        _context.correlation_id = correlation_id
+
+    @staticmethod
+    def start_call():
+        """ Start a correlated call, returns True if outermost """
+        if getattr(_context, 'correlation_id', None):
+            return False
+        _context.correlation_id = '%x' % next(_correlation_ids)
+        return True
+
+    @staticmethod
+    def end_call():
+        """ End the outermost correlated call """
+        _context.correlation_id = None
+
 
-        log.removeHandler(out_hdlr)
+Log.configure()
@@ -0,0 +1,189 @@
+# Copyright 2014 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5.common import constants as const
+
+import bisect
+import threading
+import urlparse
+
+REST_PREFIX = '/mgmt/tm'
+# subcollections whose items are named without a folder
+ITEM_COLLECTIONS = ['records', 'members', 'profiles']
+
+
+def rest_path_template(url):
+    """ Reduce REST url to a path template
+
+    >>> rest_path_template(
+    ...     '/mgmt/tm/ltm/pool/~Common~uuid_pool/members?$select=name')
+    '/ltm/pool/~{folder}~{name}/members'
+    >>> rest_path_template('/mgmt/tm/net/fdb/tunnel/~Common~tunnel-vxlan'
+    ...                    '/records/00%3A11%3A22%3A33%3A44%3A55')
+    '/net/fdb/tunnel/~{folder}~{name}/records/{name}'
+    """
+    path = urlparse.urlparse(url).path
+    if path.startswith(REST_PREFIX):
+        path = path[len(REST_PREFIX):]
+    segments = path.split('/')
+    for i in range(len(segments)):
+        segment = segments[i]
+        if segment.startswith('~'):
+            if segment.count('~') > 1:
+                segments[i] = '~{folder}~{name}'
+            else:
+                segments[i] = '~{folder}'
+        elif segment.isdigit():
+            segments[i] = '{id}'
+        elif segment and i > 0 and segments[i - 1] in ITEM_COLLECTIONS:
+            segments[i] = '{name}'
+    return '/'.join(segments)
+
+
+class Series(object):
+    """ Counters and latency histogram for one label set """
+    def __init__(self, buckets):
+        self.count = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.latency_sum = 0.0
+        self.bucket_counts = [0] * (len(buckets) + 1)
+
+    def to_dict(self, buckets):
+        """ Get series values """
+        histogram = []
+        cumulative = 0
+        for i in range(len(buckets)):
+            cumulative += self.bucket_counts[i]
+            histogram.append((buckets[i], cumulative))
+        histogram.append(('+Inf', cumulative + self.bucket_counts[-1]))
+        return {'count': self.count,
+                'errors': self.errors,
+                'bytes_sent': self.bytes_sent,
+                'bytes_received': self.bytes_received,
+                'latency_sum': self.latency_sum,
+                'latency_buckets': histogram}
+
+
+class Registry(object):
+    """ In process store of call and REST request metrics
+
+    Interface method calls are labelled by interface and method, REST
+    requests by HTTP method and path template.
+    """
+    KINDS = {'call': ('interface', 'method'),
+             'rest': ('method', 'path')}
+
+    def __init__(self, buckets=None):
+        if buckets is None:
+            buckets = const.METRICS_LATENCY_BUCKETS
+        self.buckets = sorted(buckets)
+        self.enabled = const.METRICS_ENABLED
+        self.lock = threading.Lock()
+        self.series = {'call': {}, 'rest': {}}
+
+    def observe(self, kind, labels, latency, error=False,
+                bytes_sent=0, bytes_received=0):
+        """ Record one call or request """
+        index = bisect.bisect_left(self.buckets, latency)
+        with self.lock:
+            series = self.series[kind].get(labels)
+            if not series:
+                series = Series(self.buckets)
+                self.series[kind][labels] = series
+            series.count += 1
+            if error:
+                series.errors += 1
+            series.bytes_sent += bytes_sent
+            series.bytes_received += bytes_received
+            series.latency_sum += latency
+            series.bucket_counts[index] += 1
+
+    def observe_call(self, interface, method, latency, error=False):
+        """ Record an interface method call """
+        if self.enabled:
+            self.observe('call', (interface, method), latency, error)
+
+    def observe_request(self, method, url, latency, error=False,
+                        bytes_sent=0, bytes_received=0):
+        """ Record a REST request """
+        if self.enabled:
+            self.observe('rest', (method, rest_path_template(url)),
+                         latency, error, bytes_sent, bytes_received)
+
+    def get_stats(self, kind=None):
+        """ Get metrics as {kind: {labels: values}} """
+        with self.lock:
+            stats = {}
+            for series_kind in self.series:
+                if kind and kind != series_kind:
+                    continue
+                stats[series_kind] = {}
+                for labels, series in self.series[series_kind].items():
+                    stats[series_kind][labels] = \
+                        series.to_dict(self.buckets)
+        return stats
+
+    def reset(self):
+        """ Drop all recorded metrics """
+        with self.lock:
+            self.series = {'call': {}, 'rest': {}}
+
+    def to_prometheus(self):
+        """ Export metrics in Prometheus text format """
+        lines = []
+        stats = self.get_stats()
+        for kind in sorted(stats):
+            prefix = 'f5_%s' % kind
+            label_names = Registry.KINDS[kind]
+            series_list = sorted(stats[kind].items())
+            for (suffix, key, metric_type) in [
+                    ('total', 'count', 'counter'),
+                    ('errors_total', 'errors', 'counter'),
+                    ('bytes_sent_total', 'bytes_sent', 'counter'),
+                    ('bytes_received_total', 'bytes_received', 'counter')]:
+                if kind == 'call' and key.startswith('bytes'):
+                    continue
+                name = '%s_%s' % (prefix, suffix)
+                lines.append('# TYPE %s %s' % (name, metric_type))
+                for (labels, values) in series_list:
+                    lines.append('%s{%s} %s' % (
+                        name, _format_labels(label_names, labels),
+                        values[key]))
+            name = '%s_duration_seconds' % prefix
+            lines.append('# TYPE %s histogram' % name)
+            for (labels, values) in series_list:
+                label_text = _format_labels(label_names, labels)
+                for (bound, count) in values['latency_buckets']:
+                    lines.append('%s_bucket{%s,le="%s"} %d' % (
+                        name, label_text, bound, count))
+                lines.append('%s_sum{%s} %f' % (
+                    name, label_text, values['latency_sum']))
+                lines.append('%s_count{%s} %d' % (
+                    name, label_text, values['count']))
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(names, values):
+    """ Format Prometheus label set """
+    labels = []
+    for (name, value) in zip(names, values):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"')
+        labels.append('%s="%s"' % (name, value))
+    return ','.join(labels)
+
+
+REGISTRY = Registry()
@@ -0,0 +1,68 @@
+# Copyright 2014 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5.common import constants as const
+from f5.common.logger import Log
+
+from multiprocessing.pool import ThreadPool
+import threading
+
+# worker threads shared by every fan out in the process
+_pool = None
+_pool_lock = threading.Lock()
+_worker = threading.local()
+
+
+def get_pool():
+    """ Get the shared worker pool """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPool(const.WORKER_POOL_SIZE)
+        return _pool
+
+
+def run_all(function, items, concurrency, serial=False):
+    """
+    Call function for each item on the shared worker threads and
+    return the results in order. Items are split into at most
+    concurrency groups, each run one item at a time, and run with the
+    caller's log correlation id. Items run on the calling thread when
+    serial, e.g. to stay in the caller's transaction, or when called
+    from a worker, which could otherwise wait on itself.
+    """
+    items = list(items)
+    if serial or len(items) < 2 or concurrency < 2 or \
+            getattr(_worker, 'active', False):
+        return [function(item) for item in items]
+    correlation_id = Log.get_correlation_id()
+    groups = [items[index::concurrency]
+              for index in range(min(concurrency, len(items)))]
+
+    def run_group(group):
+        """ Run a group of items in the caller's context """
+        _worker.active = True
+        Log.set_correlation_id(correlation_id)
+        try:
+            return [function(item) for item in group]
+        finally:
+            Log.set_correlation_id(None)
+            _worker.active = False
+
+    group_results = get_pool().map(run_group, groups)
+    results = [None] * len(items)
+    for (index, group_result) in enumerate(group_results):
+        results[index::len(groups)] = group_result
+    return results
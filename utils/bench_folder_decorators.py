@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+""" Micro-benchmark of the per-call overhead of the folder decorators
+
+Usage: python utils/bench_folder_decorators.py [iterations]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'libs'))
+
+from f5.bigip.interfaces import icontrol_folder
+from f5.bigip.interfaces import icontrol_rest_folder
+
+
+class FakeBigIP(object):
+    """ BigIP without a device, counts active folder changes """
+    def __init__(self):
+        self.current_folder = '/Common'
+        self.set_folder_calls = 0
+        self.folder_changes = 0
+
+    def set_folder(self, name, folder='/Common'):
+        if not folder.startswith("/"):
+            folder = "/" + folder
+        self.set_folder_calls += 1
+        if folder != self.current_folder:
+            # a SOAP set_active_folder round trip on a device
+            self.folder_changes += 1
+            self.current_folder = folder
+        if name:
+            if not name.startswith(folder + "/"):
+                return folder + "/" + name
+            return name
+        return None
+
+
+class FakeInterface(object):
+    """ Interface with decorated no-op methods """
+    OBJ_PREFIX = 'uuid_'
+
+    def __init__(self):
+        self.bigip = FakeBigIP()
+
+    @icontrol_folder
+    def soap_call(self, name=None, vlan_name=None, pool_name=None,
+                  folder='Common'):
+        return name
+
+    @icontrol_rest_folder
+    def rest_call(self, name=None, vlan_name=None, pool_name=None,
+                  folder='Common'):
+        return name
+
+    def plain_call(self, name=None, vlan_name=None, pool_name=None,
+                   folder='Common'):
+        return name
+
+
+def main():
+    iterations = 100000
+    if len(sys.argv) > 1:
+        iterations = int(sys.argv[1])
+    interface = FakeInterface()
+    kwargs = {'name': 'a5b2c1d0-vs', 'vlan_name': '/Common/external',
+              'pool_name': 'a5b2c1d0-pool',
+              'folder': '~project_6a0d7b'}
+    for method in ['plain_call', 'soap_call', 'rest_call']:
+        call = getattr(interface, method)
+        seconds = min(timeit.repeat(lambda: call(**kwargs),
+                                    repeat=3, number=iterations))
+        interface.bigip = FakeBigIP()
+        call(**kwargs)
+        print '%-12s %8.2f us/call %d set_folder %d folder changes' % (
+            method, seconds * 1000000.0 / iterations,
+            interface.bigip.set_folder_calls,
+            interface.bigip.folder_changes)
+
+
+if __name__ == '__main__':
+    main()